@@ -13,12 +13,36 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 import folium
 from streamlit_folium import st_folium
-from folium.plugins import HeatMap
 import json
+import os
+import time
 from pathlib import Path
 
+from autonomia import (DIAS, PREMISSAS_AUTONOMIA, avaliar_linhas, frota_operacao,
+                       resumo_por_operadora)
+from busca import BuscaParadasLinhas
+from cache import CacheLRU
+from carga import (PONTA_TARIFARIA, horas_passos, km_dia_por_operadora, resumo_carga,
+                   simular_carga, texto_hora)
+from cobertura import (FAIXAS_DISTANCIA, atribuir_carregadores, paradas_por_local,
+                       resumo_cobertura)
+from dados import abrir_pacote, assinatura_arquivos, fontes_pacote
+from demanda import matriz_viagens, paradas_mais_servidas
+from financeiro import (avaliar_cenarios, calibrar_parametros, resumir_monte_carlo,
+                        simular_monte_carlo)
+from graficos import barras_histograma, compactar, histograma
+from implantacao import PREMISSAS_IMPLANTACAO, planejar, tabela_frentes, trajetoria
+from infraestrutura import (OPCOES_CARREGADOR, PREMISSAS_PADRAO, dimensionar, otimizar,
+                            tabela_locais)
+from mapa import (GradeDensidade, IndiceEspacial, camada_densidade, camada_lod, camada_paradas,
+                  camadas_por_faixa, limites_folium)
+from metricas import calcular_metricas_filtradas, construir_matriz_kpis
+from perfil import Perfil
+from rankings import construir_rankings, top_n
+
 # ============================================================================
 # CONFIG
 # ============================================================================
@@ -56,76 +80,112 @@ st.markdown("""
 # CARREGAMENTO
 # ============================================================================
 
-@st.cache_data
+def perfil_atual():
+    """Perfil da execução em curso (numa reexecução de fragmento, o da última execução)"""
+    if 'perfil' not in st.session_state:
+        st.session_state['perfil'] = Perfil()
+    return st.session_state['perfil']
+
+@st.cache_resource
+def cache_graficos():
+    """Figuras já compactadas por (nome, entradas), entre sessões"""
+    return CacheLRU(maxsize=64)
+
+def grafico(nome, fig, chave=None, **kwargs):
+    """st.plotly_chart da figura compactada (graficos.compactar), com span de tempo e,
+    no painel de perfil, o payload enviado.
+
+    Com `chave`, `fig` é uma função sem argumentos que monta a figura; a figura
+    compactada fica guardada por (nome, chave) e só é montada na primeira vez.
+    """
+    perfil = perfil_atual()
+    with perfil.medir(f'grafico:{nome}'):
+        if chave is None:
+            fig = compactar(fig)
+        else:
+            fig = cache_graficos().obter((nome, chave), lambda: compactar(fig()))
+        st.plotly_chart(fig, **kwargs)
+    if perfil.detalhado:
+        perfil.registrar_payload(f'grafico:{nome}', len(pio.to_json(fig, validate=False)))
+
+# Colunas de paradas usadas pelo mapa/cobertura (stopId fica no pacote)
+COLUNAS_PARADAS = ('stop_name', 'lat', 'lon')
+
+@st.cache_resource(max_entries=1)
+def carregar_pacote(assinatura):
+    """Pacote de dados compartilhado entre sessões; refeito quando uma fonte muda"""
+    perfil_atual().falha('pacote')
+    return abrir_pacote()
+
 def carregar_dados():
-    DATA_DIR = Path("dashboard_data")
-    
     try:
-        with open(DATA_DIR / 'dashboard_data_REAL.json', 'r', encoding='utf-8') as f:
-            dados = json.load(f)
-        with open(DATA_DIR / 'kpis_base.json', 'r', encoding='utf-8') as f:
-            kpis = json.load(f)
-        with open(DATA_DIR / 'config_dashboard.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        df_paradas = pd.read_parquet(DATA_DIR / 'dados_paradas.parquet')
+        with perfil_atual().medir_cache('pacote'):
+            pacote = carregar_pacote(assinatura_arquivos(*fontes_pacote()))
+        dados = pacote.documento('dados')
+        kpis = pacote.documento('kpis')
+        config = pacote.documento('config')
+        df_paradas = pacote.tabela('paradas', COLUNAS_PARADAS)
         
-        return dados, kpis, config, df_paradas
+        return pacote, dados, kpis, config, df_paradas
     except Exception as e:
         st.error(f"❌ Erro: {e}")
-        st.info("Execute o NB6 primeiro!")
+        st.info("Gere os dados com `python pipeline.py` (os JSONs de origem vêm do NB6).")
         st.stop()
 
+@st.cache_data
+def carregar_rankings(versao, _pacote):
+    """Rankings completos materializados uma vez por versão dos dados"""
+    perfil_atual().falha('rankings')
+    return construir_rankings(_pacote)
+
+@st.cache_resource
+def carregar_viagens(versao, _pacote):
+    """Matriz paradas x 24 de viagens, alinhada às paradas; (None, erro) se faltar"""
+    perfil_atual().falha('viagens')
+    try:
+        return matriz_viagens(_pacote.tabela('viagens_parada_hora')), None
+    except LookupError as e:
+        return None, str(e)
+
+@st.cache_data
+def carregar_km_operadoras(versao, _pacote):
+    """Km de dia útil por operadora (consolidado), para as curvas de carga"""
+    perfil_atual().falha('km_operadoras')
+    return km_dia_por_operadora(_pacote.tabela('consolidado', ('operadora', 'seg_km')))
+
+@st.cache_data
+def avaliar_autonomia(versao, dia, premissas, _pacote, _dados):
+    """Energia/bateria de todas as linhas, por conjunto de premissas (itens ordenados)"""
+    perfil_atual().falha('autonomia')
+    return avaliar_linhas(_pacote.tabela('consolidado'), dict(premissas), dia,
+                          frota_operacao(_dados))
+
 # ============================================================================
 # CÁLCULOS
 # ============================================================================
 
-def calcular_metricas_filtradas(filtros, kpis_base, dados):
-    total_ops = len(dados['operadoras'])
-    ops_sel = len(filtros['operadoras'])
-    fator = ops_sel / total_ops if ops_sel > 0 else 1.0
-    
-    metricas = {
-        'frota': int(kpis_base['total_onibus'] * fator),
-        'linhas': int(kpis_base['total_linhas'] * fator),
-        'paradas': int(kpis_base['total_paradas'] * fator),
-        'km_anual': kpis_base['km_anual'] * fator,
-        'passageiros_ano': kpis_base['passageiros_ano'] * fator,
-        'co2': kpis_base['emissoes_evitadas_ton'] * fator,
-        'taxa_ocupacao': kpis_base['taxa_ocupacao_atual'],
-        'capacidade_ano': kpis_base['capacidade_total_ano'] * fator,
-    }
-    
-    novos_usuarios = filtros.get('novos_usuarios', 0)
-    novos_passes_ano = novos_usuarios * 3 * 365
-    
-    metricas['passageiros_projetados'] = metricas['passageiros_ano'] + novos_passes_ano
-    metricas['taxa_projetada'] = (metricas['passageiros_projetados'] / metricas['capacidade_ano']) * 100
-    
-    if 'aumento_tarifa' in filtros and len(dados.get('cenarios_financeiros', [])) > 0:
-        cenario = next((c for c in dados['cenarios_financeiros'] 
-                       if c['aumento_pct'] == filtros['aumento_tarifa']), None)
-        if cenario:
-            metricas['vpl'] = cenario['vpl'] * fator
-            metricas['payback'] = cenario['payback_simples']
-            metricas['tir'] = cenario.get('tir', 0)
-        else:
-            metricas['vpl'] = 0
-            metricas['payback'] = 999
-            metricas['tir'] = 0
-    else:
-        metricas['vpl'] = 0
-        metricas['payback'] = 999
-        metricas['tir'] = 0
-    
-    return metricas
+@st.cache_resource
+def carregar_matriz_kpis(versao, _pacote, _dados, _kpis_base):
+    """Matriz operadoras x KPIs, montada uma vez por versão dos dados"""
+    perfil_atual().falha('matriz_kpis')
+    try:
+        df_operadoras = _pacote.tabela('operadoras')
+    except Exception:
+        df_operadoras = None  # sem a aba Operadoras: KPIs seguem a frota
+    return construir_matriz_kpis(_dados, _kpis_base, df_operadoras)
 
 # ============================================================================
 # MAPA
 # ============================================================================
 
-def criar_mapa_profissional(df_paradas, garagens, terminais, config, filtros, heatmap=False):
+def criar_mapa_profissional(df_paradas, garagens, terminais, config, filtros, heatmap=False,
+                            faixa_paradas=None, densidade=None):
     centro = config['centro_mapa']
     
+    # Garagens só das operadoras selecionadas (terminais são compartilhados)
+    ops = set(filtros.get('operadoras') or [])
+    garagens = [g for g in garagens if not ops or g.get('operadora') in ops]
+    
     m = folium.Map(
         location=[centro['lat'], centro['lon']],
         zoom_start=config['zoom_inicial'],
@@ -164,32 +224,121 @@ def criar_mapa_profissional(df_paradas, garagens, terminais, config, filtros, he
             tooltip=t['terminal']
         ).add_to(m)
     
-    # TODAS AS PARADAS! (9.287)
-    if heatmap:
-        heat_data = [[r['lat'], r['lon']] for _, r in df_paradas.iterrows()]
-        HeatMap(heat_data, radius=15, blur=20).add_to(m)
-    else:
-        # USA TODAS AS 9.287 PARADAS!
-        for _, p in df_paradas.iterrows():
-            folium.CircleMarker(
-                [p['lat'], p['lon']],
-                radius=2,
-                popup=p['stop_name'],
-                color='#ff7f0e',
-                fill=True,
-                fillOpacity=0.6,
-                weight=1
-            ).add_to(m)
+    # TODAS AS PARADAS! (9.287) - camada única, montada de forma vetorizada
+    # (no modo nível de detalhe as paradas vão numa camada dinâmica à parte)
+    # Heatmap: células de densidade pré-binadas (payload independe do nº de paradas);
+    # com `faixa_paradas`, uma camada por faixa de distância ao carregador
+    if df_paradas is not None and heatmap and densidade is not None:
+        camada_densidade(densidade).add_to(m)
+    elif df_paradas is not None and faixa_paradas is not None and not heatmap:
+        for camada in camadas_por_faixa(df_paradas, faixa_paradas, FAIXAS_DISTANCIA):
+            camada.add_to(m)
+    elif df_paradas is not None:
+        camada_paradas(df_paradas, heatmap=heatmap).add_to(m)
     
     folium.LayerControl().add_to(m)
     return m
 
+# Zoom do mapa ao escolher uma parada na busca
+ZOOM_BUSCA = 16
+
+@st.cache_resource
+def cache_mapas():
+    """LRU de mapas prontos, compartilhado entre sessões"""
+    return CacheLRU(maxsize=8)
+
+def obter_mapa(df_paradas, dados, config, filtros, heatmap, versao, faixa_paradas=None,
+               densidade=None, peso=None):
+    """Mapa do cache, chaveado só pelo que muda o mapa (sliders de tarifa/demanda não entram)"""
+    chave = (heatmap, df_paradas is not None, faixa_paradas is not None, peso,
+             tuple(sorted(filtros['operadoras'])), versao)
+    perfil = perfil_atual()
+    
+    def construir():
+        perfil.falha('mapa')
+        return criar_mapa_profissional(df_paradas, dados['garagens'], dados['terminais'],
+                                       config, filtros, heatmap, faixa_paradas, densidade)
+    
+    with perfil.medir_cache('mapa'):
+        return cache_mapas().obter(chave, construir)
+
+def destaque_busca(filtros, camada=None):
+    """Argumentos do st_folium para centrar o mapa na parada buscada, com um marcador
+    numa camada à parte (o mapa cacheado não muda). `camada`: FeatureGroup já usado."""
+    item = filtros.get('busca')
+    if not item or item['tipo'] != 'parada':
+        return {'feature_group_to_add': camada} if camada is not None else {}
+    
+    camada = camada if camada is not None else folium.FeatureGroup(name='Busca')
+    folium.Marker(
+        [item['lat'], item['lon']], tooltip=item['rotulo'],
+        icon=folium.Icon(color='red', icon='search', prefix='fa'),
+    ).add_to(camada)
+    return {'center': [item['lat'], item['lon']], 'zoom': ZOOM_BUSCA,
+            'feature_group_to_add': camada}
+
+def desenhar_mapa(mapa, **kwargs):
+    """st_folium com span de tempo e, no painel de perfil, tamanho do HTML do mapa"""
+    perfil = perfil_atual()
+    with perfil.medir('st_folium'):
+        retorno = st_folium(mapa, **kwargs)
+    if perfil.detalhado:
+        perfil.registrar_payload('mapa', len(mapa.get_root().render().encode('utf-8')))
+    return retorno
+
+def legenda_cache_mapas():
+    stats = cache_mapas().estatisticas()
+    st.caption(f"🗄️ Cache de mapas: {stats['acertos']} acertos / {stats['falhas']} falhas "
+               f"({stats['itens']}/{stats['maxsize']} em memória)")
+
+@st.cache_resource
+def criar_indice_paradas(versao, _df_paradas):
+    """Índice espacial construído uma vez e compartilhado entre reruns"""
+    perfil_atual().falha('indice_paradas')
+    return IndiceEspacial(_df_paradas)
+
+@st.cache_resource
+def criar_indice_busca(versao, _df_paradas, _pacote):
+    """Índice de trigramas de paradas e linhas, uma vez por versão dos dados"""
+    perfil_atual().falha('indice_busca')
+    return BuscaParadasLinhas(_df_paradas, _pacote.tabela(
+        'consolidado', ('linha_nome', 'linha_descricao', 'operadora')))
+
+# Peso de cada ponto no heatmap -> rótulo
+PESOS_HEATMAP = {
+    'paradas': "Paradas",
+    'viagens': "Viagens por parada (semana)",
+    'linhas_terminais': "Linhas por terminal",
+}
+
+@st.cache_resource
+def criar_grade_densidade(versao, peso, _df_paradas, _dados, _viagens=None):
+    """Densidade por zoom, pré-binada uma vez por versão dos dados e peso"""
+    perfil_atual().falha('densidade')
+    if peso == 'viagens':
+        return GradeDensidade(_df_paradas['lat'], _df_paradas['lon'], _viagens.sum(axis=1))
+    if peso == 'linhas_terminais':
+        terminais = _dados['terminais']
+        return GradeDensidade([t['lat'] for t in terminais], [t['lon'] for t in terminais],
+                              [t.get('linhas', 0) for t in terminais])
+    return GradeDensidade(_df_paradas['lat'], _df_paradas['lon'])
+
+@st.cache_data
+def calcular_cobertura(versao, operadoras, _df_paradas, _dados):
+    """Carregador mais próximo de cada parada (garagens das operadoras + terminais)"""
+    perfil_atual().falha('cobertura')
+    ops = set(operadoras)
+    garagens = [g for g in _dados['garagens'] if not ops or g.get('operadora') in ops]
+    locais = tabela_locais(garagens, _dados['terminais'])
+    atribuicao = atribuir_carregadores(_df_paradas, locais)
+    return atribuicao, paradas_por_local(atribuicao, locais)
+
 # ============================================================================
 # ============================================================================
 # SIDEBAR
 # ============================================================================
 
-def criar_sidebar(dados):
+def criar_sidebar(dados, busca):
     st.sidebar.markdown("## 🔧 Filtros")
     
     todas_ops = dados['operadoras']
@@ -200,6 +349,8 @@ def criar_sidebar(dados):
         help=f"{len(todas_ops)} operadoras disponíveis"
     )
     
+    selecao = sidebar_busca(busca)
+    
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 📈 Projeção de Demanda")
     
@@ -214,20 +365,45 @@ def criar_sidebar(dados):
     
     aumento_tarifa = st.sidebar.slider(
         "Aumento (%)",
-        10, 100, 50, 10
+        10, 100, 50, 1
     )
     
     return {
         'operadoras': ops_sel,
         'novos_usuarios': novos_usuarios,
-        'aumento_tarifa': aumento_tarifa
+        'aumento_tarifa': aumento_tarifa,
+        'busca': selecao,
     }
 
+def sidebar_busca(busca):
+    """Busca aproximada de parada/linha; devolve o item escolhido (dict) ou None"""
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("### 🔎 Buscar Parada ou Linha")
+    
+    consulta = st.sidebar.text_input(
+        "Parada ou linha",
+        placeholder="ex.: Estação Samambaia, 0.808",
+        help=f"{len(busca.itens):,} paradas e linhas; tolera acentos e erros de digitação"
+    )
+    if not consulta.strip():
+        return None
+    
+    with perfil_atual().medir('busca'):
+        achados = busca.buscar(consulta, 10)
+    if achados.empty:
+        st.sidebar.caption("Nenhuma parada ou linha encontrada")
+        return None
+    
+    rotulos = {i: f"{'🚏' if tipo == 'parada' else '🚌'} {rotulo}"
+               for i, tipo, rotulo in zip(achados.index, achados['tipo'], achados['rotulo'])}
+    escolha = st.sidebar.selectbox("Resultados", list(rotulos), format_func=rotulos.get)
+    return achados.loc[escolha].to_dict()
+
 # ============================================================================
 # HOME
 # ============================================================================
 
-def pagina_home(metricas, filtros, dados, df_paradas, config, kpis_base):
+def pagina_home(metricas, filtros, dados, df_paradas, config, kpis_base, pacote):
     st.title("🚌 Eletrificação da Frota de Ônibus do DF")
     st.markdown("Dashboard com Análise de Demanda e Viabilidade Econômica")
     
@@ -307,7 +483,7 @@ def pagina_home(metricas, filtros, dados, df_paradas, config, kpis_base):
                 height=350
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            grafico('tarifas', fig, width='stretch')
     
     with col2:
         st.markdown("**💡 Com o aumento:**")
@@ -352,7 +528,7 @@ def pagina_home(metricas, filtros, dados, df_paradas, config, kpis_base):
         fig.update_layout(title="Taxa de Ocupação: Atual vs Projetada",
                          yaxis_title="Taxa (%)", height=350)
         
-        st.plotly_chart(fig, use_container_width=True)
+        grafico('ocupacao', fig, width='stretch')
     
     with col2:
         taxa_proj = metricas['taxa_projetada']
@@ -376,61 +552,215 @@ def pagina_home(metricas, filtros, dados, df_paradas, config, kpis_base):
     
     st.markdown("---")
     
+    secao_mapa(filtros, dados, df_paradas, config, pacote)
+
+@st.fragment
+def secao_mapa(filtros, dados, df_paradas, config, pacote):
+    """Mapa + cobertura: os checkboxes e o zoom/arraste reexecutam só este trecho"""
+    versao = pacote.versao
     # MAPA COM TODAS AS PARADAS
     st.markdown("### 🗺️ Infraestrutura de Recarga")
     st.info(f"📍 {len(filtros['operadoras'])} operadoras | **{len(df_paradas):,} paradas** no sistema")
     
     heatmap = st.checkbox("🔥 Heatmap")
+    lod = st.checkbox(
+        "🔍 Nível de detalhe por zoom",
+        help="Agrupa as paradas em centróides no zoom inicial e mostra só as "
+             "paradas visíveis ao aproximar o mapa"
+    )
+    
+    por_distancia = st.checkbox(
+        "📏 Cores por distância ao carregador",
+        disabled=heatmap or lod,
+        help="Colore cada parada pela distância até a garagem/terminal mais próximo"
+    )
+    peso = st.selectbox("Peso do heatmap", list(PESOS_HEATMAP), format_func=PESOS_HEATMAP.get,
+                        disabled=not heatmap)
+    
+    viagens = None
+    if heatmap and peso == 'viagens':
+        with perfil_atual().medir_cache('viagens'):
+            viagens, erro = carregar_viagens(versao, pacote)
+        if viagens is None:
+            st.warning(f"⚠️ Viagens por parada indisponíveis ({erro}); heatmap por paradas.")
+            peso = 'paradas'
+    
+    grade = None
+    if heatmap:
+        with perfil_atual().medir_cache('densidade'):
+            grade = criar_grade_densidade(versao, peso, df_paradas, dados, viagens)
+    
+    with perfil_atual().medir_cache('cobertura'):
+        atribuicao, por_local = calcular_cobertura(
+            versao, tuple(sorted(filtros['operadoras'])), df_paradas, dados)
+    
+    if lod:
+        mapa_lod(df_paradas, dados, config, filtros, grade, versao)
+    else:
+        faixa = atribuicao['faixa'].to_numpy() if por_distancia and not heatmap else None
+        # Heatmap do mapa completo: células de ~8 px um zoom acima do inicial
+        densidade = grade.celulas(config['zoom_inicial'] + 1) if heatmap else None
+        # Aviso de carregamento
+        with st.spinner(f'⏳ Carregando {len(df_paradas):,} paradas no mapa...'):
+            mapa = obter_mapa(df_paradas, dados, config, filtros, heatmap, versao, faixa,
+                              densidade, peso if heatmap else None)
+        
+        st.success(f"✅ Mapa carregado com {len(df_paradas):,} paradas!")
+        desenhar_mapa(mapa, width=1400, height=500, returned_objects=[],
+                      **destaque_busca(filtros))
+    
+    legenda_cache_mapas()
+    secao_cobertura(atribuicao, por_local)
+
+def secao_cobertura(atribuicao, por_local):
+    """Estatísticas de distância das paradas ao carregador mais próximo"""
+    st.markdown("### 📏 Cobertura da Recarga")
+    
+    resumo = resumo_cobertura(atribuicao)
+    if resumo['n'] == 0:
+        return
+    
+    c1, c2, c3, c4 = st.columns(4)
+    ate_1km = resumo['por_faixa'][FAIXAS_DISTANCIA[0][1]]
+    c1.metric("Paradas até 1 km", f"{ate_1km:,}", f"{ate_1km / resumo['n'] * 100:.1f}%",
+              delta_color='off')
+    c2.metric("Distância mediana", f"{resumo['distancia_p50']:.1f} km")
+    c3.metric("Distância P90", f"{resumo['distancia_p90']:.1f} km")
+    c4.metric("Distância máxima", f"{resumo['distancia_max']:.1f} km")
     
-    # Aviso de carregamento
-    with st.spinner(f'⏳ Carregando {len(df_paradas):,} paradas no mapa... Pode levar até 30 segundos.'):
-        mapa = criar_mapa_profissional(df_paradas, dados['garagens'], 
-                                        dados['terminais'], config, filtros, heatmap)
+    col1, col2 = st.columns([1, 1])
     
-    st.success(f"✅ Mapa carregado com {len(df_paradas):,} paradas!")
-    st_folium(mapa, width=1400, height=500, returned_objects=[])
+    with col1:
+        fig = go.Figure(go.Bar(
+            x=list(resumo['por_faixa']), y=list(resumo['por_faixa'].values()),
+            marker_color=[cor for _, _, cor in FAIXAS_DISTANCIA],
+            text=[f"{n / resumo['n'] * 100:.1f}%" for n in resumo['por_faixa'].values()],
+            textposition='outside'
+        ))
+        fig.update_layout(title="Paradas por Distância ao Carregador",
+                          yaxis_title="Paradas", height=350)
+        grafico('cobertura', fig, width='stretch')
+    
+    with col2:
+        st.dataframe(
+            por_local,
+            column_config={
+                'tipo': 'Tipo', 'nome': 'Local', 'paradas': 'Paradas',
+                'distancia_media_km': st.column_config.NumberColumn('Distância média (km)',
+                                                                    format='%.2f'),
+            },
+            hide_index=True, width='stretch', height=350,
+        )
+
+def mapa_lod(df_paradas, dados, config, filtros, grade, versao):
+    """Mapa com nível de detalhe: a camada de paradas depende do zoom/limites.
+
+    Com `grade` (GradeDensidade), mostra o heatmap das células do zoom atual.
+    """
+    heatmap = grade is not None
+    with perfil_atual().medir_cache('indice_paradas'):
+        indice = criar_indice_paradas(versao, df_paradas)
+    
+    # Último viewport devolvido pelo st_folium (chave do componente)
+    viewport = st.session_state.get('mapa_lod') or {}
+    zoom = viewport.get('zoom') or config['zoom_inicial']
+    limites = limites_folium(viewport.get('bounds'))
+    
+    # Parada recém-escolhida na busca: o viewport devolvido ainda é o de antes do salto
+    item = filtros.get('busca')
+    if item and item['tipo'] == 'parada' and st.session_state.get('mapa_lod_busca') != item['posicao']:
+        st.session_state['mapa_lod_busca'] = item['posicao']
+        zoom = ZOOM_BUSCA
+        # Graus por pixel no zoom; mapa de 1400 x 500 px
+        grau_px = 360 / (256 * 2 ** zoom)
+        meia_lat = 250 * grau_px * np.cos(np.radians(item['lat']))
+        limites = (item['lat'] - meia_lat, item['lon'] - 700 * grau_px,
+                   item['lat'] + meia_lat, item['lon'] + 700 * grau_px)
+    
+    with perfil_atual().medir('consulta_lod'):
+        if heatmap:
+            pontos, agregado = grade.celulas(zoom, limites), None
+        else:
+            pontos, agregado = indice.consultar(zoom, limites)
+    
+    mapa = obter_mapa(None, dados, config, filtros, heatmap, versao)
+    camada = folium.FeatureGroup(name='Paradas')
+    if len(pontos) > 0:
+        if heatmap:
+            camada_densidade(pontos).add_to(camada)
+        else:
+            camada_lod(pontos, agregado).add_to(camada)
+    
+    if heatmap:
+        st.success(f"✅ {len(pontos):,} células de densidade no zoom {zoom}")
+    elif agregado:
+        st.success(f"✅ {len(pontos):,} grupos ({int(pontos['n'].sum()):,} paradas) no zoom {zoom}")
+    else:
+        st.success(f"✅ {len(pontos):,} paradas visíveis no zoom {zoom}")
+    
+    desenhar_mapa(mapa, key='mapa_lod', width=1400, height=500,
+                  returned_objects=['zoom', 'bounds'], **destaque_busca(filtros, camada))
 
 # ============================================================================
 # VIABILIDADE
 # ============================================================================
 
-def pagina_viabilidade(dados, metricas, filtros):
+def pagina_viabilidade(dados, metricas, filtros, params_fin, kpis_base, pacote):
     st.title("💰 Viabilidade Econômica")
     
     if len(dados.get('cenarios_financeiros', [])) == 0:
         st.warning("Dados financeiros indisponíveis.")
         return
     
-    df_cen = pd.DataFrame(dados['cenarios_financeiros'])
-    
     st.info(f"📌 Cenário: Aumento {filtros['aumento_tarifa']}% | VPL R$ {metricas['vpl']/1e9:.2f}bi")
+    
+    secao_curvas(params_fin, filtros)
+    
     st.markdown("---")
+    secao_monte_carlo(params_fin, filtros)
     
-    st.markdown("### 📊 Valor Presente Líquido")
+    st.markdown("---")
+    secao_implantacao(dados, params_fin, filtros, kpis_base, pacote)
+
+@st.fragment
+def secao_curvas(params_fin, filtros):
+    """Curvas e grade de VPL: o slider de TMA reexecuta só este trecho"""
+    tma = st.slider("Taxa de desconto / TMA (%)", 4.0, 14.0,
+                    params_fin['taxa'] * 100, 0.5) / 100
+    st.markdown("---")
     
-    cores = ['#d32f2f' if v < 0 else '#388e3c' for v in df_cen['vpl']]
+    # Curvas com 1% de resolução, calculadas numa única chamada do motor
+    aumentos = np.arange(0, 101)
+    df_cen = pd.DataFrame(avaliar_cenarios(params_fin, aumentos, tma))
     
-    fig = go.Figure(go.Bar(
-        x=df_cen['aumento_pct'], y=df_cen['vpl']/1e9, marker_color=cores,
-        text=[f"R$ {v/1e9:.2f}bi" for v in df_cen['vpl']], textposition='outside'
-    ))
+    st.markdown("### 📊 Valor Presente Líquido")
     
+    fig = go.Figure(go.Scatter(
+        x=df_cen['aumento_pct'], y=df_cen['vpl']/1e9, mode='lines',
+        line=dict(width=3, color='#388e3c'), name='VPL'
+    ))
     fig.add_hline(y=0, line_dash="dash")
+    fig.add_vline(x=filtros['aumento_tarifa'], line_dash="dot", line_color="#1f77b4",
+                  annotation_text=f"{filtros['aumento_tarifa']}%")
     fig.update_layout(xaxis_title="Aumento (%)", yaxis_title="VPL (R$ bi)", height=400)
     
-    st.plotly_chart(fig, use_container_width=True)
+    grafico('vpl', fig, width='stretch')
     
     c1, c2 = st.columns(2)
     
     with c1:
         st.markdown("### ⏱️ Payback")
         df_pb = df_cen[df_cen['payback_simples'] < 30]
+        df_pbd = df_cen[df_cen['payback_descontado'] < 999]
         
-        fig = go.Figure(go.Scatter(x=df_pb['aumento_pct'], y=df_pb['payback_simples'],
-                                   mode='lines+markers', line=dict(width=3)))
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=df_pb['aumento_pct'], y=df_pb['payback_simples'],
+                                 mode='lines', line=dict(width=3), name='Simples'))
+        fig.add_trace(go.Scatter(x=df_pbd['aumento_pct'], y=df_pbd['payback_descontado'],
+                                 mode='lines', line=dict(width=2, shape='hv'), name='Descontado'))
         fig.add_hline(y=15, line_dash="dash", annotation_text="Vida útil")
         fig.update_layout(height=300)
-        st.plotly_chart(fig, use_container_width=True)
+        grafico('payback', fig, width='stretch')
     
     with c2:
         st.markdown("### 📈 TIR")
@@ -438,16 +768,217 @@ def pagina_viabilidade(dados, metricas, filtros):
         
         if len(df_tir) > 0:
             fig = go.Figure(go.Scatter(x=df_tir['aumento_pct'], y=df_tir['tir'],
-                                       mode='lines+markers', fill='tozeroy'))
-            fig.add_hline(y=8, line_dash="dash", annotation_text="TMA")
+                                       mode='lines', fill='tozeroy'))
+            fig.add_hline(y=tma * 100, line_dash="dash", annotation_text="TMA")
             fig.update_layout(height=300)
-            st.plotly_chart(fig, use_container_width=True)
+            grafico('tir', fig, width='stretch')
+    
+    # VPL para toda a grade aumento x taxa de desconto (uma chamada em lote)
+    st.markdown("### 🗺️ VPL por Aumento e Taxa de Desconto")
+    
+    # Não depende da TMA: a figura fica em cache pelos parâmetros
+    def figura_grade():
+        taxas = np.arange(4.0, 14.01, 0.5)
+        grade = avaliar_cenarios(params_fin, aumentos[None, :], taxas[:, None] / 100)
+        
+        fig = go.Figure(go.Heatmap(
+            x=aumentos, y=taxas, z=grade['vpl']/1e9, zmid=0, colorscale='RdYlGn',
+            colorbar=dict(title="VPL (R$ bi)")
+        ))
+        fig.add_trace(go.Contour(
+            x=aumentos, y=taxas, z=grade['vpl'], showscale=False,
+            contours=dict(start=0, end=0, coloring='none', showlabels=False),
+            line=dict(color='black', width=2, dash='dash'), hoverinfo='skip'
+        ))
+        fig.update_layout(xaxis_title="Aumento (%)", yaxis_title="Taxa de desconto (%)",
+                          height=400)
+        return fig
+    
+    grafico('vpl_grade', figura_grade, chave=tuple(sorted(params_fin.items())),
+            width='stretch')
+
+@st.cache_resource
+def cache_monte_carlo():
+    """Resultados de Monte Carlo por conjunto de parâmetros, entre sessões"""
+    return CacheLRU(maxsize=16)
+
+def rodar_monte_carlo(params_fin, faixas, n_amostras, barra):
+    perfil_atual().falha('monte_carlo')
+    amostras = simular_monte_carlo(
+        params_fin, faixas, n_amostras,
+        progresso=lambda prontos, total: barra.progress(
+            prontos / total, text=f"⏳ Lote {prontos}/{total}")
+    )
+    # Guarda só o resumo e os histogramas já binados (não os sorteios)
+    tir = amostras['tir'][np.isfinite(amostras['tir'])]
+    return {
+        'resumo': resumir_monte_carlo(amostras),
+        'hist_vpl': histograma(amostras['vpl'] / 1e9),
+        'hist_tir': histograma(tir) if len(tir) else None,
+    }
+
+@st.fragment
+def secao_monte_carlo(params_fin, filtros):
+    st.markdown("### 🎲 Análise de Sensibilidade (Monte Carlo)")
+    
+    aumento = filtros['aumento_tarifa']
+    with st.expander("⚙️ Faixas dos sorteios"):
+        c1, c2 = st.columns(2)
+        n_amostras = c1.select_slider("Sorteios", [10_000, 50_000, 100_000, 250_000, 500_000],
+                                      100_000)
+        faixa_aumento = c1.slider("Aumento tarifário (%) - moda no cenário", 0, 150,
+                                  (max(0, aumento - 20), aumento + 20))
+        faixa_novos = c1.slider("Novos usuários (mil)", 0, 200, (0, 200))
+        faixa_custo = c2.slider("Custo dos carregadores (% do orçado)", 50, 200, (80, 130))
+        faixa_taxa = c2.slider("Taxa de desconto (%)", 2.0, 16.0, (6.0, 10.0), 0.5)
+    
+    moda_aumento = min(max(aumento, faixa_aumento[0]), faixa_aumento[1])
+    moda_custo = min(max(100, faixa_custo[0]), faixa_custo[1])
+    faixas = {
+        'novos_usuarios': (faixa_novos[0] * 1000, faixa_novos[1] * 1000),
+        'aumento_pct': (faixa_aumento[0], moda_aumento, faixa_aumento[1]),
+        'custo_carregadores': (faixa_custo[0] / 100, moda_custo / 100, faixa_custo[1] / 100),
+        'taxa': (faixa_taxa[0] / 100, faixa_taxa[1] / 100),
+    }
+    
+    cache = cache_monte_carlo()
+    chave = (n_amostras, tuple(sorted(faixas.items())), tuple(sorted(params_fin.items())))
+    
+    if chave not in cache and not st.button(f"▶️ Rodar {n_amostras:,} sorteios"):
+        st.caption("Sorteia demanda, aumento, custo dos carregadores e taxa de desconto "
+                   "e mostra a distribuição de VPL/TIR.")
+        return
+    
+    barra = st.progress(0.0, text="⏳ Simulando...")
+    with perfil_atual().medir_cache('monte_carlo'):
+        resultado = cache.obter(chave, lambda: rodar_monte_carlo(params_fin, faixas, n_amostras, barra))
+    barra.empty()
+    
+    resumo = resultado['resumo']
+    vpl_p = resumo['vpl_percentis']
+    
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("P(VPL > 0)", f"{resumo['prob_viavel']*100:.1f}%")
+    c2.metric("VPL mediano", f"R$ {vpl_p[50]/1e9:.2f}bi")
+    c3.metric("VPL P5 – P95", f"R$ {vpl_p[5]/1e9:.1f} – {vpl_p[95]/1e9:.1f}bi")
+    if resumo['tir_percentis']:
+        c4.metric("TIR mediana", f"{resumo['tir_percentis'][50]:.1f}%")
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        contagens, bordas = resultado['hist_vpl']
+        negativo = bordas[:-1] + bordas[1:] < 0
+        fig = go.Figure(barras_histograma(
+            contagens, bordas, normalizar=resumo['n'],
+            marker_color=np.where(negativo, '#d32f2f', '#388e3c')
+        ))
+        fig.add_vline(x=0, line_dash="dash")
+        fig.update_layout(title="Distribuição do VPL", xaxis_title="VPL (R$ bi)",
+                          yaxis_title="Sorteios (%)", bargap=0, height=350)
+        grafico('mc_vpl', fig, width='stretch')
+    
+    with col2:
+        rotulos = {
+            'novos_usuarios': 'Novos usuários',
+            'aumento_pct': 'Aumento tarifário',
+            'custo_carregadores': 'Custo carregadores',
+            'taxa': 'Taxa de desconto',
+        }
+        sens = sorted(resumo['sensibilidade'].items(), key=lambda x: abs(x[1]))
+        fig = go.Figure(go.Bar(
+            x=[v for _, v in sens], y=[rotulos[k] for k, _ in sens], orientation='h',
+            marker_color=['#d32f2f' if v < 0 else '#388e3c' for _, v in sens]
+        ))
+        fig.update_layout(title="Sensibilidade do VPL (Spearman)", xaxis_range=[-1, 1],
+                          height=350)
+        grafico('mc_sensibilidade', fig, width='stretch')
+
+@st.fragment
+def secao_implantacao(dados, params_fin, filtros, kpis_base, pacote):
+    """Cronograma de troca da frota por garagem/operadora com orçamento e MVA anuais"""
+    st.markdown("### 🚌 Cronograma de Implantação")
+    
+    c1, c2, c3 = st.columns(3)
+    orcamento = c1.slider("Orçamento anual (R$ bi)", 0.5, 5.0, 1.5, 0.1) * 1e9
+    limite_mva = c2.slider("Nova potência por ano (MVA, 0 = sem limite)", 0, 100, 30, 5)
+    anos_plano = c3.slider("Anos do plano", 1, 15, PREMISSAS_IMPLANTACAO['anos_plano'])
+    premissas = {'anos_plano': anos_plano}
+    
+    try:
+        with perfil_atual().medir_cache('km_operadoras'):
+            km_operadora = carregar_km_operadoras(pacote.versao, pacote)
+    except LookupError:
+        km_operadora = None
+    
+    beneficio = float(avaliar_cenarios(params_fin, filtros['aumento_tarifa'])['beneficio_anual'])
+    emissoes = kpis_base.get('emissoes_evitadas_ton', 0)
+    
+    inicio = time.perf_counter()
+    with perfil_atual().medir('cronograma'):
+        frentes = tabela_frentes(dados, params_fin, km_operadora)
+        plano = planejar(frentes, orcamento, limite_mva or None, premissas)
+        anual = trajetoria(plano, params_fin, beneficio, emissoes, premissas)
+        # Referência: a frota inteira no ano 0 (o cenário financeiro)
+        imediato = trajetoria(planejar(frentes, np.inf, premissas=premissas), params_fin,
+                              beneficio, emissoes, premissas)
+    tempo_ms = (time.perf_counter() - inicio) * 1000
+    
+    total = int(frentes['onibus'].sum())
+    feitos = int(anual['onibus_novos'].sum())
+    fim = anual.loc[anual['onibus_novos'] > 0, 'ano'].max() if feitos else None
+    
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Ônibus no plano", f"{feitos:,} de {total:,}")
+    c2.metric("Frota completa em", f"{fim}" if feitos == total else "fora do plano")
+    c3.metric("VPL escalonado", f"R$ {anual['vpl_acumulado'].iloc[-1]/1e9:.2f}bi",
+              f"{(anual['vpl_acumulado'].iloc[-1] - imediato['vpl_acumulado'].iloc[-1])/1e9:+.2f}bi "
+              "vs. tudo no ano 0")
+    c4.metric("Emissões evitadas (total)", f"{anual['emissoes_evitadas_ton'].sum()/1e6:.2f} Mt")
+    
+    if feitos < total:
+        st.warning(f"⚠️ {total - feitos:,} ônibus não cabem no orçamento/potência em "
+                   f"{anos_plano} anos.")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=anual['ano'], y=anual['capex'] / 1e9, name='CAPEX (R$ bi)'))
+        fig.add_trace(go.Scatter(x=anual['ano'], y=anual['onibus_acumulados'],
+                                 name='Ônibus elétricos', yaxis='y2', mode='lines+markers'))
+        fig.update_layout(height=350, yaxis_title="CAPEX (R$ bi)",
+                          yaxis2=dict(title="Ônibus", overlaying='y', side='right'),
+                          legend=dict(orientation='h', y=-0.2))
+        grafico('implantacao_capex', fig, width='stretch')
+    
+    with col2:
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=anual['ano'], y=anual['vpl_acumulado'] / 1e9,
+                                 name='Escalonado', mode='lines', line=dict(width=3)))
+        fig.add_trace(go.Scatter(x=imediato['ano'], y=imediato['vpl_acumulado'] / 1e9,
+                                 name='Tudo no ano 0', mode='lines', line=dict(dash='dot')))
+        fig.add_hline(y=0, line_dash="dash")
+        fig.update_layout(height=350, yaxis_title="VPL acumulado (R$ bi)",
+                          legend=dict(orientation='h', y=-0.2))
+        grafico('implantacao_vpl', fig, width='stretch')
+    
+    # Ônibus por operadora e ano do plano
+    agendados = plano[plano['indice_ano'].notna()]
+    tabela = (agendados.assign(ano=PREMISSAS_IMPLANTACAO['ano_inicial']
+                               + agendados['indice_ano'].astype(int))
+              .pivot_table(index='operadora', columns='ano', values='onibus', aggfunc='sum',
+                           fill_value=0))
+    tabela.columns = tabela.columns.astype(str)
+    st.dataframe(tabela, width='stretch')
+    st.caption(f"⏱️ {len(plano):,} lotes de até {PREMISSAS_IMPLANTACAO['tamanho_lote']} "
+               f"ônibus planejados em {tempo_ms:.1f} ms")
 
 # ============================================================================
 # ANÁLISE OPERACIONAL (NOVA!)
 # ============================================================================
 
-def pagina_analise_operacional(metricas, kpis_base):
+def pagina_analise_operacional(metricas, kpis_base, filtros, pacote, df_paradas):
     """Análise Operacional com Rankings REAIS"""
     
     st.title("📊 Análise Operacional")
@@ -463,35 +994,35 @@ def pagina_analise_operacional(metricas, kpis_base):
     st.markdown("---")
     
     # ========================================================================
-    # RANKINGS COM DADOS REAIS
+    # RANKINGS COM DADOS REAIS (pré-calculados; aqui só o recorte TOP 10)
     # ========================================================================
     
-    # TOP 10 LINHAS MAIS LONGAS
+    try:
+        with perfil_atual().medir_cache('rankings'):
+            rankings, erros = carregar_rankings(pacote.versao, pacote)
+    except Exception as e:
+        st.warning(f"⚠️ Não foi possível carregar dados: {e}")
+        return
+    
+    ops_sel = filtros['operadoras']
+    item = filtros.get('busca')
+    if item and item['tipo'] == 'linha':
+        # Linha buscada: rankings só da operadora dela, com a posição da linha
+        ops_sel = [item['operadora']]
+        posicoes = []
+        for nome, chave in (('distância', 'linhas_longas'), ('demanda', 'demanda')):
+            posicao = posicao_linha(rankings[chave], item) if chave in rankings else None
+            if posicao:
+                posicoes.append(f"**{posicao}º** em {nome}")
+        st.info(f"🔎 Linha **{item['rotulo']}**: rankings filtrados pela operadora "
+                f"**{item['operadora']}**" + (f" ({', '.join(posicoes)})" if posicoes else ""))
+    
+    # TOP 10 LINHAS MAIS LONGAS (sem a 206.1 da MARECHAL)
     st.markdown("### 🚌 TOP 10 Linhas Mais Longas")
     
-    # ... seu código anterior ...
-
-    try:
-        df_consolidado = pd.read_excel('dados_consolidados.xlsx')
-
-        # ... (após ler o df_consolidado)
-
-        # Filtro para excluir a linha 206.1 da Marechal
-        # Usamos o operador ~ para "negar" a condição (trazer tudo que NÃO seja isso)
-        df_consolidado = df_consolidado[~((df_consolidado['linha_nome'].astype(str) == '206.1') & 
-                                        (df_consolidado['operadora'] == 'MARECHAL'))]
-
-               
-        # Calcula distância total
-        df_consolidado['km_total'] = df_consolidado['km_ida_circular'] + df_consolidado['km_volta']
-        
-        # 1. Pegamos o Top 10 e garantimos que a coluna 'linha_nome' seja STRING (Texto)
-        # Isso evita que o Plotly trate o eixo Y como uma escala numérica
-        top_longas = df_consolidado.nlargest(10, 'km_total')[['linha_nome', 'operadora', 'km_total']].copy()
-        top_longas['linha_nome'] = top_longas['linha_nome'].astype(str)
-        
-        # 2. Ordenamos para que a maior fique no topo no gráfico de barras horizontais
-        # O Plotly renderiza de baixo para cima, então ordenamos de forma crescente para o maior aparecer em cima
+    if 'linhas_longas' in rankings:
+        # Ordem crescente: o Plotly desenha de baixo para cima, a maior fica no topo
+        top_longas = top_n(rankings['linhas_longas'], 10, ops_sel)
         top_longas = top_longas.sort_values(by='km_total', ascending=True)
 
         fig = px.bar(
@@ -506,51 +1037,22 @@ def pagina_analise_operacional(metricas, kpis_base):
             category_orders={"linha_nome": top_longas['linha_nome'].tolist()}
         )
         
-        # 3. Ajuste adicional para garantir que todos os nomes apareçam
+        # Garante que todos os nomes apareçam
         fig.update_yaxes(type='category')
         
         fig.update_layout(height=500) # Aumentei um pouco para não cortar os nomes
-        st.plotly_chart(fig, use_container_width=True)
-
-    except Exception as e:
-        st.warning(f"⚠️ Não foi possível carregar dados: {e}")
-        
-        st.markdown("---")
+        grafico('linhas_longas', fig, width='stretch')
+    else:
+        st.warning(f"⚠️ Não foi possível carregar dados: {erros['linhas_longas']}")
     
-    # TOP 10 LINHAS COM MAIOR DEMANDA
+    # TOP 10 LINHAS COM MAIOR DEMANDA (sem a 0.808 da URBI)
     st.markdown("### 📈 TOP 10 Linhas com Maior Demanda")
 
-    try:
-        # 1. Carregar as duas bases
-        df_horarios = pd.read_csv('horarios_expandidos.csv')
-        df_consolidado = pd.read_excel('dados_consolidados.xlsx')
-
-        # 2. Preparar as colunas para o merge (garantir que ambas sejam string)
-        df_horarios['linha_nome'] = df_horarios['linha_nome'].astype(str)
-        df_consolidado['linha_nome'] = df_consolidado['linha_nome'].astype(str)
-
-        # 3. Mesclar as bases para trazer 'operadora' e 'cor_companhia_x' para os horários
-        # Usamos 'left' para manter todos os horários, mesmo que a linha não esteja no consolidado
-        df_merged = pd.merge(
-            df_horarios, 
-            df_consolidado[['linha_nome', 'operadora', 'cor_companhia_x']], 
-            on='linha_nome', 
-            how='left'
-        )
-
-        # 4. FILTRO: Desconsiderar a linha 0.808 da URBI
-        # Usamos o ~ para manter tudo que NÃO atenda a essa condição específica
-        df_merged = df_merged[~((df_merged['linha_nome'] == '0.808') & 
-                                (df_merged['operadora'] == 'URBI'))]
-
-        # 5. Agora sim, agrupar incluindo as informações da operadora
-        demanda = df_merged.groupby(['linha_nome', 'operadora', 'cor_companhia_x']).size().reset_index(name='horarios_semana')
-        
-        # 6. Pegar o Top 10 e ordenar
-        top_demanda = demanda.nlargest(10, 'horarios_semana').copy()
+    if 'demanda' in rankings:
+        top_demanda = top_n(rankings['demanda'], 10, ops_sel)
         top_demanda = top_demanda.sort_values(by='horarios_semana', ascending=True)
 
-        # 7. Criar um mapa de cores para o Plotly usar as cores oficiais 'cor_companhia_x'
+        # Cores oficiais 'cor_companhia_x' de cada operadora
         cores_map = dict(zip(top_demanda['operadora'], top_demanda['cor_companhia_x']))
 
         fig = px.bar(
@@ -567,23 +1069,15 @@ def pagina_analise_operacional(metricas, kpis_base):
         fig.update_yaxes(type='category')
         fig.update_layout(height=450, showlegend=True)
         
-        st.plotly_chart(fig, use_container_width=True)
-
-    except Exception as e:
-        st.warning(f"⚠️ Erro ao processar demanda: {e}")
+        grafico('demanda', fig, width='stretch')
+    else:
+        st.warning(f"⚠️ Erro ao processar demanda: {erros['demanda']}")
     
     # TOP 10 OPERADORAS POR FROTA
     st.markdown("### 🚌 TOP 10 Operadoras por Frota Elétrica")
     
-    try:
-        df_frota = pd.read_excel(
-            'analise_frota_completa.xlsx',
-            sheet_name='Investimento'
-        )
-        
-        # Soma frota por operadora
-        frota_op = df_frota.groupby('operadora')['frota_total'].sum().reset_index()
-        top_frota = frota_op.nlargest(10, 'frota_total')
+    if 'frota' in rankings:
+        top_frota = top_n(rankings['frota'], 10, ops_sel)
         
         fig = px.bar(
             top_frota,
@@ -596,34 +1090,415 @@ def pagina_analise_operacional(metricas, kpis_base):
             color_continuous_scale='Blues'
         )
         fig.update_layout(height=400)
-        st.plotly_chart(fig, width='stretch')
-        
-    except Exception as e:
+        grafico('frota', fig, width='stretch')
+    else:
+        st.warning(f"⚠️ Não foi possível carregar dados: {erros['frota']}")
+    
+    parada = int(item['posicao']) if item and item['tipo'] == 'parada' else None
+    secao_viagens_paradas(pacote, df_paradas, parada)
+
+def posicao_linha(ranking, item):
+    """Posição (1 = topo) da linha no ranking da operadora dela; None se não estiver"""
+    da_operadora = ranking[ranking['operadora'] == item['operadora']]
+    posicoes = np.flatnonzero(da_operadora['linha_nome'].astype(str).to_numpy() == item['linha'])
+    return int(posicoes[0]) + 1 if len(posicoes) else None
+
+@st.fragment
+def secao_viagens_paradas(pacote, df_paradas, parada_busca=None):
+    """Paradas mais servidas e perfil horário de uma parada (matriz pré-calculada no pacote)"""
+    st.markdown("### 🚏 Viagens por Parada e Hora")
+    
+    with perfil_atual().medir_cache('viagens'):
+        viagens, erro = carregar_viagens(pacote.versao, pacote)
+    if viagens is None:
+        st.warning(f"⚠️ Não foi possível carregar dados: {erro}")
+        return
+    
+    mais_servidas = paradas_mais_servidas(viagens, df_paradas, 50)
+    col1, col2 = st.columns([2, 3])
+    
+    with col1:
+        st.dataframe(
+            mais_servidas.head(10).drop(columns='parada').rename(columns={
+                'stop_name': 'Parada', 'viagens_semana': 'Viagens/Semana',
+                'hora_pico': 'Hora de Pico'}),
+            hide_index=True, width='stretch')
+    
+    with col2:
+        nomes = dict(zip(mais_servidas['parada'].tolist(), mais_servidas['stop_name']))
+        indice = 0
+        if parada_busca is not None:
+            # Parada da busca entra na lista (se não for uma das 50) e vem selecionada
+            nomes.setdefault(parada_busca, df_paradas['stop_name'].iat[parada_busca])
+            indice = list(nomes).index(parada_busca)
+        parada = st.selectbox("Parada (50 mais servidas)", list(nomes), format_func=nomes.get,
+                              index=indice)
+        fig = px.bar(
+            x=np.arange(viagens.shape[1]),
+            y=viagens[parada],
+            title=f"Viagens por Hora (semana) - {nomes[parada]}",
+            labels={'x': 'Hora', 'y': 'Viagens'}
+        )
+        fig.update_xaxes(dtick=1)
+        fig.update_layout(height=350)
+        grafico('viagens_parada', fig, width='stretch')
+
+# ============================================================================
+# INFRAESTRUTURA DE RECARGA
+# ============================================================================
+
+@st.fragment
+def pagina_infraestrutura(dados, filtros, pacote):
+    st.title("⚡ Infraestrutura de Recarga")
+    
+    if not dados.get('garagens') and not dados.get('terminais'):
+        st.warning("Dados de garagens/terminais indisponíveis.")
+        return
+    
+    locais = tabela_locais(dados.get('garagens', []), dados.get('terminais', []))
+    
+    with st.expander("⚙️ Premissas", expanded=True):
+        c1, c2, c3 = st.columns(3)
+        potencia = c1.select_slider("Potência do carregador (kW)", [60, 80, 120, 160, 180, 240, 360],
+                                    int(PREMISSAS_PADRAO['potencia_kw']))
+        janela = c1.slider("Janela de recarga na garagem (h)", 2.0, 10.0,
+                           PREMISSAS_PADRAO['janela_h'], 0.5)
+        km_dia = c2.slider("KM por ônibus/dia", 100, 400, int(PREMISSAS_PADRAO['km_dia']), 10)
+        consumo = c2.slider("Consumo (kWh/km)", 0.8, 2.5, PREMISSAS_PADRAO['consumo_kwh_km'], 0.05)
+        simult = c3.slider("Carregadores por ônibus no pico (terminais)", 0.1, 1.0,
+                           PREMISSAS_PADRAO['simultaneidade_terminal'], 0.05)
+        custo_carr = c3.number_input("Custo por carregador (R$ mil)", 100, 5000,
+                                     int(PREMISSAS_PADRAO['custo_carregador'] / 1000), 10)
+    
+    premissas = {
+        'potencia_kw': float(potencia),
+        'janela_h': janela,
+        'km_dia': float(km_dia),
+        'consumo_kwh_km': consumo,
+        'simultaneidade_terminal': simult,
+        'custo_carregador': custo_carr * 1000.0,
+    }
+    
+    otimizar_opcoes = st.checkbox("Otimizar a potência do carregador em cada local")
+    if otimizar_opcoes:
+        c1, c2 = st.columns([2, 1])
+        opcoes = c1.data_editor(OPCOES_CARREGADOR.assign(
+            custo_carregador=OPCOES_CARREGADOR['custo_carregador'] / 1000
+        ).rename(columns={'potencia_kw': 'Potência (kW)', 'custo_carregador': 'Custo (R$ mil)'}),
+            num_rows='dynamic', hide_index=True)
+        opcoes = pd.DataFrame({
+            'potencia_kw': opcoes['Potência (kW)'],
+            'custo_carregador': opcoes['Custo (R$ mil)'] * 1000,
+        }).dropna()
+        opcoes = opcoes[opcoes['potencia_kw'] > 0]
+        limite = c2.number_input("Limite de conexão por local (MVA, 0 = sem limite)",
+                                 0.0, 50.0, 0.0, 0.5)
+    
+    inicio = time.perf_counter()
+    with perfil_atual().medir('dimensionamento'):
+        if otimizar_opcoes and len(opcoes):
+            resultado = otimizar(locais, premissas, opcoes, limite_mva=limite or None)
+        else:
+            resultado = dimensionar(locais, premissas)
+            resultado['potencia_carregador_kw'] = np.full(len(locais), float(potencia))
+            resultado['viavel'] = np.ones(len(locais), dtype=bool)
+    tempo_ms = (time.perf_counter() - inicio) * 1000
+    
+    df = locais.assign(**{chave: resultado[chave] for chave in (
+        'carregadores', 'potencia_mva', 'custo_total', 'potencia_carregador_kw', 'viavel')})
+    
+    # Garagens seguem o filtro de operadoras; terminais são compartilhados
+    ops_sel = filtros['operadoras']
+    if ops_sel:
+        df = df[(df['tipo'] == 'terminal') | df['operadora'].isin(ops_sel)]
+    
+    custo_atual = df['custo_atual'].sum()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Carregadores", f"{int(df['carregadores'].sum()):,}",
+              f"{int(df['carregadores'].sum() - df['carregadores_atual'].sum()):+,}")
+    c2.metric("Potência total", f"{df['potencia_mva'].sum():.1f} MVA")
+    c3.metric("Custo total", f"R$ {df['custo_total'].sum()/1e6:,.1f}M",
+              f"{(df['custo_total'].sum() - custo_atual)/1e6:+,.1f}M", delta_color='inverse')
+    c4.metric("Locais", f"{len(df)}")
+    
+    if not df['viavel'].all():
+        st.warning(f"⚠️ {int((~df['viavel']).sum())} local(is) sem opção dentro do limite de MVA "
+                   "(mostrando a de menor potência).")
+    
+    st.dataframe(
+        df[['tipo', 'nome', 'operadora', 'onibus', 'potencia_carregador_kw', 'carregadores',
+            'carregadores_atual', 'potencia_mva', 'custo_total', 'custo_atual']]
+        .sort_values('custo_total', ascending=False),
+        column_config={
+            'tipo': 'Tipo', 'nome': 'Local', 'operadora': 'Operadora', 'onibus': 'Ônibus',
+            'potencia_carregador_kw': st.column_config.NumberColumn('Carregador (kW)', format='%d'),
+            'carregadores': st.column_config.NumberColumn('Carregadores', format='%d'),
+            'carregadores_atual': st.column_config.NumberColumn('Atual', format='%d'),
+            'potencia_mva': st.column_config.NumberColumn('MVA', format='%.2f'),
+            'custo_total': st.column_config.NumberColumn('Custo (R$)', format='%.0f'),
+            'custo_atual': st.column_config.NumberColumn('Custo atual (R$)', format='%.0f'),
+        },
+        hide_index=True, width='stretch',
+    )
+    st.caption(f"⏱️ Dimensionamento de {len(locais)} locais em {tempo_ms:.1f} ms")
+    
+    st.markdown("---")
+    secao_autonomia(dados, filtros, pacote, consumo)
+    st.markdown("---")
+    
+    # CURVAS DE CARGA (passos de 15 min, com os carregadores dimensionados acima)
+    st.markdown("### ⏱️ Curvas de Carga (15 min)")
+    
+    try:
+        with perfil_atual().medir_cache('km_operadoras'):
+            km_operadora = carregar_km_operadoras(pacote.versao, pacote)
+    except LookupError as e:
         st.warning(f"⚠️ Não foi possível carregar dados: {e}")
+        return
+    with perfil_atual().medir_cache('viagens'):
+        viagens, _ = carregar_viagens(pacote.versao, pacote)
+    
+    inicio_ponta, fim_ponta = PONTA_TARIFARIA
+    evitar_ponta = st.checkbox(
+        f"Garagens não recarregam no horário de ponta ({inicio_ponta:.0f}h às {fim_ponta:.0f}h)")
+    st.caption("Perfil de serviço: " + ("viagens por hora dos horários" if viagens is not None
+                                        else "perfil típico de dia útil"))
+    
+    inicio = time.perf_counter()
+    with perfil_atual().medir('simulacao_carga'):
+        carga, nao_reposta = simular_carga(
+            locais, km_operadora, resultado['carregadores'], resultado['potencia_carregador_kw'],
+            {**premissas, 'evitar_ponta': evitar_ponta},
+            viagens.sum(axis=0) if viagens is not None else None)
+    tempo_ms = (time.perf_counter() - inicio) * 1000
+    
+    # Mesmo recorte de locais da tabela acima
+    visiveis = df.index.to_numpy()
+    carga = carga[visiveis]
+    resumo = resumo_carga(locais.loc[visiveis], carga, nao_reposta[visiveis])
+    horas = horas_passos()
+    total = carga.sum(axis=0)
+    energia = resumo['energia_dia_kwh'].sum()
+    
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Pico simultâneo", f"{total.max(initial=0.0)/1000:,.1f} MW",
+              f"às {texto_hora(horas[total.argmax()])}", delta_color='off')
+    c2.metric("Energia/dia", f"{energia/1000:,.0f} MWh")
+    c3.metric("Na ponta", f"{resumo['energia_ponta_kwh'].sum() / max(energia, 1e-9) * 100:.1f}%")
+    c4.metric("Não reposta/dia", f"{resumo['nao_reposta_kwh'].sum()/1000:,.1f} MWh")
+    
+    if resumo['nao_reposta_kwh'].sum() > 0:
+        st.warning("⚠️ Há garagens em que os carregadores não repõem a energia do dia "
+                   "com o km real das linhas.")
+    
+    fig = go.Figure()
+    for tipo, nome in (('garagem', 'Garagens'), ('terminal', 'Terminais')):
+        do_tipo = (resumo['tipo'] == tipo).to_numpy()
+        fig.add_trace(go.Scatter(x=horas, y=carga[do_tipo].sum(axis=0) / 1000, name=nome,
+                                 stackgroup='carga', mode='lines'))
+    fig.add_vrect(x0=inicio_ponta, x1=fim_ponta, fillcolor='red', opacity=0.1, line_width=0,
+                  annotation_text="Ponta", annotation_position='top left')
+    fig.update_layout(height=400, xaxis_title="Hora", yaxis_title="Carga (MW)",
+                      xaxis=dict(dtick=2, range=[0, 24]))
+    grafico('curvas_carga', fig, width='stretch')
+    
+    st.dataframe(
+        resumo[['tipo', 'nome', 'pico_kw', 'hora_pico', 'energia_dia_kwh', 'pct_ponta',
+                'nao_reposta_kwh']].sort_values('pico_kw', ascending=False)
+        .assign(hora_pico=lambda r: r['hora_pico'].map(texto_hora)),
+        column_config={
+            'tipo': 'Tipo', 'nome': 'Local',
+            'pico_kw': st.column_config.NumberColumn('Pico (kW)', format='%.0f'),
+            'hora_pico': 'Hora do pico',
+            'energia_dia_kwh': st.column_config.NumberColumn('Energia/dia (kWh)', format='%.0f'),
+            'pct_ponta': st.column_config.NumberColumn('% na ponta', format='%.1f'),
+            'nao_reposta_kwh': st.column_config.NumberColumn('Não reposta (kWh)', format='%.0f'),
+        },
+        hide_index=True, width='stretch',
+    )
+    st.caption(f"⏱️ Simulação de {int(df['onibus'][df['tipo'] == 'garagem'].sum()):,} ônibus "
+               f"em {len(horas)} passos em {tempo_ms:.1f} ms")
+
+ROTULOS_SITUACAO = {
+    'garagem': 'Só garagem', 'oportunidade': 'Com oportunidade', 'inviavel': 'Inviável',
+}
+
+@st.fragment
+def secao_autonomia(dados, filtros, pacote, consumo):
+    """Viabilidade de bateria de todas as linhas; só este trecho reexecuta nos controles"""
+    st.markdown("### 🔋 Autonomia das Linhas")
+    
+    with st.expander("⚙️ Bateria e operação"):
+        c1, c2, c3 = st.columns(3)
+        capacidade = c1.slider("Bateria (kWh)", 200, 700,
+                               int(PREMISSAS_AUTONOMIA['capacidade_kwh']), 10)
+        janela_soc = c1.slider("Fração útil da bateria", 0.5, 1.0,
+                               PREMISSAS_AUTONOMIA['janela_soc'], 0.05)
+        velocidade = c2.slider("Velocidade média (km/h)", 10.0, 40.0,
+                               PREMISSAS_AUTONOMIA['velocidade_kmh'], 1.0)
+        parada = c2.slider("Parada no terminal (min)", 0.0, 30.0,
+                           PREMISSAS_AUTONOMIA['parada_terminal_min'], 1.0)
+        potencia_terminal = c3.select_slider("Carregador de oportunidade (kW)",
+                                             [150, 300, 450, 600],
+                                             int(PREMISSAS_AUTONOMIA['potencia_terminal_kw']))
+        dia = c3.selectbox("Dia", DIAS, format_func=str.capitalize)
+    
+    premissas = {
+        'capacidade_kwh': float(capacidade),
+        'janela_soc': janela_soc,
+        'consumo_kwh_km': consumo,
+        'velocidade_kmh': velocidade,
+        'parada_terminal_min': parada,
+        'potencia_terminal_kw': float(potencia_terminal),
+    }
+    
+    try:
+        inicio = time.perf_counter()
+        with perfil_atual().medir_cache('autonomia'):
+            linhas = avaliar_autonomia(pacote.versao, dia, tuple(sorted(premissas.items())),
+                                       pacote, dados)
+        tempo_ms = (time.perf_counter() - inicio) * 1000
+    except LookupError as e:
+        st.warning(f"⚠️ Não foi possível carregar dados: {e}")
+        return
+    
+    if filtros['operadoras']:
+        linhas = linhas[linhas['operadora'].isin(filtros['operadoras'])]
+    servico = linhas[linhas['situacao'] != 'sem_servico']
+    contagem = servico['situacao'].value_counts()
+    viaveis = contagem.get('garagem', 0) + contagem.get('oportunidade', 0)
+    
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Linhas viáveis", f"{viaveis / max(len(servico), 1) * 100:.1f}%",
+              f"{len(servico)} linhas com serviço", delta_color='off')
+    c2.metric("Só recarga na garagem", f"{contagem.get('garagem', 0)}")
+    c3.metric("Precisam de oportunidade", f"{contagem.get('oportunidade', 0)}")
+    c4.metric("Inviáveis", f"{contagem.get('inviavel', 0)}")
+    
+    resumo = resumo_por_operadora(linhas)
+    fig = go.Figure([
+        go.Bar(x=resumo['operadora'], y=resumo[situacao], name=rotulo)
+        for situacao, rotulo in ROTULOS_SITUACAO.items()
+    ])
+    fig.update_layout(barmode='stack', height=400, yaxis_title="Linhas",
+                      legend=dict(orientation='h', y=-0.25))
+    grafico('autonomia', fig, width='stretch')
+    
+    c1, c2 = st.columns([3, 2])
+    with c1:
+        st.dataframe(
+            resumo[['operadora', 'linhas', 'garagem', 'oportunidade', 'inviavel', 'pct_viavel',
+                    'onibus', 'energia_dia_kwh']],
+            column_config={
+                'operadora': 'Operadora', 'linhas': 'Linhas',
+                'garagem': 'Só garagem', 'oportunidade': 'Oportunidade', 'inviavel': 'Inviáveis',
+                'pct_viavel': st.column_config.NumberColumn('% viável', format='%.1f'),
+                'onibus': st.column_config.NumberColumn('Ônibus', format='%.0f'),
+                'energia_dia_kwh': st.column_config.NumberColumn('Energia/dia (kWh)',
+                                                                 format='%.0f'),
+            },
+            hide_index=True, width='stretch',
+        )
+    with c2:
+        st.markdown("**Linhas com maior energia por ônibus**")
+        st.dataframe(
+            servico.nlargest(10, 'energia_onibus_kwh')[
+                ['linha', 'operadora', 'km_por_onibus', 'energia_onibus_kwh', 'situacao']],
+            column_config={
+                'linha': 'Linha', 'operadora': 'Operadora',
+                'km_por_onibus': st.column_config.NumberColumn('km/ônibus', format='%.0f'),
+                'energia_onibus_kwh': st.column_config.NumberColumn('kWh/ônibus', format='%.0f'),
+                'situacao': 'Situação',
+            },
+            hide_index=True, width='stretch',
+        )
+    st.caption(f"⏱️ {len(linhas)} linhas avaliadas em {tempo_ms:.1f} ms (bateria útil "
+               f"{capacidade * janela_soc:.0f} kWh)")
+
+# ============================================================================
+# PERFIL (DEBUG)
+# ============================================================================
+
+# Arquivo JSON lines onde cada execução é acrescentada (opcional)
+ARQUIVO_PERFIL = os.environ.get('DASHBOARD_PERFIL_JSONL')
+
+def painel_perfil(perfil):
+    """Painel de tempos/caches/payloads da execução, ligado por um toggle na sidebar"""
+    if ARQUIVO_PERFIL:
+        perfil.exportar_jsonl(ARQUIVO_PERFIL)
+    
+    st.sidebar.markdown("---")
+    if not st.sidebar.toggle("🛠️ Perfil de desempenho", key='painel_perfil',
+                             help="Tempos de cada etapa da última execução, acertos de "
+                                  "cache e tamanho dos gráficos/mapa"):
+        return
+    
+    st.sidebar.caption(f"⏱️ Execução: {perfil.total_ms():,.0f} ms ({perfil.rotulo})")
+    spans = perfil.tabela_spans()
+    spans['span'] = [('· ' * n) + nome.rsplit('/', 1)[-1]
+                     for n, nome in zip(spans['nivel'], spans['span'])]
+    st.sidebar.dataframe(
+        spans[['span', 'duracao_ms', 'pct']],
+        column_config={
+            'span': 'Etapa',
+            'duracao_ms': st.column_config.NumberColumn('ms', format='%.1f'),
+            'pct': st.column_config.ProgressColumn('%', format='%.0f%%',
+                                                   min_value=0, max_value=100),
+        },
+        hide_index=True, width='stretch',
+    )
+    st.sidebar.dataframe(perfil.tabela_caches(), hide_index=True, width='stretch')
+    if perfil.payloads:
+        st.sidebar.dataframe(
+            perfil.tabela_payloads(),
+            column_config={'item': 'Payload', 'kb': st.column_config.NumberColumn('KB', format='%.1f')},
+            hide_index=True, width='stretch',
+        )
+    else:
+        st.sidebar.caption("Nenhum gráfico ou mapa nesta execução.")
+    st.sidebar.download_button("⬇️ Exportar (JSON lines)", perfil.jsonl(),
+                               file_name='perfil.jsonl', mime='application/jsonl')
 
 # ============================================================================
 # MAIN
 # ============================================================================
 
 def main():
-    dados, kpis_base, config, df_paradas = carregar_dados()
-    filtros = criar_sidebar(dados)
-    metricas = calcular_metricas_filtradas(filtros, kpis_base, dados)
-    
-    tab1, tab2, tab3 = st.tabs([
-        "🏠 Home & Mapa",
-        "💰 Viabilidade Econômica",
-        "📊 Análise Operacional"
+    # Perfil novo a cada execução completa (fragmentos acrescentam ao último)
+    perfil = Perfil(detalhado=st.session_state.get('painel_perfil', False))
+    st.session_state['perfil'] = perfil
+    
+    with perfil.medir('carregar_dados'):
+        pacote, dados, kpis_base, config, df_paradas = carregar_dados()
+    with perfil.medir_cache('indice_busca'):
+        busca = criar_indice_busca(pacote.versao, df_paradas, pacote)
+    with perfil.medir('sidebar'):
+        filtros = criar_sidebar(dados, busca)
+    with perfil.medir_cache('matriz_kpis'):
+        matriz_kpis = carregar_matriz_kpis(pacote.versao, pacote, dados, kpis_base)
+    with perfil.medir('metricas'):
+        params_fin = calibrar_parametros(dados, kpis_base)
+        metricas = calcular_metricas_filtradas(filtros, kpis_base, dados, matriz_kpis, params_fin)
+    
+    # Só a página ativa executa; os widgets de cada página rodam em fragmentos
+    pagina = st.navigation([
+        st.Page(lambda: pagina_home(metricas, filtros, dados, df_paradas, config, kpis_base,
+                                    pacote),
+                title="Home & Mapa", icon="🏠", url_path="home", default=True),
+        st.Page(lambda: pagina_viabilidade(dados, metricas, filtros, params_fin, kpis_base,
+                                           pacote),
+                title="Viabilidade Econômica", icon="💰", url_path="viabilidade"),
+        st.Page(lambda: pagina_analise_operacional(metricas, kpis_base, filtros, pacote,
+                                                    df_paradas),
+                title="Análise Operacional", icon="📊", url_path="operacional"),
+        st.Page(lambda: pagina_infraestrutura(dados, filtros, pacote),
+                title="Infraestrutura", icon="⚡", url_path="infraestrutura"),
     ])
+    perfil.rotulo = pagina.title
+    with perfil.medir(f'pagina:{pagina.title}'):
+        pagina.run()
     
-    with tab1:
-        pagina_home(metricas, filtros, dados, df_paradas, config, kpis_base)
-    
-    with tab2:
-        pagina_viabilidade(dados, metricas, filtros)
-    
-    with tab3:
-        pagina_analise_operacional(metricas, kpis_base)
+    painel_perfil(perfil)
 
 if __name__ == "__main__":
     main()
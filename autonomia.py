@@ -0,0 +1,146 @@
+"""
+AUTONOMIA - ENERGIA E BATERIA POR LINHA
+=======================================
+Avalia, para todas as linhas do consolidado de uma vez (NumPy), se um ônibus
+elétrico cumpre a jornada só com a recarga noturna na garagem, se precisa de
+recarga de oportunidade no terminal ou se a linha é inviável com a bateria
+das premissas.
+
+Modelo por linha, num dia da semana (`seg`, ..., `dom`):
+- km do dia = km_ida_circular x viagens de ida + km_volta x viagens de volta
+  (as mesmas contagens dos horários que geram `<dia>_km`)
+- ciclo = ida + volta (circular: só a ida); tempo de ciclo = km do ciclo /
+  velocidade média + uma parada no terminal por sentido
+- ônibus na linha = ceil(tempo de ciclo / intervalo no pico), com o
+  intervalo médio do dia (janela de operação / viagens por sentido) dividido
+  pelo fator de pico; com a frota em operação de cada operadora
+  (`frota_operacao`) os ônibus das linhas são reescalados para que o dia
+  útil (segunda) some a frota real, e o mesmo fator vale nos outros dias
+  (ônibus que rodam em mais de uma linha viram frações)
+- energia por ônibus = km do dia / ônibus x consumo (articulados x fator)
+- bateria útil = capacidade x janela de estado de carga
+- oportunidade: cada parada no terminal repõe potência x minutos de parada
+
+Situação: 'garagem' (energia por ônibus cabe na bateria útil),
+'oportunidade' (cabe com a recarga nos terminais e um ciclo cabe na
+bateria), 'inviavel' ou 'sem_servico' (sem viagens no dia).
+"""
+
+import numpy as np
+import pandas as pd
+
+from infraestrutura import PREMISSAS_PADRAO
+
+DIAS = ('seg', 'ter', 'qua', 'qui', 'sex', 'sab', 'dom')
+SITUACOES = ('garagem', 'oportunidade', 'inviavel', 'sem_servico')
+
+PREMISSAS_AUTONOMIA = {
+    'capacidade_kwh': 400.0,          # bateria nominal por ônibus
+    'janela_soc': 0.80,               # fração útil da bateria (ex.: 90% -> 10%)
+    'consumo_kwh_km': PREMISSAS_PADRAO['consumo_kwh_km'],
+    'fator_articulado': 1.5,          # consumo do BRT articulado / ônibus normal
+    'velocidade_kmh': 20.0,           # velocidade comercial média
+    'operacao_h': 17.0,               # janela de operação do dia (5h às 22h)
+    'fator_pico': 1.5,                # frequência no pico / frequência média
+    'parada_terminal_min': 10.0,      # parada em cada ponta da linha
+    'potencia_terminal_kw': 300.0,    # carregador de oportunidade (pantógrafo)
+}
+
+
+def frota_operacao(dados):
+    """Ônibus em operação por operadora: frota das garagens ou, sem garagem,
+    `frota_por_operadora`"""
+    frota = pd.Series(dict(dados['frota_por_operadora']), dtype=float)
+    garagens = pd.DataFrame(list(dados.get('garagens', [])), columns=['operadora', 'frota'])
+    nas_garagens = garagens.groupby('operadora')['frota'].sum().astype(float)
+    return nas_garagens.combine_first(frota)
+
+
+def _onibus_estimados(km_ida, km_volta, ida, volta, p):
+    """Ônibus por linha pelo tempo de ciclo e o intervalo no pico (0 sem viagens)"""
+    paradas_ciclo = np.where(km_volta > 0, 2.0, 1.0)
+    ciclo_h = ((km_ida + km_volta) / p['velocidade_kmh']
+               + paradas_ciclo * p['parada_terminal_min'] / 60)
+    viagens_sentido = np.maximum(ida, volta)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        intervalo_h = p['operacao_h'] / viagens_sentido / p['fator_pico']
+        return np.where(viagens_sentido > 0,
+                        np.maximum(np.ceil(ciclo_h / intervalo_h - 1e-9), 1.0), 0.0)
+
+
+def avaliar_linhas(consolidado, premissas=None, dia='seg', frota_operadora=None):
+    """Energia, ônibus e situação de cada linha (mesma ordem do consolidado)"""
+    if dia not in DIAS:
+        raise ValueError(f"Dia inválido: {dia!r} (use um de {', '.join(DIAS)})")
+    p = {**PREMISSAS_AUTONOMIA, **(premissas or {})}
+
+    km_ida = consolidado['km_ida_circular'].to_numpy(dtype=float, na_value=0.0)
+    km_volta = consolidado['km_volta'].to_numpy(dtype=float, na_value=0.0)
+    ida = consolidado[f'{dia}_ida'].to_numpy(dtype=float, na_value=0.0)
+    volta = consolidado[f'{dia}_volta'].to_numpy(dtype=float, na_value=0.0)
+    articulado = (consolidado['tipo_veiculo'] == 'BRT Articulado').to_numpy(dtype=bool,
+                                                                           na_value=False)
+
+    km_dia = km_ida * ida + km_volta * volta
+    viagens = ida + volta
+    km_ciclo = km_ida + km_volta
+    consumo = p['consumo_kwh_km'] * np.where(articulado, p['fator_articulado'], 1.0)
+
+    servico = viagens > 0
+    onibus = _onibus_estimados(km_ida, km_volta, ida, volta, p)
+    if frota_operadora is not None:
+        util = _onibus_estimados(km_ida, km_volta,
+                                 consolidado['seg_ida'].to_numpy(dtype=float, na_value=0.0),
+                                 consolidado['seg_volta'].to_numpy(dtype=float, na_value=0.0), p)
+        operadora = consolidado['operadora'].to_numpy(dtype=object)
+        estimada = pd.Series(util).groupby(operadora).transform('sum').to_numpy()
+        real = pd.Series(frota_operadora, dtype=float).reindex(operadora).to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            onibus = np.where(np.isnan(real) | (estimada == 0), onibus,
+                              onibus * real / estimada)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        km_onibus = np.where(servico, km_dia / onibus, 0.0)
+        viagens_onibus = np.where(servico, viagens / onibus, 0.0)
+
+    energia_onibus = km_onibus * consumo
+    energia_ciclo = km_ciclo * consumo
+    bateria_util = p['capacidade_kwh'] * p['janela_soc']
+    recarga_oportunidade = (viagens_onibus * p['parada_terminal_min'] / 60
+                            * p['potencia_terminal_kw'])
+
+    garagem = servico & (energia_onibus <= bateria_util)
+    oportunidade = (servico & ~garagem & (energia_ciclo <= bateria_util)
+                    & (energia_onibus <= bateria_util + recarga_oportunidade))
+    situacao = np.select([~servico, garagem, oportunidade],
+                         ['sem_servico', 'garagem', 'oportunidade'], 'inviavel')
+
+    return pd.DataFrame({
+        'linha': consolidado['linha_nome'].to_numpy(),
+        'operadora': consolidado['operadora'].to_numpy(),
+        'tipo_veiculo': consolidado['tipo_veiculo'].to_numpy(),
+        'km_dia': km_dia,
+        'viagens': viagens.astype(np.int64),
+        'onibus': onibus,
+        'km_por_onibus': km_onibus,
+        'energia_onibus_kwh': energia_onibus,
+        'energia_ciclo_kwh': energia_ciclo,
+        # Quanto falta repor no terminal por ônibus (0 quando a bateria basta)
+        'oportunidade_kwh': np.maximum(energia_onibus - bateria_util, 0.0),
+        'situacao': situacao,
+    })
+
+
+def resumo_por_operadora(linhas):
+    """Por operadora: linhas em cada situação, % viável, ônibus e energia do dia"""
+    servico = linhas[linhas['situacao'] != 'sem_servico']
+    servico = servico.assign(energia_dia_kwh=servico['energia_onibus_kwh'] * servico['onibus'])
+    contagem = (pd.crosstab(servico['operadora'], servico['situacao'])
+                .reindex(columns=list(SITUACOES[:-1]), fill_value=0))
+    totais = servico.groupby('operadora')[['onibus', 'energia_dia_kwh']].sum()
+    resumo = contagem.join(totais)
+    resumo['linhas'] = contagem.sum(axis=1)
+    resumo['pct_viavel'] = ((resumo['garagem'] + resumo['oportunidade'])
+                            / resumo['linhas'] * 100)
+    resumo['pct_so_garagem'] = resumo['garagem'] / resumo['linhas'] * 100
+    return resumo.reset_index().sort_values('linhas', ascending=False, ignore_index=True)
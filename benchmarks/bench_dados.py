@@ -0,0 +1,94 @@
+"""
+BENCHMARK - CARGA DOS DADOS
+===========================
+Compara a carga legada (3 JSONs + Parquet + planilhas XLSX, cada fonte no seu
+formato, copiada por sessão pelo `st.cache_data`) com o pacote único de
+`dados.py` (memory-map, só as colunas usadas, compartilhado entre sessões).
+
+Uso:
+    python benchmarks/bench_dados.py [--repeticoes 3]
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.chdir(RAIZ)
+
+from dados import DOCUMENTOS, TABELAS_OPERACIONAIS, abrir_pacote, construir_pacote  # noqa: E402
+from rankings import COLUNAS_DEMANDA, COLUNAS_FROTA, COLUNAS_LONGAS  # noqa: E402
+
+
+def carga_legada():
+    """Reprodução do carregar_dados + carregar_planilhas_operacionais antigos"""
+    documentos = {}
+    for nome, arquivo in DOCUMENTOS.items():
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            documentos[nome] = json.load(f)
+    df_paradas = pd.read_parquet(RAIZ / 'dashboard_data' / 'dados_paradas.parquet')
+    tabelas = {nome: pd.read_excel(arquivo, sheet_name=aba)
+               for nome, (arquivo, aba) in TABELAS_OPERACIONAIS.items()}
+    return documentos, df_paradas, tabelas
+
+
+def carga_pacote(destino):
+    """Abertura do pacote + as leituras que o app faz numa execução"""
+    pacote = abrir_pacote(destino)
+    documentos = {nome: pacote.documento(nome) for nome in DOCUMENTOS}
+    df_paradas = pacote.tabela('paradas', ('stop_name', 'lat', 'lon'))
+    tabelas = {
+        'longas': pacote.tabela('consolidado', COLUNAS_LONGAS),
+        'demanda': pacote.tabela('consolidado', COLUNAS_DEMANDA),
+        'operadoras': pacote.tabela('operadoras'),
+        'frota': pacote.tabela('frota_investimento', COLUNAS_FROTA),
+    }
+    return documentos, df_paradas, tabelas
+
+
+def medir(carga, repeticoes, *args):
+    melhor, pico = float('inf'), 0
+    for _ in range(repeticoes):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        resultado = carga(*args)
+        melhor = min(melhor, time.perf_counter() - t0)
+        pico = max(pico, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return melhor, pico, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as destino:
+        t0 = time.perf_counter()
+        construir_pacote(destino, forcar=True)
+        construcao = time.perf_counter() - t0
+
+        legado = medir(carga_legada, args.repeticoes)
+        novo = medir(carga_pacote, args.repeticoes, destino)
+
+    # st.cache_data devolve uma cópia (pickle) por chamada: memória por sessão
+    por_sessao = len(pickle.dumps(legado[2]))
+
+    print(f"Construção do pacote (uma vez por versão): {construcao:.2f} s\n")
+    print(f"{'versão':<10}{'carga (s)':>11}{'pico (MB)':>11}{'cópia/sessão (MB)':>19}")
+    print(f"{'legado':<10}{legado[0]:>11.3f}{legado[1]/2**20:>11.1f}{por_sessao/2**20:>19.1f}")
+    print(f"{'pacote':<10}{novo[0]:>11.3f}{novo[1]/2**20:>11.1f}{0:>19.1f}")
+    print(f"{'ganho':<10}{legado[0]/novo[0]:>10.1f}x{legado[1]/novo[1]:>10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+BENCHMARK - CAMADA DE PARADAS
+=============================
+Compara o loop legado (um CircleMarker por parada via iterrows) com a camada
+vetorizada de `mapa.py`, nos modos marcadores e heatmap.
+
+Uso:
+    python benchmarks/bench_mapa.py [--repeticoes 3]
+"""
+
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import folium
+import pandas as pd
+from folium.plugins import HeatMap
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from mapa import camada_paradas  # noqa: E402
+
+
+def _mapa_base():
+    return folium.Map(location=[-15.793889, -47.882778], zoom_start=11,
+                      tiles='CartoDB positron', prefer_canvas=True)
+
+
+def camada_legada(df_paradas, heatmap=False):
+    """Reprodução do código antigo de criar_mapa_profissional"""
+    m = _mapa_base()
+    if heatmap:
+        heat_data = [[r['lat'], r['lon']] for _, r in df_paradas.iterrows()]
+        HeatMap(heat_data, radius=15, blur=20).add_to(m)
+    else:
+        for _, p in df_paradas.iterrows():
+            folium.CircleMarker(
+                [p['lat'], p['lon']], radius=2, popup=p['stop_name'],
+                color='#ff7f0e', fill=True, fillOpacity=0.6, weight=1
+            ).add_to(m)
+    return m
+
+
+def camada_vetorizada(df_paradas, heatmap=False):
+    m = _mapa_base()
+    camada_paradas(df_paradas, heatmap=heatmap).add_to(m)
+    return m
+
+
+def medir(construtor, df_paradas, heatmap, repeticoes):
+    """Melhor tempo de construção (s), tempo de render (s) e bytes do HTML"""
+    melhor_build = melhor_render = float('inf')
+    tamanho = 0
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        m = construtor(df_paradas, heatmap)
+        t1 = time.perf_counter()
+        html = m.get_root().render()
+        t2 = time.perf_counter()
+        melhor_build = min(melhor_build, t1 - t0)
+        melhor_render = min(melhor_render, t2 - t1)
+        tamanho = len(html.encode('utf-8'))
+    return melhor_build, melhor_render, tamanho
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')  # aviso de API key dos tiles CartoDB
+
+    df_paradas = pd.read_parquet(RAIZ / 'dashboard_data' / 'dados_paradas.parquet')
+    print(f"Paradas: {len(df_paradas):,}\n")
+    print(f"{'modo':<11}{'versão':<12}{'build (s)':>11}{'render (s)':>12}{'payload (KB)':>14}")
+
+    for heatmap in (False, True):
+        modo = 'heatmap' if heatmap else 'marcadores'
+        legado = medir(camada_legada, df_paradas, heatmap, args.repeticoes)
+        novo = medir(camada_vetorizada, df_paradas, heatmap, args.repeticoes)
+        for nome, (build, render, tamanho) in (('legado', legado), ('vetorizado', novo)):
+            print(f"{modo:<11}{nome:<12}{build:>11.3f}{render:>12.3f}{tamanho/1024:>14,.0f}")
+        print(f"{'':<11}{'ganho':<12}{legado[0]/novo[0]:>10.1f}x{legado[1]/novo[1]:>11.1f}x"
+              f"{legado[2]/novo[2]:>13.1f}x\n")
+
+
+if __name__ == '__main__':
+    main()
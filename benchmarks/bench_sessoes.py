@@ -0,0 +1,105 @@
+"""
+BENCHMARK - SESSÕES CONCORRENTES
+================================
+Simula N sessões do Streamlit carregando os dados ao mesmo tempo e mede a
+memória que cada sessão acrescenta enquanto as N estão vivas:
+- legado: `st.cache_data` (cada chamada desserializa uma cópia própria)
+- compartilhado: pacote em `st.cache_resource` (mesmos objetos/buffers)
+
+A memória é a do Python (tracemalloc) + a do pool do Arrow.
+
+Uso:
+    python benchmarks/bench_sessoes.py [--sessoes 20]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.chdir(RAIZ)
+
+from dados import DOCUMENTOS, abrir_pacote  # noqa: E402
+
+COLUNAS_PARADAS = ('stop_name', 'lat', 'lon')
+
+
+@st.cache_data
+def carga_legada():
+    """O carregar_dados antigo (JSONs + Parquet sob st.cache_data)"""
+    documentos = []
+    for arquivo in DOCUMENTOS.values():
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            documentos.append(json.load(f))
+    return (*documentos, pd.read_parquet(RAIZ / 'dashboard_data' / 'dados_paradas.parquet'))
+
+
+@st.cache_resource
+def carga_compartilhada():
+    pacote = abrir_pacote()
+    pacote.tabela('paradas', COLUNAS_PARADAS)
+    return pacote
+
+
+def sessao_compartilhada():
+    pacote = carga_compartilhada()
+    return (*(pacote.documento(nome) for nome in DOCUMENTOS),
+            pacote.tabela('paradas', COLUNAS_PARADAS))
+
+
+def _memoria():
+    return tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes()
+
+
+def medir(sessao, n):
+    """Tempo total e memória por sessão com n sessões simultâneas vivas"""
+    sessao()  # aquece o cache (a primeira carga não é custo por sessão)
+    barreira = threading.Barrier(n)
+
+    def rodar(_):
+        barreira.wait()
+        return sessao()
+
+    tracemalloc.start()
+    antes = _memoria()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(n) as pool:
+        vivas = list(pool.map(rodar, range(n)))
+    tempo = time.perf_counter() - t0
+    depois = _memoria()
+    tracemalloc.stop()
+    assert len(vivas) == n
+    return tempo, (depois - antes) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sessoes', type=int, default=20)
+    args = parser.parse_args()
+    for nome in list(logging.root.manager.loggerDict):
+        if nome.startswith('streamlit'):
+            logging.getLogger(nome).setLevel(logging.ERROR)  # avisos do modo "bare"
+
+    print(f"Sessões simultâneas: {args.sessoes}\n")
+    print(f"{'versão':<15}{'tempo (s)':>11}{'KB/sessão':>12}")
+    resultados = {}
+    for nome, sessao in (('legado', carga_legada), ('compartilhado', sessao_compartilhada)):
+        resultados[nome] = medir(sessao, args.sessoes)
+        tempo, por_sessao = resultados[nome]
+        print(f"{nome:<15}{tempo:>11.3f}{por_sessao/1024:>12,.1f}")
+
+
+if __name__ == '__main__':
+    main()
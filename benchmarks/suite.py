@@ -0,0 +1,358 @@
+"""
+BENCHMARK - SUÍTE DOS CAMINHOS QUENTES
+======================================
+Mede tempo, pico de memória e payload (HTML/JSON) dos caminhos quentes do
+dashboard, sem navegador e sem rede, nos dados reais (1x) e em dados
+sintéticos ampliados (10x, 100x paradas e horários):
+- carga: pacote de dados (construção e abertura) como no carregar_dados
+- métricas: calcular_metricas_filtradas (todas / metade das operadoras)
+- mapa: criar_mapa_profissional nos modos marcadores e heatmap (grade de
+  densidade do app e, para comparação, um ponto por parada; payload = HTML)
+- rankings: linhas longas, demanda (contagem em streaming do CSV) e frota
+- demanda: viagens por parada e hora (mesmo CSV, cruzado com as paradas)
+- cenários: grade aumento x taxa e Monte Carlo num processo
+- cobertura: carregador mais próximo de cada parada
+- energia: curvas de recarga de 15 min da frota inteira e autonomia das linhas
+- gráficos: serialização e payload JSON de uma série longa (carga de 15 min
+  num ano) crua e compactada (`graficos.compactar`)
+- implantação: cronograma da frota inteira com orçamento e MVA anuais
+- busca: índice de trigramas de paradas e linhas (montagem) e consultas
+
+Só os casos que dependem de paradas/horários rodam em todas as escalas; os
+demais rodam uma vez, na menor escala pedida.
+
+Os resultados podem ser gravados como baseline (`--salvar`); nas execuções
+seguintes cada caso é comparado à baseline e regressões fazem o script
+sair com código 1.
+
+Uso:
+    python benchmarks/suite.py                    # 1x e 10x, compara com a baseline
+    python benchmarks/suite.py --escalas 1 10 100 --salvar
+    python benchmarks/suite.py --casos mapa rankings
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.chdir(RAIZ)
+
+from autonomia import avaliar_linhas, frota_operacao  # noqa: E402
+from busca import BuscaParadasLinhas  # noqa: E402
+from carga import km_dia_por_operadora, simular_carga  # noqa: E402
+from cobertura import atribuir_carregadores  # noqa: E402
+from dados import DOCUMENTOS, abrir_pacote, construir_pacote  # noqa: E402
+from demanda import contar_viagens_por_parada  # noqa: E402
+from financeiro import avaliar_cenarios, calibrar_parametros, simular_monte_carlo  # noqa: E402
+from implantacao import planejar, tabela_frentes, trajetoria  # noqa: E402
+from graficos import compactar  # noqa: E402
+from infraestrutura import dimensionar, tabela_locais  # noqa: E402
+from mapa import GradeDensidade  # noqa: E402
+from metricas import calcular_metricas_filtradas, construir_matriz_kpis  # noqa: E402
+from rankings import (contar_horarios_por_linha, ranking_demanda, ranking_frota,  # noqa: E402
+                      ranking_linhas_longas)
+
+BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+# Regressão: pior que a baseline por mais que a fração E mais que o piso absoluto
+TOLERANCIAS = {
+    'tempo_ms': (0.50, 5.0),
+    'pico_mb': (0.25, 1.0),
+    'payload_kb': (0.10, 1.0),
+}
+
+# Casos que dependem do volume de paradas/horários
+ESCALAVEIS = ('mapa/marcadores', 'mapa/heatmap', 'mapa/heatmap_bruto', 'rankings/demanda', 'demanda/viagens_por_parada',
+              'cobertura/atribuicao', 'busca/indice', 'busca/consultas')
+
+# Maior escala em que cada grupo roda (o mapa com 100x paradas passa de 150 MB de HTML)
+ESCALA_MAXIMA = {'mapa': 10}
+
+
+# ============================================================================
+# DADOS (REAIS E SINTÉTICOS)
+# ============================================================================
+
+class Dados:
+    """Entradas dos casos numa escala: paradas e horários multiplicados por `escala`"""
+
+    def __init__(self, escala, pasta):
+        self.escala = escala
+        self.pacote = abrir_pacote()
+        self.dados = self.pacote.documento('dados')
+        self.kpis = self.pacote.documento('kpis')
+        self.config = self.pacote.documento('config')
+        self.consolidado = self.pacote.tabela('consolidado')
+        self.frota = self.pacote.tabela('frota_investimento')
+        self.operadoras = self.pacote.tabela('operadoras')
+        self.paradas = ampliar_paradas(self.pacote.tabela('paradas', ('stop_name', 'lat', 'lon')),
+                                       escala)
+        self.stop_ids = self.pacote.tabela('paradas', ('stopId',))['stopId'].to_numpy()
+        self.horarios = Path(pasta) / f'horarios_{escala}x.csv'
+        if not self.horarios.exists():
+            gerar_horarios(self.consolidado, self.stop_ids, escala, self.horarios)
+
+
+def ampliar_paradas(paradas, escala, semente=0):
+    """`escala` cópias das paradas com deslocamento aleatório de até ~500 m"""
+    if escala == 1:
+        return paradas
+    rng = np.random.default_rng(semente)
+    n = len(paradas) * escala
+    return pd.DataFrame({
+        'stop_name': np.tile(paradas['stop_name'].to_numpy(dtype=object), escala),
+        'lat': np.tile(paradas['lat'].to_numpy(), escala) + rng.uniform(-0.005, 0.005, n),
+        'lon': np.tile(paradas['lon'].to_numpy(), escala) + rng.uniform(-0.005, 0.005, n),
+    })
+
+
+def gerar_horarios(consolidado, stop_ids, escala, arquivo, semente=0):
+    """CSV de horários com as viagens semanais de cada linha (x escala), embaralhado,
+    cada uma numa parada sorteada"""
+    viagens = (5 * consolidado['seg_viagens'] + consolidado['sab_viagens']
+               + consolidado['dom_viagens']).clip(lower=1).to_numpy(dtype=np.int64)
+    linhas = consolidado['linha_nome'].astype(str).to_numpy(dtype=object)
+    rng = np.random.default_rng(semente)
+    indices = rng.permutation(np.repeat(np.arange(len(linhas)), viagens * escala))
+    tabela = pa.table({
+        'linha_nome': pa.array(linhas[indices], type=pa.string()),
+        'stopId': pa.array(rng.choice(stop_ids, len(indices)), type=pa.int64()),
+        'horario': pa.array(rng.integers(0, 24 * 60, len(indices)), type=pa.int32()),
+    })
+    pacsv.write_csv(tabela, arquivo)
+
+
+# ============================================================================
+# CASOS
+# ============================================================================
+
+def _payload_mapa(m):
+    return len(m.get_root().render().encode('utf-8'))
+
+
+def _json_figura(fig):
+    """O que o st.plotly_chart serializa"""
+    return pio.to_json(fig, validate=False)
+
+
+def _payload_json(texto):
+    return len(texto.encode('utf-8'))
+
+
+def casos(d):
+    """nome -> (grupo, função sem argumentos, medidor de payload ou None)"""
+    from app import criar_mapa_profissional  # importa o app em modo "bare" (sem servidor)
+
+    todas = list(d.dados['operadoras'])
+    filtros_todas = {'operadoras': todas, 'novos_usuarios': 100_000, 'aumento_tarifa': 50}
+    filtros_metade = {**filtros_todas, 'operadoras': todas[::2]}
+    matriz = construir_matriz_kpis(d.dados, d.kpis, d.operadoras)
+    params = calibrar_parametros(d.dados, d.kpis)
+    locais = tabela_locais(d.dados['garagens'], d.dados['terminais'])
+    carregadores = dimensionar(locais)['carregadores']
+    km_operadora = km_dia_por_operadora(d.consolidado)
+    beneficio = float(avaliar_cenarios(params, 50)['beneficio_anual'])
+    aumentos = np.arange(0, 101)
+    taxas = np.arange(4.0, 14.01, 0.5) / 100
+
+    def carga():
+        with tempfile.TemporaryDirectory() as pasta:
+            construir_pacote(pasta, forcar=True)
+            pacote = abrir_pacote(pasta)
+            for nome in DOCUMENTOS:
+                pacote.documento(nome)
+            pacote.tabela('paradas', ('stop_name', 'lat', 'lon'))
+
+    def cronograma():
+        frentes = tabela_frentes(d.dados, params, km_operadora)
+        return trajetoria(planejar(frentes, 1.5e9, 30.0), params, beneficio,
+                          d.kpis['emissoes_evitadas_ton'])
+
+    # Entradas dos casos de gráficos e busca, montadas fora da medição
+    carga_15min, _ = simular_carga(locais, km_operadora, carregadores, 160.0)
+    # Carga total de 15 min repetida num ano, com ruído (35.040 pontos)
+    total = np.tile(carga_15min.sum(axis=0), 365) / 1000
+    total *= np.random.default_rng(0).normal(1.0, 0.05, len(total))
+    serie_longa = go.Figure(go.Scatter(x=np.arange(len(total)) * 0.25, y=total, mode='lines'))
+    busca = BuscaParadasLinhas(d.paradas, d.consolidado)
+
+    def consultas():
+        # Digitação de uma parada e de uma linha, como chegam da sidebar a cada tecla
+        for consulta in ('est', 'estacao', 'estacao samamb', 'rodoviaria plano piloto',
+                         '0.8', '0.808', '206.2', 'gama taguatinga'):
+            busca.buscar(consulta, 10)
+
+    # Grade de densidade: no app é cacheada por versão dos dados (criar_grade_densidade)
+    grade = GradeDensidade(d.paradas['lat'], d.paradas['lon'])
+
+    def mapa(heatmap, densidade=False):
+        # Como no secao_mapa: células um zoom acima do inicial
+        return lambda: criar_mapa_profissional(
+            d.paradas, d.dados['garagens'], d.dados['terminais'], d.config, filtros_todas,
+            heatmap, densidade=grade.celulas(d.config['zoom_inicial'] + 1) if densidade else None)
+
+    return {
+        'carga/pacote_frio': ('carga', carga, None),
+        'carga/pacote_quente': ('carga', abrir_pacote, None),
+        'metricas/todas': ('metricas', lambda: calcular_metricas_filtradas(
+            filtros_todas, d.kpis, d.dados, matriz, params), None),
+        'metricas/metade': ('metricas', lambda: calcular_metricas_filtradas(
+            filtros_metade, d.kpis, d.dados, matriz, params), None),
+        'mapa/marcadores': ('mapa', mapa(False), _payload_mapa),
+        'mapa/heatmap': ('mapa', mapa(True, densidade=True), _payload_mapa),
+        # Comparação: HeatMap com um ponto por parada (caminho anterior à grade)
+        'mapa/heatmap_bruto': ('mapa', mapa(True), _payload_mapa),
+        'rankings/linhas_longas': ('rankings', lambda: ranking_linhas_longas(d.consolidado), None),
+        'rankings/demanda': ('rankings', lambda: ranking_demanda(
+            contar_horarios_por_linha(d.horarios), d.consolidado), None),
+        'rankings/frota': ('rankings', lambda: ranking_frota(d.frota), None),
+        'demanda/viagens_por_parada': ('demanda', lambda: contar_viagens_por_parada(
+            d.horarios, d.stop_ids), None),
+        'cenarios/grade': ('cenarios', lambda: avaliar_cenarios(
+            params, aumentos[None, :], taxas[:, None]), None),
+        'cenarios/monte_carlo_100k': ('cenarios', lambda: simular_monte_carlo(
+            params, n_amostras=100_000, processos=1), None),
+        'cobertura/atribuicao': ('cobertura', lambda: atribuir_carregadores(d.paradas, locais),
+                                 None),
+        'energia/curvas_carga': ('energia', lambda: simular_carga(
+            locais, km_operadora, carregadores, 160.0), None),
+        'energia/autonomia_linhas': ('energia', lambda: avaliar_linhas(
+            d.consolidado, frota_operadora=frota_operacao(d.dados)), None),
+        # Tempo = compactar (se for o caso) + serializar; payload = o JSON enviado
+        'graficos/serie_bruta': ('graficos', lambda: _json_figura(serie_longa), _payload_json),
+        'graficos/serie_compacta': ('graficos', lambda: _json_figura(compactar(serie_longa)),
+                                    _payload_json),
+        'implantacao/cronograma': ('implantacao', cronograma, None),
+        'busca/indice': ('busca', lambda: BuscaParadasLinhas(d.paradas, d.consolidado), None),
+        'busca/consultas': ('busca', consultas, None),
+    }
+
+
+def medir(funcao, payload, repeticoes):
+    """Melhor tempo (ms), pico de memória (MB: Python + pool do Arrow) e payload (KB).
+
+    O tempo sai de execuções sem tracemalloc (que deixa o Python bem mais
+    lento); a memória, de uma execução à parte com tracemalloc ligado.
+    """
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        gc.collect()
+        t0 = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - t0)
+
+    gc.collect()
+    arrow_antes = pa.total_allocated_bytes()
+    tracemalloc.start()
+    resultado = funcao()
+    pico_py = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    pico = (pico_py + max(pa.total_allocated_bytes() - arrow_antes, 0)) / 2**20
+
+    medidas = {'tempo_ms': melhor * 1000, 'pico_mb': pico}
+    if payload is not None:
+        medidas['payload_kb'] = payload(resultado) / 1024
+    return medidas
+
+
+# ============================================================================
+# BASELINE
+# ============================================================================
+
+def comparar(resultado, baseline):
+    """Métricas que pioraram além da tolerância: lista de (métrica, atual, baseline)"""
+    regressoes = []
+    for metrica, (fracao, piso) in TOLERANCIAS.items():
+        if metrica not in resultado or metrica not in baseline:
+            continue
+        atual, base = resultado[metrica], baseline[metrica]
+        if atual > base * (1 + fracao) and atual - base > piso:
+            regressoes.append((metrica, atual, base))
+    return regressoes
+
+
+def _ambiente():
+    return {'python': platform.python_version(), 'maquina': platform.machine(),
+            'processador': platform.processor() or platform.machine(),
+            'cpus': os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--casos', nargs='+', help="grupos ou casos (ex.: mapa rankings/demanda)")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--salvar', action='store_true', help="grava os resultados como baseline")
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')  # aviso de API key dos tiles CartoDB
+    logging.disable(logging.WARNING)  # avisos do Streamlit em modo "bare"
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    resultados = {}
+    regressoes = 0
+
+    print(f"{'caso':<30}{'escala':>7}{'tempo (ms)':>12}{'pico (MB)':>11}"
+          f"{'payload (KB)':>14}  vs baseline")
+    with tempfile.TemporaryDirectory() as pasta:
+        for escala in sorted(args.escalas):
+            d = Dados(escala, pasta)
+            for nome, (grupo, funcao, payload) in casos(d).items():
+                if args.casos and nome not in args.casos and grupo not in args.casos:
+                    continue
+                if escala > ESCALA_MAXIMA.get(grupo, escala):
+                    continue
+                if nome not in ESCALAVEIS and escala != min(args.escalas):
+                    continue
+                chave = f'{nome}@{escala}x'
+                resultado = medir(funcao, payload, args.repeticoes)
+                resultados[chave] = resultado
+
+                base = baseline.get('casos', {}).get(chave)
+                if base is None:
+                    situacao = 'sem baseline'
+                else:
+                    piores = comparar(resultado, base)
+                    regressoes += bool(piores)
+                    situacao = ('⚠️ REGRESSÃO ' + ', '.join(
+                        f"{m} {a:,.1f} > {b:,.1f}" for m, a, b in piores)) if piores else 'ok'
+                payload_kb = resultado.get('payload_kb')
+                print(f"{nome:<30}{escala:>6}x{resultado['tempo_ms']:>12,.1f}"
+                      f"{resultado['pico_mb']:>11,.1f}"
+                      f"{(f'{payload_kb:,.0f}' if payload_kb is not None else '-'):>14}"
+                      f"  {situacao}")
+
+    if args.salvar:
+        arredondados = {chave: {m: round(v, 3) for m, v in r.items()}
+                        for chave, r in resultados.items()}
+        casos_salvos = {**baseline.get('casos', {}), **arredondados}
+        args.baseline.write_text(json.dumps(
+            {'ambiente': _ambiente(), 'casos': dict(sorted(casos_salvos.items()))},
+            indent=2, ensure_ascii=False) + '\n')
+        print(f"\n💾 Baseline gravada em {args.baseline}")
+
+    if regressoes and not args.salvar:
+        print(f"\n⚠️ {regressoes} caso(s) com regressão")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
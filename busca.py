@@ -0,0 +1,148 @@
+"""
+BUSCA - PARADAS E LINHAS POR TRIGRAMAS
+======================================
+Índice em memória para busca aproximada (tolerante a acentos, ordem das
+palavras e erros de digitação) sobre os nomes das paradas (`stop_name`) e as
+linhas (`linha_nome` + `linha_descricao`).
+
+Como no pg_trgm: o texto é normalizado (sem acentos, minúsculo, só letras,
+dígitos e ponto) e cada palavra vira os seus trigramas com dois espaços
+antes e um depois (`"  ce"`, `" ce "`...). O índice guarda, por trigrama, os
+documentos que o contêm (CSR: `inicio` + `documentos`). Uma consulta soma as
+listas dos seus trigramas com um único bincount e pontua por similaridade
+(trigramas em comum / trigramas da união); prefixo e trecho exato da
+consulta ganham bônus, só entre os candidatos.
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Bônus somados à similaridade (0-1)
+BONUS_PREFIXO = 1.0
+BONUS_TRECHO = 0.5
+
+_SEPARADORES = re.compile(r'[^0-9a-z.]+')
+
+
+def normalizar(texto):
+    """Minúsculo, sem acentos, só letras/dígitos/ponto separados por um espaço"""
+    sem_acentos = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode()
+    return _SEPARADORES.sub(' ', sem_acentos.lower()).strip()
+
+
+def trigramas(texto_normalizado):
+    """Conjunto de trigramas das palavras (com os espaços de borda do pg_trgm)"""
+    resultado = set()
+    for palavra in texto_normalizado.split():
+        palavra = f"  {palavra} "
+        resultado.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return resultado
+
+
+class IndiceBusca:
+    """Índice invertido de trigramas sobre uma lista de textos"""
+
+    def __init__(self, textos):
+        self.textos = [normalizar(t) for t in textos]
+        conjuntos = [trigramas(t) for t in self.textos]
+        self.n_trigramas = np.array([len(c) for c in conjuntos], dtype=np.int64)
+
+        ids = {}
+        tri = np.fromiter((ids.setdefault(t, len(ids)) for c in conjuntos for t in c),
+                          dtype=np.int32, count=int(self.n_trigramas.sum()))
+        documentos = np.repeat(np.arange(len(conjuntos), dtype=np.int32), self.n_trigramas)
+        self._ids = ids
+        self._documentos = documentos[np.argsort(tri, kind='stable')]
+        self._inicio = np.concatenate([[0], np.cumsum(np.bincount(tri, minlength=len(ids)))])
+
+    def __len__(self):
+        return len(self.textos)
+
+    def buscar(self, consulta, n=10, minimo=0.1):
+        """(índices, pontuações) dos `n` melhores documentos, do melhor para o pior"""
+        consulta = normalizar(consulta)
+        da_consulta = trigramas(consulta)
+        conhecidos = [self._ids[t] for t in da_consulta if t in self._ids]
+        if not conhecidos:
+            return np.array([], dtype=np.int64), np.array([])
+
+        postagens = np.concatenate([self._documentos[self._inicio[t]:self._inicio[t + 1]]
+                                    for t in conhecidos])
+        comuns = np.bincount(postagens, minlength=len(self.textos))
+        candidatos = np.flatnonzero(comuns)
+        pontos = comuns[candidatos] / (len(da_consulta) + self.n_trigramas[candidatos]
+                                       - comuns[candidatos])
+        # Quem contém a consulta tem todos os trigramas internos (sem espaço) dela
+        internos = sum(' ' not in t for t in da_consulta)
+        for j in np.flatnonzero(comuns[candidatos] >= internos):
+            texto = self.textos[candidatos[j]]
+            if texto.startswith(consulta):
+                pontos[j] += BONUS_PREFIXO
+            elif consulta in texto:
+                pontos[j] += BONUS_TRECHO
+
+        validos = pontos >= minimo
+        candidatos, pontos = candidatos[validos], pontos[validos]
+        n = min(n, len(candidatos))
+        if n == 0:
+            return np.array([], dtype=np.int64), np.array([])
+        topo = np.argpartition(-pontos, n - 1)[:n]
+        # Empate: o texto mais curto (mais específico) primeiro
+        topo = topo[np.lexsort((self.n_trigramas[candidatos[topo]], -pontos[topo]))]
+        return candidatos[topo], pontos[topo]
+
+
+def itens_busca(df_paradas, consolidado):
+    """Paradas e linhas numa tabela única, com o texto indexado.
+
+    Uma linha por (`linha_nome`, `operadora`): o mesmo nome pode ser operado
+    por mais de uma operadora, e cada uma vira um item com a operadora no
+    rótulo. `posicao` é a linha da parada em `df_paradas`; para linhas, a
+    primeira variante no consolidado. Linhas não têm coordenadas (lat/lon NaN).
+    """
+    linhas = consolidado.reset_index(drop=True).assign(
+        linha_nome=lambda df: df['linha_nome'].astype(str),
+        operadora=lambda df: df['operadora'].astype(str))
+    chave = ['linha_nome', 'operadora']
+    primeiras = linhas.drop_duplicates(chave)
+    descricoes = (linhas.drop_duplicates(chave + ['linha_descricao'])
+                  .groupby(chave, sort=False)['linha_descricao']
+                  .agg(lambda d: ' / '.join(d.dropna().astype(str)))
+                  .reindex(pd.MultiIndex.from_frame(primeiras[chave])).to_numpy())
+    return pd.concat([
+        pd.DataFrame({
+            'tipo': 'parada', 'rotulo': df_paradas['stop_name'].astype(str).to_numpy(),
+            'texto': df_paradas['stop_name'].astype(str).to_numpy(),
+            'posicao': np.arange(len(df_paradas)), 'operadora': None, 'linha': None,
+            'lat': df_paradas['lat'].to_numpy(dtype=float),
+            'lon': df_paradas['lon'].to_numpy(dtype=float),
+        }),
+        pd.DataFrame({
+            'tipo': 'linha',
+            'rotulo': (primeiras['linha_nome'] + ' - '
+                       + primeiras['linha_descricao'].astype(str)
+                       + ' (' + primeiras['operadora'] + ')').to_numpy(),
+            'texto': (primeiras['linha_nome'] + ' ' + descricoes + ' '
+                      + primeiras['operadora']).to_numpy(),
+            'posicao': primeiras.index.to_numpy(),
+            'operadora': primeiras['operadora'].to_numpy(),
+            'linha': primeiras['linha_nome'].to_numpy(),
+            'lat': np.nan, 'lon': np.nan,
+        }),
+    ], ignore_index=True)
+
+
+class BuscaParadasLinhas:
+    """Itens (paradas + linhas) com o índice de trigramas montado sobre eles"""
+
+    def __init__(self, df_paradas, consolidado):
+        self.itens = itens_busca(df_paradas, consolidado)
+        self.indice = IndiceBusca(self.itens['texto'])
+
+    def buscar(self, consulta, n=10):
+        """Itens mais parecidos com a consulta, com a coluna `pontuacao`"""
+        indices, pontos = self.indice.buscar(consulta, n)
+        return self.itens.iloc[indices].assign(pontuacao=pontos)
@@ -0,0 +1,55 @@
+"""
+CACHE - ARTEFATOS CAROS
+=======================
+LRU com despejo por tamanho e contadores de acerto/falha, para artefatos que
+não cabem bem no `st.cache_data` (objetos folium, resultados pesados). As
+chaves levam a versão do pacote de dados (`dados.PacoteDados.versao`).
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Cache LRU thread-safe: guarda até `maxsize` itens e conta acertos/falhas"""
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        return chave in self._itens
+
+    def obter(self, chave, construir):
+        """Devolve o item da chave, construindo (e guardando) se ainda não existe"""
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave]
+            self.falhas += 1
+
+        valor = construir()
+
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.maxsize:
+                self._itens.popitem(last=False)
+        return valor
+
+    def estatisticas(self):
+        total = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'itens': len(self._itens),
+            'maxsize': self.maxsize,
+            'taxa_acerto': self.acertos / total if total else 0.0,
+        }
@@ -0,0 +1,222 @@
+"""
+CARGA - CURVAS DE RECARGA EM PASSOS DE 15 MIN
+=============================================
+Simula a carga de recarga (kW) de cada garagem e terminal ao longo do dia,
+em passos de 15 minutos, para o planejamento da conexão à rede.
+
+Garagens (modelo por ônibus, vetorizado sobre a frota inteira):
+- a frota de cada operadora está nas suas garagens (`frota` de cada uma);
+  em cada passo ficam em serviço os ônibus de menor posição na escala, em
+  número proporcional ao perfil de partidas do dia (pico = frota - reserva)
+- o km de dia útil da operadora (seg_km do consolidado) é repartido
+  igualmente entre os ônibus-passo em serviço e vira energia a repor
+- ônibus parados na garagem com energia a repor ocupam os carregadores do
+  local, por prioridade fixa (quem sai da escala primeiro), na potência do
+  carregador; a simulação roda dois dias e devolve o segundo (regime)
+
+Terminais (carga de oportunidade, somada à das garagens): em cada passo os
+ônibus no terminal são `onibus_pico` x perfil relativo; ocupam até
+`carregadores` pontos (x simultaneidade), puxando a potência do carregador
+durante a fração `ocupacao_terminal` do passo.
+
+As operadoras são independentes e podem ser simuladas num pool de processos.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from infraestrutura import PREMISSAS_PADRAO
+from processos import contexto_processos
+
+PASSO_H = 0.25
+PASSOS_DIA = int(24 / PASSO_H)
+DIAS_SIMULADOS = 2
+
+# Horário de ponta da distribuidora (h): 18h às 21h em dias úteis
+PONTA_TARIFARIA = (18.0, 21.0)
+
+# Partidas por hora num dia útil (peso relativo, 0h ... 23h); substituído
+# pelo perfil real de viagens por hora quando o pacote tem os horários
+PERFIL_SERVICO = (
+    0.2, 0.1, 0.1, 0.2, 1.5, 4.5, 7.5, 7.5, 6.0, 5.0, 4.5, 4.5,
+    4.8, 4.8, 4.6, 4.8, 5.8, 7.2, 7.2, 5.6, 4.0, 2.8, 1.8, 0.8,
+)
+
+PREMISSAS_CARGA = {
+    'reserva': 0.10,             # fração da frota fora da escala no pico
+    'ocupacao_terminal': 0.5,    # fração do passo com o ônibus plugado no terminal
+    'evitar_ponta': False,       # garagens não recarregam no horário de ponta
+}
+
+
+def horas_passos():
+    """Hora de início de cada passo do dia (0, 0.25, ..., 23.75)"""
+    return np.arange(PASSOS_DIA) * PASSO_H
+
+
+def texto_hora(hora):
+    """Hora decimal -> 'HH:MM'"""
+    minutos = int(round(hora * 60))
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def em_ponta(horas=None):
+    """Máscara dos passos dentro do horário de ponta"""
+    horas = horas_passos() if horas is None else horas
+    inicio, fim = PONTA_TARIFARIA
+    return (horas >= inicio) & (horas < fim)
+
+
+def perfil_passos(perfil_horario=None):
+    """Perfil de 24 valores por hora -> fração relativa ao pico (0-1) por passo"""
+    perfil = np.asarray(PERFIL_SERVICO if perfil_horario is None else perfil_horario,
+                        dtype=float)
+    passos = np.repeat(perfil, PASSOS_DIA // len(perfil))
+    return passos / max(passos.max(), 1e-12)
+
+
+def km_dia_por_operadora(consolidado):
+    """Km de dia útil (segunda-feira) de cada operadora, somando as linhas"""
+    return consolidado.groupby('operadora')['seg_km'].sum()
+
+
+def simular_operadora(frota_garagens, carregadores, potencia_kw, km_dia, relativo, premissas):
+    """Carga (kW) por garagem e passo de uma operadora: (garagens x passos do dia).
+
+    `frota_garagens`, `carregadores` e `potencia_kw` são por garagem da
+    operadora. Retorna também a energia (kWh) que ficou sem repor de um dia
+    para o outro em cada garagem (carregadores insuficientes).
+    """
+    frota_garagens = np.asarray(frota_garagens, dtype=np.int64)
+    carregadores = np.asarray(carregadores, dtype=np.int64)
+    potencia_kw = np.asarray(potencia_kw, dtype=float)
+    n_garagens, frota = len(frota_garagens), int(frota_garagens.sum())
+    carga = np.zeros((n_garagens, PASSOS_DIA))
+    if frota == 0:
+        return carga, np.zeros(n_garagens)
+
+    # Ônibus agrupados por garagem; a posição na escala intercala as garagens
+    # (cada uma contribui na proporção da sua frota a cada nível da escala)
+    garagem = np.repeat(np.arange(n_garagens), frota_garagens)
+    inicio = np.concatenate([[0], np.cumsum(frota_garagens)[:-1]])
+    dentro = np.arange(frota) - inicio[garagem]
+    posicao = np.argsort(np.argsort((dentro + 0.5) / frota_garagens[garagem], kind='stable'),
+                         kind='stable')
+    # Prioridade no carregador: maior posição (sai da escala antes) primeiro
+    ordem = np.lexsort((-posicao, garagem))
+    garagem, posicao = garagem[ordem], posicao[ordem]
+
+    em_servico_n = np.round(relativo * frota * (1 - premissas['reserva'])).astype(np.int64)
+    onibus_passo = max(int(em_servico_n.sum()), 1)
+    energia_passo = km_dia / onibus_passo * premissas['consumo_kwh_km']
+
+    limite_passo = potencia_kw[garagem] * PASSO_H
+    bloqueado = em_ponta() & premissas['evitar_ponta']
+    deficit = np.zeros(frota)
+
+    for passo in range(DIAS_SIMULADOS * PASSOS_DIA):
+        p = passo % PASSOS_DIA
+        em_servico = posicao < em_servico_n[p]
+        deficit[em_servico] += energia_passo
+        if bloqueado[p]:
+            continue
+        esperando = ~em_servico & (deficit > 0)
+        # Fila por garagem: posição de cada ônibus entre os que esperam no local
+        acumulado = np.cumsum(esperando)
+        # Garagem sem ônibus no fim aponta para `frota`; o valor dela não é usado
+        antes = (acumulado - esperando)[np.minimum(inicio, frota - 1)]
+        fila = acumulado - antes[garagem] - 1
+        carregando = esperando & (fila < carregadores[garagem])
+        energia = np.where(carregando, np.minimum(deficit, limite_passo), 0.0)
+        deficit -= energia
+        if passo >= (DIAS_SIMULADOS - 1) * PASSOS_DIA:
+            carga[:, p] = np.bincount(garagem, weights=energia, minlength=n_garagens) / PASSO_H
+        if passo == (DIAS_SIMULADOS - 1) * PASSOS_DIA - 1:
+            deficit_anterior = deficit.copy()
+
+    # Energia que se acumulou de um dia para o outro: não coube nos carregadores
+    falta = np.maximum(deficit - deficit_anterior, 0.0)
+    return carga, np.bincount(garagem, weights=falta, minlength=n_garagens)
+
+
+def _simular_lote(tarefas):
+    return [simular_operadora(*tarefa) for tarefa in tarefas]
+
+
+def carga_terminais(onibus_pico, carregadores, potencia_kw, relativo, premissas):
+    """Carga (kW) de oportunidade dos terminais: (terminais x passos do dia)"""
+    onibus = np.asarray(onibus_pico, dtype=float)[:, None] * relativo[None, :]
+    plugados = np.minimum(np.ceil(onibus * premissas['simultaneidade_terminal'] - 1e-9),
+                          np.asarray(carregadores, dtype=float)[:, None])
+    return (plugados * np.asarray(potencia_kw, dtype=float)[:, None]
+            * premissas['ocupacao_terminal'])
+
+
+def simular_carga(locais, km_operadora, carregadores, potencia_kw, premissas=None,
+                  perfil_horario=None, processos=1):
+    """Curvas de carga de todos os locais: matriz (locais x passos) em kW.
+
+    `locais` segue `infraestrutura.tabela_locais`; `carregadores` e
+    `potencia_kw` (por local) vêm do dimensionamento. `km_operadora` é o km
+    de dia útil por operadora (`km_dia_por_operadora`). Com `processos` > 1
+    as operadoras são repartidas num pool de processos.
+    Retorna (carga_kw, energia_nao_reposta_kwh), ambos alinhados a `locais`.
+    """
+    p = {**PREMISSAS_PADRAO, **PREMISSAS_CARGA, **(premissas or {})}
+    relativo = perfil_passos(perfil_horario)
+    carregadores = np.broadcast_to(np.asarray(carregadores, dtype=float), (len(locais),))
+    potencia_kw = np.broadcast_to(np.asarray(potencia_kw, dtype=float), (len(locais),))
+
+    carga = np.zeros((len(locais), PASSOS_DIA))
+    nao_reposta = np.zeros(len(locais))
+
+    garagem = (locais['tipo'] == 'garagem').to_numpy()
+    terminal = ~garagem
+    carga[terminal] = carga_terminais(locais['onibus'].to_numpy()[terminal],
+                                      carregadores[terminal], potencia_kw[terminal],
+                                      relativo, p)
+
+    grupos = [(op, np.flatnonzero(garagem & (locais['operadora'] == op).to_numpy()))
+              for op in pd.unique(locais.loc[garagem, 'operadora'])]
+    tarefas = [(locais['onibus'].to_numpy()[idx], carregadores[idx], potencia_kw[idx],
+                float(km_operadora.get(op, 0.0)), relativo, p) for op, idx in grupos]
+
+    processos = min(processos or os.cpu_count() or 1, len(tarefas))
+    if processos <= 1:
+        resultados = _simular_lote(tarefas)
+    else:
+        lotes = [tarefas[i::processos] for i in range(processos)]
+        with ProcessPoolExecutor(processos, mp_context=contexto_processos()) as pool:
+            por_lote = list(pool.map(_simular_lote, lotes))
+        resultados = [None] * len(tarefas)
+        for i, lote in enumerate(por_lote):
+            resultados[i::processos] = lote
+
+    for (_, idx), (carga_op, falta_op) in zip(grupos, resultados):
+        carga[idx] = carga_op
+        nao_reposta[idx] = falta_op
+    return carga, nao_reposta
+
+
+def resumo_carga(locais, carga, nao_reposta):
+    """Por local: pico (kW) e hora, energia do dia, energia e % no horário de ponta"""
+    horas = horas_passos()
+    ponta = em_ponta(horas)
+    energia = carga.sum(axis=1) * PASSO_H
+    energia_ponta = carga[:, ponta].sum(axis=1) * PASSO_H
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct_ponta = np.where(energia > 0, energia_ponta / energia * 100, 0.0)
+    return pd.DataFrame({
+        'tipo': locais['tipo'].to_numpy(),
+        'nome': locais['nome'].to_numpy(),
+        'operadora': locais['operadora'].to_numpy(),
+        'pico_kw': carga.max(axis=1, initial=0.0),
+        'hora_pico': horas[carga.argmax(axis=1)] if carga.size else np.zeros(len(locais)),
+        'energia_dia_kwh': energia,
+        'energia_ponta_kwh': energia_ponta,
+        'pct_ponta': pct_ponta,
+        'nao_reposta_kwh': nao_reposta,
+    })
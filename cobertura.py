@@ -0,0 +1,126 @@
+"""
+COBERTURA - PARADA MAIS PRÓXIMA DE UM CARREGADOR
+================================================
+Atribui cada parada ao local de recarga (garagem ou terminal) mais próximo
+numa única consulta vetorizada a uma KD-tree.
+
+As coordenadas vão para a esfera unitária (x, y, z): o vizinho mais próximo
+pela corda é o mesmo pela distância de grande círculo, e a corda c vira
+distância haversine com d = 2R·asin(c/2). Sem o SciPy, a mesma conta sai
+por força bruta em blocos (paradas x locais), também sem loop por parada.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # SciPy é opcional (requirements.txt)
+    cKDTree = None
+
+RAIO_TERRA_KM = 6371.0088
+
+# Faixas de distância até o carregador: (limite superior em km, rótulo, cor)
+FAIXAS_DISTANCIA = (
+    (1.0, 'até 1 km', '#2ca02c'),
+    (3.0, '1 a 3 km', '#bcbd22'),
+    (5.0, '3 a 5 km', '#ff7f0e'),
+    (np.inf, 'acima de 5 km', '#d62728'),
+)
+
+# Paradas por bloco na força bruta (limita a matriz paradas x locais)
+TAMANHO_BLOCO = 50_000
+
+
+def _unitario(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def _corda_para_km(corda):
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.clip(corda / 2, 0.0, 1.0))
+
+
+def _mais_proximo_bruto(pontos, alvos, tamanho_bloco=TAMANHO_BLOCO):
+    corda = np.empty(len(pontos))
+    indice = np.empty(len(pontos), dtype=np.int64)
+    for inicio in range(0, len(pontos), tamanho_bloco):
+        bloco = pontos[inicio:inicio + tamanho_bloco]
+        d2 = ((bloco[:, None, :] - alvos[None, :, :]) ** 2).sum(axis=2)
+        i = d2.argmin(axis=1)
+        indice[inicio:inicio + len(bloco)] = i
+        corda[inicio:inicio + len(bloco)] = np.sqrt(d2[np.arange(len(bloco)), i])
+    return corda, indice
+
+
+def atribuir_carregadores(df_paradas, locais):
+    """Local de recarga mais próximo de cada parada.
+
+    `locais` segue `infraestrutura.tabela_locais` (tipo, nome, lat, lon).
+    Retorna um DataFrame alinhado a df_paradas com a posição do local em
+    `locais`, nome, tipo, distância em km e faixa de distância. Sem nenhum
+    local, toda parada fica com local -1 e distância infinita (última faixa).
+    """
+    if len(locais) == 0:
+        return pd.DataFrame({
+            'local': np.full(len(df_paradas), -1, dtype=np.int64),
+            'nome_local': None, 'tipo_local': None,
+            'distancia_km': np.full(len(df_paradas), np.inf),
+            'faixa': np.full(len(df_paradas), len(FAIXAS_DISTANCIA) - 1, dtype=np.int64),
+        }, index=df_paradas.index)
+
+    alvos = _unitario(locais['lat'], locais['lon'])
+    pontos = _unitario(df_paradas['lat'], df_paradas['lon'])
+
+    if cKDTree is not None:
+        corda, indice = cKDTree(alvos).query(pontos, k=1)
+    else:
+        corda, indice = _mais_proximo_bruto(pontos, alvos)
+
+    distancia = _corda_para_km(corda)
+    limites = np.array([limite for limite, _, _ in FAIXAS_DISTANCIA])
+    faixa = np.searchsorted(limites, distancia, side='left')
+
+    return pd.DataFrame({
+        'local': np.asarray(indice, dtype=np.int64),
+        'nome_local': locais['nome'].to_numpy()[indice],
+        'tipo_local': locais['tipo'].to_numpy()[indice],
+        'distancia_km': distancia,
+        'faixa': faixa,
+    }, index=df_paradas.index)
+
+
+def resumo_cobertura(atribuicao):
+    """Estatísticas de cobertura: percentis de distância e paradas por faixa"""
+    distancia = atribuicao['distancia_km'].to_numpy()
+    por_faixa = np.bincount(atribuicao['faixa'].to_numpy(), minlength=len(FAIXAS_DISTANCIA))
+    # Sem nenhum local as distâncias são infinitas (inf - inf na interpolação)
+    with np.errstate(invalid='ignore'):
+        p50, p90 = np.percentile(distancia, [50, 90]) if len(distancia) else (0.0, 0.0)
+    return {
+        'n': len(distancia),
+        'distancia_media': float(distancia.mean()) if len(distancia) else 0.0,
+        'distancia_p50': float(p50),
+        'distancia_p90': float(p90),
+        'distancia_max': float(distancia.max(initial=0.0)),
+        'por_faixa': {rotulo: int(n) for (_, rotulo, _), n in zip(FAIXAS_DISTANCIA, por_faixa)},
+    }
+
+
+def paradas_por_local(atribuicao, locais):
+    """Paradas atendidas e distância média por local (todos os locais, inclusive sem paradas)"""
+    local = atribuicao['local'].to_numpy()
+    atendidas = local >= 0
+    n = np.bincount(local[atendidas], minlength=len(locais))
+    soma = np.bincount(local[atendidas], weights=atribuicao['distancia_km'].to_numpy()[atendidas],
+                       minlength=len(locais))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media = np.where(n > 0, soma / n, np.nan)
+    return pd.DataFrame({
+        'tipo': locais['tipo'].to_numpy(),
+        'nome': locais['nome'].to_numpy(),
+        'paradas': n,
+        'distancia_media_km': media,
+    }).sort_values('paradas', ascending=False, kind='stable').reset_index(drop=True)
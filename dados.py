@@ -0,0 +1,316 @@
+"""
+DADOS - PACOTE ÚNICO VERSIONADO
+===============================
+Consolida todas as fontes do dashboard (JSONs do NB6, paradas em Parquet,
+planilhas da Análise Operacional e as contagens de horários por linha e por
+parada x hora) num único pacote em `dashboard_data/pacote/`:
+- uma tabela Arrow/Feather sem compressão por tabela, lida por memory-map e
+  só nas colunas pedidas
+- `documentos.json` com os três JSONs
+- `manifesto.json` com a versão (hash do conteúdo das fontes), a assinatura
+  das fontes e as colunas/linhas de cada tabela
+
+O pacote só é refeito quando alguma fonte muda; a versão do manifesto é a
+chave de todos os caches do app. O que o pacote entrega é só-leitura e pode
+ser compartilhado entre sessões (`st.cache_resource`): documentos congelados
+e DataFrames que apontam direto para os buffers Arrow do memory-map.
+
+Uso (reconstrução forçada):
+    python dados.py
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from types import MappingProxyType
+
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from demanda import COLUNA_PARADA, tabela_viagens_por_parada
+from processos import contexto_processos
+from rankings import ARQUIVO_HORARIOS, contar_horarios_por_linha
+
+DATA_DIR = Path("dashboard_data")
+PACOTE_DIR = DATA_DIR / "pacote"
+MANIFESTO = 'manifesto.json'
+ARQUIVO_DOCUMENTOS = 'documentos.json'
+FORMATO_PACOTE = 2
+
+# nome do documento -> JSON de origem
+DOCUMENTOS = {
+    'dados': DATA_DIR / 'dashboard_data_REAL.json',
+    'kpis': DATA_DIR / 'kpis_base.json',
+    'config': DATA_DIR / 'config_dashboard.json',
+}
+
+ARQUIVO_PARADAS = DATA_DIR / 'dados_paradas.parquet'
+
+# nome da tabela -> (planilha de origem, aba)
+TABELAS_OPERACIONAIS = {
+    'consolidado': ('dados_consolidados.xlsx', 0),
+    'operadoras': ('dados_consolidados.xlsx', 'Operadoras'),
+    'frota_investimento': ('analise_frota_completa.xlsx', 'Investimento'),
+}
+
+
+def tipar_tabela(df):
+    """Dtypes estáveis: linha_nome como texto e colunas de texto como string"""
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        serie = df[col]
+        if col == 'linha_nome':
+            # Mesmo texto que o dashboard sempre usou: astype(str) do float lido
+            df[col] = serie.astype(str).astype('string')
+        elif pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            df[col] = serie.astype('string')
+    return df
+
+
+def congelar(obj):
+    """Estrutura JSON só-leitura: dicts viram MappingProxyType e listas, tuplas"""
+    if isinstance(obj, dict):
+        return MappingProxyType({chave: congelar(valor) for chave, valor in obj.items()})
+    if isinstance(obj, list):
+        return tuple(congelar(valor) for valor in obj)
+    return obj
+
+
+def fontes_pacote():
+    """Todos os arquivos de origem do pacote (ausentes inclusive)"""
+    planilhas = sorted({arquivo for arquivo, _ in TABELAS_OPERACIONAIS.values()})
+    return [*DOCUMENTOS.values(), ARQUIVO_PARADAS, *planilhas, ARQUIVO_HORARIOS]
+
+
+def assinatura_arquivos(*arquivos):
+    """(arquivo, mtime, tamanho) de cada fonte: muda quando algum arquivo muda"""
+    assinatura = []
+    for arquivo in arquivos:
+        caminho = Path(arquivo)
+        if caminho.exists():
+            info = caminho.stat()
+            assinatura.append((str(caminho), info.st_mtime_ns, info.st_size))
+        else:
+            assinatura.append((str(caminho), None, None))
+    return tuple(assinatura)
+
+
+def hash_arquivos(*arquivos, tamanho_bloco=1 << 20):
+    """Hash curto do conteúdo dos arquivos (lidos em blocos; ausentes contam como vazios)"""
+    h = hashlib.sha1()
+    for arquivo in arquivos:
+        caminho = Path(arquivo)
+        h.update(str(caminho).encode('utf-8'))
+        if caminho.exists():
+            with open(caminho, 'rb') as f:
+                for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+                    h.update(bloco)
+    return h.hexdigest()[:16]
+
+
+def _ler_manifesto(destino):
+    try:
+        with open(Path(destino) / MANIFESTO, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _atual(manifesto, assinatura):
+    return (manifesto is not None
+            and manifesto.get('formato') == FORMATO_PACOTE
+            and manifesto.get('fontes') == [list(item) for item in assinatura])
+
+
+def _ler_paradas():
+    return pq.read_table(ARQUIVO_PARADAS).to_pandas()
+
+
+def _ler_planilha(arquivo, aba):
+    return tipar_tabela(pd.read_excel(arquivo, sheet_name=aba))
+
+
+def _viagens_parada_hora():
+    # Alinhada linha a linha à tabela de paradas
+    stop_ids = pq.read_table(ARQUIVO_PARADAS, columns=[COLUNA_PARADA]).column(COLUNA_PARADA)
+    return tabela_viagens_por_parada(ARQUIVO_HORARIOS, stop_ids.to_numpy())
+
+
+def _tabelas_origem():
+    """nome -> (fontes, função, argumentos) que montam a tabela a partir das fontes"""
+    tabelas = {'paradas': ((ARQUIVO_PARADAS,), _ler_paradas, ())}
+    for nome, (arquivo, aba) in TABELAS_OPERACIONAIS.items():
+        tabelas[nome] = ((arquivo,), _ler_planilha, (arquivo, aba))
+    tabelas['horarios_por_linha'] = ((ARQUIVO_HORARIOS,), contar_horarios_por_linha,
+                                     (ARQUIVO_HORARIOS,))
+    tabelas['viagens_parada_hora'] = ((ARQUIVO_PARADAS, ARQUIVO_HORARIOS),
+                                      _viagens_parada_hora, ())
+    return tabelas
+
+
+def _montar_tabela(nome, montar, argumentos, destino):
+    """Monta e grava uma tabela (roda nos processos): (nome, info) ou (nome, erro)"""
+    try:
+        df = montar(*argumentos)
+    except Exception as e:
+        return nome, str(e)
+    caminho = Path(destino) / f"{nome}.feather"
+    temporario = caminho.with_suffix('.tmp')
+    feather.write_feather(df, temporario, compression='uncompressed')
+    # Troca atômica: quem já mapeou a versão anterior continua lendo a antiga
+    os.replace(temporario, caminho)
+    return nome, {'colunas': [str(c) for c in df.columns], 'linhas': len(df)}
+
+
+def _gravar_json(obj, caminho):
+    temporario = caminho.with_suffix('.tmp')
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def construir_pacote(destino=PACOTE_DIR, forcar=False, processos=1, progresso=None):
+    """Monta (ou reaproveita) o pacote em `destino` e devolve o manifesto.
+
+    Só as tabelas cujas fontes mudaram de conteúdo (hash) são refeitas; as
+    demais são reaproveitadas do pacote anterior. Com `processos` > 1 as
+    tabelas a refazer são montadas em paralelo num pool de processos.
+    `progresso(nome, resultado)` é chamado a cada tabela montada: `resultado`
+    são os metadados da tabela ou, se ela falhou, a mensagem de erro.
+
+    Fontes ausentes ou ilegíveis ficam de fora do pacote, com a mensagem em
+    `manifesto['erros']`; os documentos JSON são obrigatórios. O manifesto é
+    gravado por último, então um pacote pela metade nunca parece atual.
+    """
+    destino = Path(destino)
+    fontes = fontes_pacote()
+    assinatura = assinatura_arquivos(*fontes)
+    manifesto = _ler_manifesto(destino)
+    if not forcar and _atual(manifesto, assinatura):
+        return manifesto
+
+    destino.mkdir(parents=True, exist_ok=True)
+
+    documentos = {}
+    for nome, arquivo in DOCUMENTOS.items():
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            documentos[nome] = json.load(f)
+    _gravar_json(documentos, destino / ARQUIVO_DOCUMENTOS)
+
+    hashes = {str(fonte): hash_arquivos(fonte) for fonte in fontes}
+    anteriores = {} if forcar or manifesto is None or manifesto.get('formato') != FORMATO_PACOTE \
+        else manifesto['tabelas']
+
+    tabelas, erros, pendentes = {}, {}, []
+    for nome, (fontes_tabela, montar, argumentos) in _tabelas_origem().items():
+        hash_tabela = '-'.join(hashes[str(fonte)] for fonte in fontes_tabela)
+        anterior = anteriores.get(nome)
+        if (anterior is not None and anterior.get('hash') == hash_tabela
+                and (destino / f"{nome}.feather").exists()):
+            tabelas[nome] = anterior
+        else:
+            pendentes.append((nome, montar, argumentos, hash_tabela))
+
+    def registrar(nome, resultado, hash_tabela):
+        if isinstance(resultado, dict):
+            tabelas[nome] = {**resultado, 'hash': hash_tabela}
+        else:
+            erros[nome] = resultado
+        if progresso:
+            progresso(nome, resultado)
+
+    processos = min(processos or os.cpu_count() or 1, len(pendentes))
+    if processos <= 1:
+        for nome, montar, argumentos, hash_tabela in pendentes:
+            registrar(*_montar_tabela(nome, montar, argumentos, destino), hash_tabela)
+    else:
+        with ProcessPoolExecutor(processos, mp_context=contexto_processos()) as pool:
+            futuros = {pool.submit(_montar_tabela, nome, montar, argumentos, destino): hash_tabela
+                       for nome, montar, argumentos, hash_tabela in pendentes}
+            for futuro in as_completed(futuros):
+                registrar(*futuro.result(), futuros[futuro])
+
+    manifesto = {
+        'formato': FORMATO_PACOTE,
+        'versao': hashlib.sha1(''.join(hashes.values()).encode()).hexdigest()[:16],
+        'fontes': [list(item) for item in assinatura],
+        'tabelas': dict(sorted(tabelas.items())),
+        'erros': erros,
+    }
+    _gravar_json(manifesto, destino / MANIFESTO)
+    return manifesto
+
+
+class PacoteDados:
+    """Leitura preguiçosa do pacote: documentos e tabelas só quando pedidos.
+
+    Tabelas são lidas por memory-map e só nas colunas pedidas; cada
+    (tabela, colunas) é lida uma vez por processo. Tudo é só-leitura: os
+    documentos vêm congelados e as colunas dos DataFrames são vistas dos
+    buffers Arrow (`split_blocks`, sem consolidar em blocos novos).
+    """
+
+    def __init__(self, destino=PACOTE_DIR, manifesto=None):
+        self.destino = Path(destino)
+        self.manifesto = manifesto or _ler_manifesto(self.destino)
+        if self.manifesto is None:
+            raise FileNotFoundError(f"Pacote de dados não encontrado em {self.destino}")
+        self.versao = self.manifesto['versao']
+        self._documentos = None
+        self._tabelas = {}
+        self._lock = threading.Lock()
+
+    def documento(self, nome):
+        """Um dos JSONs de origem ('dados', 'kpis', 'config')"""
+        with self._lock:
+            if self._documentos is None:
+                with open(self.destino / ARQUIVO_DOCUMENTOS, 'r', encoding='utf-8') as f:
+                    self._documentos = congelar(json.load(f))
+        return self._documentos[nome]
+
+    def tem_tabela(self, nome):
+        return nome in self.manifesto['tabelas']
+
+    def tabela(self, nome, colunas=None):
+        """DataFrame da tabela (só as `colunas` pedidas, se dadas).
+
+        Uma tabela que não entrou no pacote levanta o erro original da fonte.
+        """
+        if not self.tem_tabela(nome):
+            erro = self.manifesto['erros'].get(nome, f"Tabela '{nome}' fora do pacote")
+            raise LookupError(erro)
+        chave = (nome, tuple(colunas) if colunas is not None else None)
+        with self._lock:
+            if chave not in self._tabelas:
+                self._tabelas[chave] = feather.read_table(
+                    self.destino / f"{nome}.feather",
+                    columns=list(colunas) if colunas is not None else None,
+                    memory_map=True,
+                ).to_pandas(split_blocks=True)
+            return self._tabelas[chave]
+
+
+def abrir_pacote(destino=PACOTE_DIR):
+    """Pacote atualizado; com `destino` só-leitura (ex.: deploy), monta no temporário"""
+    try:
+        manifesto = construir_pacote(destino)
+    except OSError:
+        manifesto = _ler_manifesto(destino)
+        if manifesto is None or not _atual(manifesto, assinatura_arquivos(*fontes_pacote())):
+            destino = Path(tempfile.gettempdir()) / 'dashboard_pacote'
+            manifesto = construir_pacote(destino)
+    return PacoteDados(destino, manifesto)
+
+
+if __name__ == '__main__':
+    manifesto = construir_pacote(forcar=True)
+    for nome, info in manifesto['tabelas'].items():
+        print(f"✅ {nome}: {info['linhas']:,} linhas x {len(info['colunas'])} colunas")
+    for nome, erro in manifesto['erros'].items():
+        print(f"⚠️ {nome}: {erro}")
+    print(f"📦 {PACOTE_DIR} (versão {manifesto['versao']})")
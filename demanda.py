@@ -0,0 +1,114 @@
+"""
+DEMANDA - VIAGENS POR PARADA E HORA
+===================================
+Cruza os horários (`horarios_expandidos.csv`, uma linha por passagem de uma
+viagem numa parada) com as paradas e conta as viagens de cada parada em cada
+hora do dia, somadas na semana (as mesmas passagens que o ranking de demanda
+conta como `horarios_semana`). O resultado é uma matriz compacta paradas x 24
+(uint32), alinhada linha a linha à tabela de paradas, montada uma vez no
+pacote de dados e só lida pelo app.
+
+A contagem é em streaming (lotes do CSV, só as colunas de parada e horário)
+e vetorizada: cada passagem vira o índice plano parada x 24 + hora e os
+lotes são somados com bincount. Horários podem vir em minutos desde a
+meia-noite ou como texto "HH:MM[:SS]"; horas >= 24 (viagens que passam da
+meia-noite, como no GTFS) voltam para 0-23.
+"""
+
+import errno
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+COLUNA_PARADA = 'stopId'
+COLUNA_HORARIO = 'horario'
+HORAS = 24
+COLUNAS_HORAS = tuple(f'h{hora:02d}' for hora in range(HORAS))
+
+# Bytes de CSV por lote na contagem em streaming
+TAMANHO_BLOCO = 1 << 20
+
+
+def _horas(horarios):
+    """Hora do dia (0-23) de cada horário (texto); -1 onde vazio ou ilegível"""
+    partes = pc.extract_regex(horarios, r'^\s*(?P<numero>\d+)(?P<relogio>:?)')
+    numero = pc.cast(pc.struct_field(partes, 'numero'), pa.int64())
+    relogio = pc.equal(pc.struct_field(partes, 'relogio'), ':')
+    horas = pc.fill_null(pc.if_else(relogio, numero, pc.divide(numero, 60)), -1).to_numpy()
+    return np.where(horas >= 0, horas % HORAS, -1)
+
+
+def contar_viagens_por_parada(arquivo, stop_ids, tamanho_bloco=TAMANHO_BLOCO):
+    """Matriz (len(stop_ids) x 24) de viagens por parada e hora.
+
+    Passagens em paradas fora de `stop_ids` ou sem horário legível são
+    descartadas. A memória de pico fica em alguns lotes do CSV + a matriz.
+    """
+    if not Path(arquivo).exists():
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(arquivo))
+
+    formato = ds.CsvFileFormat(
+        read_options=pacsv.ReadOptions(block_size=tamanho_bloco, use_threads=False),
+        convert_options=pacsv.ConvertOptions(column_types={COLUNA_PARADA: pa.int64(),
+                                                          COLUNA_HORARIO: pa.string()}),
+    )
+    dataset = ds.dataset(arquivo, format=formato)
+    faltando = [c for c in (COLUNA_PARADA, COLUNA_HORARIO) if c not in dataset.schema.names]
+    if faltando:
+        raise KeyError(f"{arquivo} sem a(s) coluna(s) {', '.join(faltando)}: "
+                       f"não dá para cruzar horários com paradas")
+    scanner = dataset.scanner(columns=[COLUNA_PARADA, COLUNA_HORARIO], batch_readahead=1,
+                              fragment_readahead=1, use_threads=False)
+
+    ids = np.asarray(stop_ids, dtype=np.int64)
+    ordem = np.argsort(ids, kind='stable')
+    ordenados = ids[ordem]
+    contagem = np.zeros(len(ids) * HORAS, dtype=np.int64)
+    if len(ids) == 0:
+        return contagem.reshape(0, HORAS).astype(np.uint32)
+
+    for lote in scanner.to_batches():
+        if lote.num_rows == 0:
+            continue
+        parada = pc.fill_null(lote.column(COLUNA_PARADA), -1).to_numpy()
+        hora = _horas(lote.column(COLUNA_HORARIO))
+        posicao = np.minimum(np.searchsorted(ordenados, parada), len(ordenados) - 1)
+        validas = (ordenados[posicao] == parada) & (hora >= 0)
+        contagem += np.bincount(ordem[posicao[validas]] * HORAS + hora[validas],
+                                minlength=contagem.size)
+
+    return contagem.reshape(len(ids), HORAS).astype(np.uint32)
+
+
+def tabela_viagens_por_parada(arquivo, stop_ids, tamanho_bloco=TAMANHO_BLOCO):
+    """Tabela do pacote: stopId + uma coluna uint32 por hora (h00 ... h23)"""
+    matriz = contar_viagens_por_parada(arquivo, stop_ids, tamanho_bloco)
+    return pd.DataFrame({
+        COLUNA_PARADA: np.asarray(stop_ids, dtype=np.int64),
+        **{coluna: matriz[:, hora] for hora, coluna in enumerate(COLUNAS_HORAS)},
+    })
+
+
+def matriz_viagens(tabela):
+    """Matriz paradas x 24 a partir da tabela do pacote"""
+    return np.column_stack([tabela[coluna].to_numpy() for coluna in COLUNAS_HORAS])
+
+
+def paradas_mais_servidas(matriz, df_paradas, n=10):
+    """As `n` paradas com mais viagens na semana, com o total e a hora de pico"""
+    total = matriz.sum(axis=1, dtype=np.int64)
+    n = min(n, len(total))
+    topo = np.argpartition(-total, n - 1)[:n] if n else np.array([], dtype=np.int64)
+    topo = topo[np.argsort(-total[topo], kind='stable')]
+    return pd.DataFrame({
+        'parada': topo,
+        'stop_name': df_paradas['stop_name'].to_numpy()[topo],
+        'viagens_semana': total[topo],
+        'hora_pico': matriz[topo].argmax(axis=1) if n else np.array([], dtype=np.int64),
+    })
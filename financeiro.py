@@ -0,0 +1,281 @@
+"""
+FINANCEIRO - MOTOR DE CENÁRIOS
+==============================
+Fluxo de caixa vetorizado (NumPy) do projeto de eletrificação: VPL, TIR,
+payback simples/descontado e IL para grades inteiras de aumento tarifário e
+taxa de desconto numa única chamada.
+
+Modelo (o mesmo do notebook que gerou `cenarios_financeiros`):
+- ano 0: investimento
+- anos 1..vida_util: benefício = economia operacional + receita adicional
+  (passageiros pagantes x tarifa média x aumento)
+- ano vida_util: valor residual
+- payback descontado: primeiro ano (até HORIZONTE_PAYBACK) em que os
+  benefícios descontados cobrem o investimento; 999 quando não cobrem
+
+O modo Monte Carlo sorteia demanda, aumento, custo dos carregadores e taxa
+de desconto e avalia os sorteios em lotes vetorizados num pool de processos.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from infraestrutura import PREMISSAS_PADRAO
+from processos import contexto_processos
+
+TAXA_DESCONTO = 0.08      # TMA
+VIDA_UTIL = 15            # anos
+HORIZONTE_PAYBACK = 30    # anos
+SEM_PAYBACK = 999
+
+
+def _soma_custo(itens):
+    return float(sum(item.get('custo_total', 0) for item in itens))
+
+
+def _custo_equipamentos(itens):
+    """Só os carregadores (sem obra civil/conexão): `custo_carregadores` do local
+    ou, sem ele (terminais), carregadores x custo unitário padrão"""
+    return float(sum(item.get('custo_carregadores',
+                              item.get('carregadores', 0) * PREMISSAS_PADRAO['custo_carregador'])
+                     for item in itens))
+
+
+def calibrar_parametros(dados, kpis_base):
+    """Parâmetros do fluxo de caixa.
+
+    Com `cenarios_financeiros` presentes, investimento, economia operacional,
+    passageiros pagantes e valor residual são recuperados dos cenários do
+    notebook (o motor reproduz os 10 cenários). Sem eles, o investimento é só
+    o custo das garagens/terminais e a demanda é `passageiros_ano`.
+    """
+    tarifa = kpis_base.get('tarifa_media_atual', 4.39)
+    custo_recarga = _soma_custo(dados.get('garagens', [])) + _soma_custo(dados.get('terminais', []))
+    params = {
+        'investimento': custo_recarga,
+        'custo_recarga': custo_recarga,
+        'custo_carregadores': (_custo_equipamentos(dados.get('garagens', []))
+                               + _custo_equipamentos(dados.get('terminais', []))),
+        'economia_anual': 0.0,
+        'passageiros_ano': float(kpis_base['passageiros_ano']),
+        'tarifa': tarifa,
+        'valor_residual': 0.0,
+        'taxa': TAXA_DESCONTO,
+        'vida_util': VIDA_UTIL,
+    }
+
+    cenarios = [c for c in dados.get('cenarios_financeiros', []) if c.get('aumento_pct')]
+    if not cenarios:
+        return params
+
+    aumento = np.array([c['aumento_pct'] for c in cenarios], dtype=float) / 100
+    receita = np.array([c['receita_adicional'] for c in cenarios], dtype=float)
+    beneficio = np.array([c['beneficio_anual'] for c in cenarios], dtype=float)
+    payback = np.array([c['payback_simples'] for c in cenarios], dtype=float)
+    vpl = np.array([c['vpl'] for c in cenarios], dtype=float)
+
+    investimento = float(np.median(payback * beneficio))
+    r, n = TAXA_DESCONTO, VIDA_UTIL
+    residual = (vpl + investimento - beneficio * _fator_anuidade(r, n)) * (1 + r) ** n
+
+    params.update(
+        investimento=investimento,
+        economia_anual=float(np.median(beneficio - receita)),
+        passageiros_ano=float(np.median(receita / (tarifa * aumento))),
+        valor_residual=float(np.median(residual)),
+    )
+    return params
+
+
+def _fator_anuidade(taxa, anos):
+    """Valor presente de 1 por ano durante `anos` anos (vetorizado, taxa 0 ok)"""
+    taxa = np.asarray(taxa, dtype=float)
+    perto_zero = np.abs(taxa) < 1e-12
+    segura = np.where(perto_zero, 1.0, taxa)
+    return np.where(perto_zero, anos, (1 - (1 + segura) ** -anos) / segura)
+
+
+def _vpl(taxa, investimento, beneficio, residual, anos):
+    return (beneficio * _fator_anuidade(taxa, anos)
+            + residual * (1 + taxa) ** -anos - investimento)
+
+
+def _tir(investimento, beneficio, residual, anos, iteracoes=100):
+    """TIR por bisseção vetorizada em (-99%, 1000%); NaN sem troca de sinal"""
+    lo = np.full(np.shape(beneficio), -0.99)
+    hi = np.full(np.shape(beneficio), 10.0)
+    f_lo = _vpl(lo, investimento, beneficio, residual, anos)
+    f_hi = _vpl(hi, investimento, beneficio, residual, anos)
+    valida = (f_lo > 0) & (f_hi < 0)
+    for _ in range(iteracoes):
+        meio = (lo + hi) / 2
+        positivo = _vpl(meio, investimento, beneficio, residual, anos) > 0
+        lo = np.where(positivo, meio, lo)
+        hi = np.where(positivo, hi, meio)
+    return np.where(valida, (lo + hi) / 2, np.nan)
+
+
+def avaliar_cenarios(params, aumento_pct, taxa=None, investimento=None,
+                     passes_adicionais=0.0):
+    """Avalia todos os cenários de uma vez.
+
+    `aumento_pct`, `taxa`, `investimento` e `passes_adicionais` podem ser
+    escalares ou arrays; o resultado segue o broadcast entre eles (ex.:
+    aumento[:, None] x taxa[None, :] gera a grade completa). Passes
+    adicionais (novos usuários) pagam a tarifa nova inteira.
+    """
+    taxa = params['taxa'] if taxa is None else taxa
+    investimento = params['investimento'] if investimento is None else investimento
+    aumento, taxa, investimento, passes = np.broadcast_arrays(
+        np.asarray(aumento_pct, dtype=float), np.asarray(taxa, dtype=float),
+        np.asarray(investimento, dtype=float), np.asarray(passes_adicionais, dtype=float))
+
+    anos = params['vida_util']
+    residual = params['valor_residual']
+    nova_tarifa = params['tarifa'] * (1 + aumento / 100)
+    receita_adicional = (params['passageiros_ano'] * params['tarifa'] * aumento / 100
+                         + passes * nova_tarifa)
+    beneficio = params['economia_anual'] + receita_adicional
+
+    valor_presente = beneficio * _fator_anuidade(taxa, anos) + residual * (1 + taxa) ** -anos
+    vpl = valor_presente - investimento
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payback_simples = np.where(beneficio > 0, investimento / beneficio, SEM_PAYBACK)
+
+        # Primeiro t com beneficio * anuidade(taxa, t) >= investimento (forma fechada)
+        resto = 1 - taxa * investimento / beneficio
+        anos_desc = np.where(
+            np.abs(taxa) < 1e-12, investimento / beneficio,
+            -np.log(np.where(resto > 0, resto, np.nan)) / np.log1p(taxa))
+        payback_desc = np.ceil(anos_desc - 1e-9)
+        payback_desc = np.where((beneficio > 0) & (payback_desc <= HORIZONTE_PAYBACK),
+                                payback_desc, SEM_PAYBACK)
+
+        il = valor_presente / investimento
+
+    tir = _tir(investimento, beneficio, residual, anos) * 100
+
+    return {
+        'aumento_pct': aumento,
+        'taxa': taxa,
+        'nova_tarifa': nova_tarifa,
+        'receita_adicional': receita_adicional,
+        'beneficio_anual': beneficio,
+        'payback_simples': payback_simples,
+        'payback_descontado': payback_desc,
+        'vpl': vpl,
+        'tir': tir,
+        'il': il,
+        'viavel': vpl > 0,
+    }
+
+
+# ============================================================================
+# MONTE CARLO
+# ============================================================================
+
+TAMANHO_LOTE = 25_000
+PASSES_POR_USUARIO_ANO = 3 * 365
+
+# Faixas padrão dos sorteios
+FAIXAS_PADRAO = {
+    'novos_usuarios': (0, 200_000),        # uniforme (usuários)
+    'aumento_pct': (30.0, 50.0, 70.0),     # triangular (mín, moda, máx)
+    'custo_carregadores': (0.8, 1.0, 1.3),  # triangular, fator sobre os carregadores
+    'taxa': (0.06, 0.10),                  # uniforme
+}
+
+ENTRADAS_MONTE_CARLO = ('novos_usuarios', 'aumento_pct', 'custo_carregadores', 'taxa')
+
+
+def sortear_entradas(faixas, n, rng):
+    """Sorteia n conjuntos de entradas conforme as faixas"""
+    def triangular(faixa):
+        lo, moda, hi = faixa
+        return np.full(n, moda, dtype=float) if hi <= lo else rng.triangular(lo, moda, hi, n)
+
+    return {
+        'novos_usuarios': rng.uniform(*faixas['novos_usuarios'], n),
+        'aumento_pct': triangular(faixas['aumento_pct']),
+        'custo_carregadores': triangular(faixas['custo_carregadores']),
+        'taxa': rng.uniform(*faixas['taxa'], n),
+    }
+
+
+def avaliar_lote(params, faixas, n, semente):
+    """Um lote de sorteios avaliado de forma vetorizada (roda nos processos)"""
+    rng = np.random.default_rng(semente)
+    entradas = sortear_entradas(faixas, n, rng)
+
+    # O fator de custo incide só nos equipamentos (obra civil e rede ficam fixas)
+    investimento = (params['investimento']
+                    + params['custo_carregadores'] * (entradas['custo_carregadores'] - 1))
+    resultado = avaliar_cenarios(
+        params, entradas['aumento_pct'], entradas['taxa'], investimento,
+        passes_adicionais=entradas['novos_usuarios'] * PASSES_POR_USUARIO_ANO)
+
+    return {**entradas, 'vpl': resultado['vpl'], 'tir': resultado['tir']}
+
+
+def simular_monte_carlo(params, faixas=None, n_amostras=100_000, semente=42,
+                        processos=None, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Distribuição de VPL/TIR para n_amostras sorteios.
+
+    Os lotes vão para um ProcessPoolExecutor (`processos=1` roda no próprio
+    processo). `progresso(lotes_prontos, total_lotes)` é chamado a cada lote.
+    O resultado é reprodutível para a mesma semente, qualquer que seja o
+    número de processos.
+    """
+    faixas = {**FAIXAS_PADRAO, **(faixas or {})}
+    tamanhos = [min(tamanho_lote, n_amostras - i) for i in range(0, n_amostras, tamanho_lote)]
+    sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+    processos = processos or min(os.cpu_count() or 1, len(tamanhos))
+
+    lotes = [None] * len(tamanhos)
+    if processos <= 1:
+        for i, (n, ss) in enumerate(zip(tamanhos, sementes)):
+            lotes[i] = avaliar_lote(params, faixas, n, ss)
+            if progresso:
+                progresso(i + 1, len(tamanhos))
+    else:
+        with ProcessPoolExecutor(processos, mp_context=contexto_processos()) as pool:
+            futuros = {pool.submit(avaliar_lote, params, faixas, n, ss): i
+                       for i, (n, ss) in enumerate(zip(tamanhos, sementes))}
+            for prontos, futuro in enumerate(as_completed(futuros), start=1):
+                lotes[futuros[futuro]] = futuro.result()
+                if progresso:
+                    progresso(prontos, len(tamanhos))
+
+    return {chave: np.concatenate([lote[chave] for lote in lotes]) for chave in lotes[0]}
+
+
+def resumir_monte_carlo(amostras):
+    """Percentis de VPL/TIR, probabilidade de viabilidade e sensibilidade.
+
+    A sensibilidade é a correlação de postos (Spearman) de cada entrada com o VPL.
+    """
+    vpl = amostras['vpl']
+    tir = amostras['tir'][np.isfinite(amostras['tir'])]
+    percentis = (5, 25, 50, 75, 95)
+
+    def postos(x):
+        return np.argsort(np.argsort(x)).astype(float)
+
+    postos_vpl = postos(vpl)
+    sensibilidade = {
+        entrada: float(np.corrcoef(postos(amostras[entrada]), postos_vpl)[0, 1])
+        if np.ptp(amostras[entrada]) > 0 else 0.0
+        for entrada in ENTRADAS_MONTE_CARLO
+    }
+    return {
+        'n': len(vpl),
+        'prob_viavel': float((vpl > 0).mean()),
+        'vpl_medio': float(vpl.mean()),
+        'vpl_percentis': dict(zip(percentis, np.percentile(vpl, percentis).tolist())),
+        'tir_percentis': dict(zip(percentis, np.percentile(tir, percentis).tolist()))
+                         if len(tir) else {},
+        'sensibilidade': sensibilidade,
+    }
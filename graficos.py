@@ -0,0 +1,150 @@
+"""
+GRÁFICOS - PAYLOAD COMPACTO DAS FIGURAS PLOTLY
+==============================================
+Reduz o que o `st.plotly_chart` serializa a cada reexecução:
+- séries float64 viram float32 (o Plotly >= 6 manda arrays NumPy como typed
+  arrays em base64; float32 corta os bytes pela metade), exceto quando o
+  deslocamento domina a faixa (ex.: timestamps) e a precisão não basta. No
+  Plotly 5 os arrays vão como listas decimais e float32 só alongaria os
+  números, então lá a quantização fica desligada
+- linhas longas são reduzidas com LTTB (Largest-Triangle-Three-Buckets),
+  que mantém picos e vales com poucos pontos
+- scatter com muitos pontos vira `scattergl` (WebGL, render mais rápido no
+  navegador)
+- distribuições vão pré-binadas (`histograma` / `barras_histograma`), nunca
+  como amostras cruas
+
+`compactar` devolve uma figura nova; os traces que não se encaixam (ex.:
+`stackgroup`, que precisa dos mesmos x em todos os traces) só são
+quantizados.
+"""
+
+import numpy as np
+import plotly
+import plotly.graph_objects as go
+
+MAX_PONTOS = 2000       # acima disso uma linha é reduzida com LTTB
+LIMITE_WEBGL = 1000     # acima disso scatter vira scattergl
+
+# Arrays NumPy serializados como typed arrays (base64) só a partir do Plotly 6
+ARRAYS_TIPADOS = int(plotly.__version__.split('.')[0]) >= 6
+
+# Atributos por ponto que acompanham a redução de x/y
+ATRIBUTOS_PONTO = ('x', 'y', 'text', 'hovertext', 'customdata')
+ATRIBUTOS_MARCADOR = ('color', 'size', 'symbol')
+
+
+def lttb(x, y, n):
+    """Índices de `n` pontos escolhidos por LTTB (sempre o primeiro e o último)"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    tamanho = len(y)
+    if n >= tamanho or n < 3:
+        return np.arange(tamanho)
+
+    # n - 2 baldes entre o primeiro e o último ponto
+    limites = np.concatenate([
+        (np.arange(n - 1) * ((tamanho - 2) / (n - 2))).astype(np.int64) + 1, [tamanho]])
+    limites[-2] = tamanho - 1
+    medias_x = np.add.reduceat(x, limites[:-1]) / np.diff(limites)
+    medias_y = np.add.reduceat(y, limites[:-1]) / np.diff(limites)
+
+    indices = np.empty(n, dtype=np.int64)
+    indices[0], indices[-1] = 0, tamanho - 1
+    a = 0
+    for balde in range(n - 2):
+        inicio, fim = limites[balde], limites[balde + 1]
+        # Área do triângulo (ponto escolhido antes, candidato, média do próximo balde)
+        area = np.abs((x[a] - medias_x[balde + 1]) * (y[inicio:fim] - y[a])
+                      - (x[a] - x[inicio:fim]) * (medias_y[balde + 1] - y[a]))
+        a = inicio + int(area.argmax())
+        indices[balde + 1] = a
+    return indices
+
+
+def quantizar(valores):
+    """float64 -> float32 quando a precisão basta; outros tipos passam intactos"""
+    if not ARRAYS_TIPADOS or valores is None or isinstance(valores, str):
+        return valores
+    array = np.asarray(valores)
+    if array.dtype != np.float64 or array.size == 0:
+        return valores
+    finitos = array[np.isfinite(array)]
+    if finitos.size:
+        faixa = float(np.ptp(finitos))
+        # Deslocamento grande frente à faixa (ex.: timestamps): float32 achataria
+        if faixa > 0 and np.abs(finitos).max() / faixa > 1e4:
+            return valores
+    return array.astype(np.float32)
+
+
+def _numerica_crescente(x):
+    array = np.asarray(x)
+    return (array.dtype.kind in 'iuf' and array.ndim == 1
+            and bool(np.all(np.diff(array) >= 0)))
+
+
+def _compactar_trace(trace, max_pontos, limite_webgl):
+    props = trace.to_plotly_json()
+    tipo = props.pop('type', trace.type)
+
+    if tipo in ('scatter', 'scattergl') and props.get('y') is not None:
+        y = np.asarray(props['y'])
+        n = len(y)
+        x = props.get('x')
+        if x is None:
+            x = np.arange(n)
+            props['x'] = x
+        modo = props.get('mode') or ('lines' if n > 20 else 'lines+markers')
+        empilhado = props.get('stackgroup') is not None
+
+        if (n > max_pontos and 'lines' in modo and not empilhado and y.dtype.kind in 'iuf'
+                and np.isfinite(y).all() and _numerica_crescente(x)):
+            indices = lttb(x, y, max_pontos)
+            for nome in ATRIBUTOS_PONTO:
+                valor = props.get(nome)
+                if valor is not None and not isinstance(valor, str) and len(valor) == n:
+                    props[nome] = np.asarray(valor)[indices]
+            marcador = props.get('marker') or {}
+            for nome in ATRIBUTOS_MARCADOR:
+                valor = marcador.get(nome)
+                if valor is not None and not isinstance(valor, str) and np.ndim(valor) == 1 \
+                        and len(valor) == n:
+                    marcador[nome] = np.asarray(valor)[indices]
+            n = max_pontos
+
+        if tipo == 'scatter' and n > limite_webgl and not empilhado:
+            tipo = 'scattergl'
+
+    for nome in ('x', 'y', 'z', 'customdata'):
+        if nome in props:
+            props[nome] = quantizar(props[nome])
+
+    try:
+        return go.Figure({'data': [{'type': tipo, **props}]}).data[0]
+    except ValueError:
+        # Propriedade sem suporte no scattergl (ex.: line.shape='spline')
+        return go.Figure({'data': [{'type': trace.type, **props}]}).data[0]
+
+
+def compactar(fig, max_pontos=MAX_PONTOS, limite_webgl=LIMITE_WEBGL):
+    """Figura nova com séries quantizadas, linhas longas reduzidas e WebGL"""
+    return go.Figure(data=[_compactar_trace(trace, max_pontos, limite_webgl)
+                           for trace in fig.data],
+                     layout=fig.layout, frames=fig.frames)
+
+
+def histograma(valores, bins=60, intervalo=None):
+    """(contagens, bordas) dos valores finitos: o que o gráfico precisa, não as amostras"""
+    valores = np.asarray(valores, dtype=float)
+    return np.histogram(valores[np.isfinite(valores)], bins=bins, range=intervalo)
+
+
+def barras_histograma(contagens, bordas, normalizar=None, **kwargs):
+    """go.Bar de um histograma pré-binado (normalizar=n -> % das n amostras)"""
+    contagens = np.asarray(contagens, dtype=float)
+    if normalizar:
+        contagens = contagens / normalizar * 100
+    bordas = np.asarray(bordas, dtype=float)
+    return go.Bar(x=quantizar((bordas[:-1] + bordas[1:]) / 2), y=quantizar(contagens),
+                  width=quantizar(np.diff(bordas)), **kwargs)
@@ -0,0 +1,182 @@
+"""
+IMPLANTAÇÃO - CRONOGRAMA DE ELETRIFICAÇÃO
+=========================================
+Planeja a troca da frota em lotes de ônibus por operadora/garagem ao longo
+de vários anos, com orçamento anual e limite anual de nova potência
+conectada à rede (MVA), e calcula ano a ano CAPEX, emissões evitadas e a
+trajetória do VPL.
+
+Frentes de implantação: cada garagem com a sua frota (`frota` da garagem,
+a frota em operação); operadoras sem garagem formam uma frente com a sua
+`frota_por_operadora`, sem custo/potência de garagem. Cada ônibus custa:
+- o ônibus (investimento calibrado - custo de recarga) / frota total
+- a parcela da garagem (custo_total e potencia_mva da garagem / ônibus dela)
+- a parcela dos terminais, compartilhados, rateada pela frota inteira
+de modo que a frota inteira soma o investimento do cenário financeiro.
+
+Emissões evitadas e economia operacional seguem o km de cada ônibus (km de
+dia útil da operadora / ônibus dela nas frentes), como fração do total do sistema.
+
+O solver é guloso com heap: lotes ordenados por toneladas evitadas por R$;
+em cada ano entram os melhores lotes que cabem no orçamento e no limite de
+MVA (os que não cabem voltam ao heap para o ano seguinte). Lotes de uma
+mesma frente saem em sequência.
+"""
+
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from financeiro import TAXA_DESCONTO, VIDA_UTIL
+
+PREMISSAS_IMPLANTACAO = {
+    'tamanho_lote': 10,     # ônibus por lote
+    'ano_inicial': 2026,
+    'anos_plano': 10,       # anos em que se pode comprar
+}
+
+
+def tabela_frentes(dados, params, km_operadora=None):
+    """Frentes (garagens + operadoras sem garagem) com ônibus, custo e MVA por ônibus"""
+    garagens = pd.DataFrame(list(dados.get('garagens', [])),
+                            columns=['operadora', 'garagem', 'frota', 'custo_total', 'potencia_mva'])
+    terminais = list(dados.get('terminais', []))
+    frota_op = pd.Series(dict(dados['frota_por_operadora']), dtype=float)
+    sem_garagem = frota_op[~frota_op.index.isin(garagens['operadora'])]
+
+    frentes = pd.concat([
+        pd.DataFrame({
+            'operadora': garagens['operadora'], 'frente': garagens['garagem'],
+            'onibus': garagens['frota'].astype(np.int64),
+            'custo_garagem': garagens['custo_total'].astype(float),
+            'mva_garagem': garagens['potencia_mva'].astype(float),
+        }),
+        pd.DataFrame({
+            'operadora': sem_garagem.index, 'frente': sem_garagem.index + ' (sem garagem)',
+            'onibus': sem_garagem.to_numpy(dtype=np.int64),
+            'custo_garagem': 0.0, 'mva_garagem': 0.0,
+        }),
+    ], ignore_index=True)
+    frentes = frentes[frentes['onibus'] > 0].reset_index(drop=True)
+    total_onibus = float(frentes['onibus'].sum())
+
+    custo_terminais = float(sum(t.get('custo_total', 0) for t in terminais))
+    mva_terminais = float(sum(t.get('potencia_mva', 0) for t in terminais))
+    custo_onibus = (params['investimento'] - params['custo_recarga']) / total_onibus
+    frentes['custo_por_onibus'] = (custo_onibus + custo_terminais / total_onibus
+                                   + frentes['custo_garagem'] / frentes['onibus'])
+    frentes['mva_por_onibus'] = mva_terminais / total_onibus + frentes['mva_garagem'] / frentes['onibus']
+
+    if km_operadora is not None and len(km_operadora):
+        km = km_operadora.reindex(frentes['operadora']).fillna(0).to_numpy()
+        onibus_op = frentes.groupby('operadora')['onibus'].transform('sum').to_numpy()
+        km_por_onibus = km / onibus_op
+    else:
+        km_por_onibus = np.ones(len(frentes))
+    peso = frentes['onibus'].to_numpy() * km_por_onibus
+    # Fração do km do sistema rodada por um ônibus da frente
+    frentes['fracao_por_onibus'] = km_por_onibus / max(peso.sum(), 1e-12)
+    return frentes
+
+
+def planejar(frentes, orcamento_anual, limite_mva_anual=None, premissas=None):
+    """Lotes com o ano de implantação (NaN se não couber no plano).
+
+    `orcamento_anual` e `limite_mva_anual` são escalares ou um valor por ano
+    do plano; None/inf em MVA = sem limite.
+    """
+    p = {**PREMISSAS_IMPLANTACAO, **(premissas or {})}
+    anos = int(p['anos_plano'])
+    orcamento = np.broadcast_to(np.asarray(orcamento_anual, dtype=float), (anos,))
+    limite_mva = np.broadcast_to(
+        np.asarray(np.inf if limite_mva_anual is None else limite_mva_anual, dtype=float),
+        (anos,))
+
+    # Lotes de cada frente (o último pode ser menor)
+    tamanho = int(p['tamanho_lote'])
+    onibus = frentes['onibus'].to_numpy()
+    n_lotes = -(-onibus // tamanho)
+    frente = np.repeat(np.arange(len(frentes)), n_lotes)
+    sequencia = np.arange(len(frente)) - np.repeat(np.cumsum(n_lotes) - n_lotes, n_lotes)
+    tamanho_lote = np.minimum(tamanho, onibus[frente] - sequencia * tamanho)
+    custo = tamanho_lote * frentes['custo_por_onibus'].to_numpy()[frente]
+    mva = tamanho_lote * frentes['mva_por_onibus'].to_numpy()[frente]
+    beneficio = tamanho_lote * frentes['fracao_por_onibus'].to_numpy()[frente]
+    razao = beneficio / np.maximum(custo, 1e-12)
+
+    # Heap só com o próximo lote de cada frente: os lotes de uma frente saem em ordem
+    inicio = np.cumsum(n_lotes) - n_lotes
+    heap = [(-razao[i], int(i)) for i in inicio]
+    heapq.heapify(heap)
+    ano = np.full(len(frente), np.nan)
+
+    for a in range(anos):
+        caixa, rede = orcamento[a], limite_mva[a]
+        adiados = []
+        while heap:
+            item = heapq.heappop(heap)
+            i = item[1]
+            if custo[i] > caixa + 1e-6 or mva[i] > rede + 1e-9:
+                adiados.append(item)
+                continue
+            caixa -= custo[i]
+            rede -= mva[i]
+            ano[i] = a
+            if sequencia[i] + 1 < n_lotes[frente[i]]:
+                heapq.heappush(heap, (-razao[i + 1], i + 1))
+        for item in adiados:
+            heapq.heappush(heap, item)
+
+    return pd.DataFrame({
+        'frente': frente, 'operadora': frentes['operadora'].to_numpy()[frente],
+        'nome_frente': frentes['frente'].to_numpy()[frente], 'lote': sequencia,
+        'onibus': tamanho_lote, 'custo': custo, 'mva': mva, 'fracao': beneficio,
+        'indice_ano': ano,
+    })
+
+
+def trajetoria(plano, params, beneficio_anual, emissoes_ano, premissas=None):
+    """Por ano: ônibus, CAPEX, MVA, emissões evitadas, fluxo e VPL acumulado.
+
+    Cada lote segue o fluxo de `financeiro`: implantado no ano t, rende
+    (benefício e emissões, na sua fração do km do sistema) nos anos
+    t + 1 ... t + vida_util e devolve o valor residual no ano t + vida_util.
+    Com a frota inteira no ano 0 o VPL final é o do cenário financeiro.
+    """
+    p = {**PREMISSAS_IMPLANTACAO, **(premissas or {})}
+    taxa = params.get('taxa', TAXA_DESCONTO)
+    vida = int(params.get('vida_util', VIDA_UTIL))
+    horizonte = int(p['anos_plano']) + vida
+    feito = plano['indice_ano'].notna().to_numpy()
+    indice = plano['indice_ano'].to_numpy()[feito].astype(np.int64)
+
+    def por_ano(valores):
+        return np.bincount(indice, weights=np.asarray(valores, dtype=float)[feito],
+                           minlength=horizonte)[:horizonte]
+
+    def atrasado(valores, anos):
+        return np.concatenate([np.zeros(anos), valores[:horizonte - anos]])
+
+    onibus = por_ano(plano['onibus'])
+    capex = por_ano(plano['custo'])
+    mva = por_ano(plano['mva'])
+    nova = por_ano(plano['fracao'])
+    # Fração do sistema em operação elétrica: entrou há 1 ... vida_util anos
+    fracao_ativa = np.cumsum(atrasado(nova, 1) - atrasado(nova, vida + 1))
+
+    beneficio = beneficio_anual * fracao_ativa
+    residual = params.get('valor_residual', 0.0) * atrasado(nova, vida)
+    fluxo = beneficio + residual - capex
+    desconto = (1 + taxa) ** -np.arange(horizonte)
+
+    return pd.DataFrame({
+        'ano': p['ano_inicial'] + np.arange(horizonte),
+        'onibus_novos': onibus.astype(np.int64),
+        'onibus_acumulados': np.cumsum(onibus).astype(np.int64),
+        'capex': capex,
+        'mva_novo': mva,
+        'emissoes_evitadas_ton': emissoes_ano * fracao_ativa,
+        'fluxo': fluxo,
+        'vpl_acumulado': np.cumsum(fluxo * desconto),
+    })
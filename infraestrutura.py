@@ -0,0 +1,140 @@
+"""
+INFRAESTRUTURA - DIMENSIONAMENTO DA RECARGA
+===========================================
+Recalcula carregadores, potência (MVA) e custo de todas as garagens e
+terminais de uma vez (NumPy), a partir da frota / ônibus no pico e das
+premissas de potência do carregador e janela de recarga.
+
+Com as premissas padrão o motor reproduz os valores de
+dashboard_data_REAL.json:
+- garagem: carregadores = ceil(frota x energia diária / (potência x janela))
+  (384 kWh / (160 kW x 6 h) = 2,5 ônibus por carregador)
+- terminal: carregadores = ceil(ônibus no pico x fator de simultaneidade)
+- custo = carregadores x custo unitário + base do local + conexão à rede
+  (custo por MVA x ceil da potência em MVA; até 1 MVA, conexão simplificada)
+"""
+
+import numpy as np
+import pandas as pd
+
+PREMISSAS_PADRAO = {
+    'potencia_kw': 160.0,             # por carregador
+    'janela_h': 6.0,                  # recarga noturna na garagem
+    'km_dia': 240.0,                  # por ônibus
+    'consumo_kwh_km': 1.6,
+    'simultaneidade_terminal': 0.7,   # carregadores por ônibus no pico
+    'custo_carregador': 1_670_000.0,  # R$ por carregador de 160 kW
+    'custo_mva': 320_000.0,           # R$ por MVA (arredondado para cima)
+    'custo_conexao_simples': 220_000.0,  # R$ para locais até 1 MVA
+    'base_garagem': 1_237_500.0,      # R$ fixo por garagem
+    'base_terminal': 350_000.0,       # R$ fixo por terminal
+}
+
+# Opções de carregador para a otimização (custos de referência, editáveis)
+OPCOES_CARREGADOR = pd.DataFrame({
+    'potencia_kw': [80.0, 120.0, 160.0, 240.0],
+    'custo_carregador': [980_000.0, 1_350_000.0, 1_670_000.0, 2_300_000.0],
+})
+
+
+# Campos lidos de cada garagem / terminal do dashboard_data_REAL.json
+COLUNAS_GARAGEM = ('garagem', 'operadora', 'lat', 'lon', 'frota', 'carregadores', 'custo_total')
+COLUNAS_TERMINAL = ('terminal', 'lat', 'lon', 'onibus_pico', 'carregadores', 'custo_total')
+
+
+def tabela_locais(garagens, terminais):
+    """Garagens e terminais numa tabela única (tipo, nome, demanda, valores atuais).
+
+    Listas vazias (ex.: filtro só com operadoras sem garagem) dão tabelas vazias.
+    """
+    g = pd.DataFrame(list(garagens), columns=list(COLUNAS_GARAGEM))
+    t = pd.DataFrame(list(terminais), columns=list(COLUNAS_TERMINAL))
+    locais = pd.concat([
+        pd.DataFrame({
+            'tipo': 'garagem', 'nome': g['garagem'], 'operadora': g['operadora'],
+            'lat': g['lat'], 'lon': g['lon'], 'onibus': g['frota'],
+            'carregadores_atual': g['carregadores'], 'custo_atual': g['custo_total'],
+        }),
+        pd.DataFrame({
+            'tipo': 'terminal', 'nome': t['terminal'], 'operadora': None,
+            'lat': t['lat'], 'lon': t['lon'], 'onibus': t['onibus_pico'],
+            'carregadores_atual': t['carregadores'], 'custo_atual': t['custo_total'],
+        }),
+    ], ignore_index=True)
+    return locais
+
+
+def _teto(x):
+    # Tolerância para não arredondar 16.000000001 para 17
+    return np.ceil(np.asarray(x, dtype=float) - 1e-9)
+
+
+def dimensionar(locais, premissas=None, potencia_kw=None, custo_carregador=None):
+    """Carregadores, potência e custo de cada local (vetorizado).
+
+    `potencia_kw` / `custo_carregador` podem ser arrays com broadcast contra
+    os locais, ex.: shape (locais, opções) para avaliar várias opções de uma vez.
+    Retorna dict de arrays.
+    """
+    p = {**PREMISSAS_PADRAO, **(premissas or {})}
+    potencia = np.asarray(p['potencia_kw'] if potencia_kw is None else potencia_kw, dtype=float)
+    custo_unit = np.asarray(p['custo_carregador'] if custo_carregador is None else custo_carregador,
+                            dtype=float)
+
+    garagem = (locais['tipo'] == 'garagem').to_numpy()
+    onibus = locais['onibus'].to_numpy(dtype=float)
+    if potencia.ndim > 0 or custo_unit.ndim > 0:
+        garagem, onibus = garagem[:, None], onibus[:, None]
+
+    energia_dia = p['km_dia'] * p['consumo_kwh_km']
+    onibus_por_carregador = potencia * p['janela_h'] / energia_dia
+    carregadores = np.where(
+        garagem,
+        _teto(onibus / onibus_por_carregador),
+        _teto(onibus * p['simultaneidade_terminal']),
+    )
+    potencia_total_kw = carregadores * potencia
+    mva = potencia_total_kw / 1000
+    conexao = np.where(mva <= 1 + 1e-9, p['custo_conexao_simples'], p['custo_mva'] * _teto(mva))
+    custo = (carregadores * custo_unit
+             + np.where(garagem, p['base_garagem'], p['base_terminal'])
+             + conexao)
+
+    return {
+        'carregadores': carregadores,
+        'potencia_kw': potencia_total_kw,
+        'potencia_mva': mva,
+        'custo_total': custo,
+    }
+
+
+def otimizar(locais, premissas=None, opcoes=OPCOES_CARREGADOR, limite_mva=None):
+    """Opção de carregador de menor custo em cada local.
+
+    Avalia todas as combinações local x opção numa única chamada de
+    `dimensionar` e escolhe o mínimo por linha. Como os locais são
+    independentes, isso é o ótimo exato do problema inteiro. `limite_mva`
+    (escalar ou por local) descarta opções que estouram a conexão à rede;
+    locais sem opção viável ficam com `viavel = False` e a opção de menor MVA.
+    """
+    potencias = opcoes['potencia_kw'].to_numpy(dtype=float)
+    custos = opcoes['custo_carregador'].to_numpy(dtype=float)
+    grade = dimensionar(locais, premissas, potencias[None, :], custos[None, :])
+
+    custo = grade['custo_total']
+    if limite_mva is not None:
+        limite = np.broadcast_to(np.asarray(limite_mva, dtype=float), (len(locais),))[:, None]
+        viavel = grade['potencia_mva'] <= limite + 1e-9
+    else:
+        viavel = np.ones_like(custo, dtype=bool)
+
+    algum = viavel.any(axis=1)
+    escolha = np.where(algum,
+                       np.argmin(np.where(viavel, custo, np.inf), axis=1),
+                       np.argmin(grade['potencia_mva'], axis=1))
+    linhas = np.arange(len(locais))
+
+    resultado = {chave: valores[linhas, escolha] for chave, valores in grade.items()}
+    resultado['potencia_carregador_kw'] = potencias[escolha]
+    resultado['viavel'] = algum
+    return resultado
@@ -0,0 +1,282 @@
+"""
+MAPA - CAMADAS DE PARADAS
+=========================
+Monta a camada de paradas em uma única passada vetorizada sobre as colunas
+`lat`/`lon`/`stop_name`, sem um `CircleMarker` por linha do DataFrame:
+- Modo marcadores: um único GeoJSON FeatureCollection desenhado em canvas
+- Modo heatmap: matriz [lat, lon] montada direto dos arrays NumPy
+"""
+
+import numpy as np
+import pandas as pd
+import folium
+from folium.plugins import HeatMap
+
+# 5 casas decimais ~ 1 metro: precisão suficiente e payload bem menor
+CASAS_DECIMAIS = 5
+
+
+def _coordenadas(df_paradas):
+    lat = df_paradas['lat'].to_numpy(dtype=float).round(CASAS_DECIMAIS)
+    lon = df_paradas['lon'].to_numpy(dtype=float).round(CASAS_DECIMAIS)
+    return lat, lon
+
+
+def paradas_geojson(df_paradas):
+    """FeatureCollection com todas as paradas (uma passada sobre os arrays)"""
+    lat, lon = _coordenadas(df_paradas)
+    nomes = df_paradas['stop_name'].astype(str).tolist()
+
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [x, y]},
+            'properties': {'stop_name': nome},
+        }
+        for x, y, nome in zip(lon.tolist(), lat.tolist(), nomes)
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def camada_paradas(df_paradas, heatmap=False, cor='#ff7f0e', nome='Paradas'):
+    """Camada única (GeoJSON ou HeatMap) com todas as paradas"""
+    if heatmap:
+        lat, lon = _coordenadas(df_paradas)
+        return HeatMap(np.column_stack([lat, lon]).tolist(),
+                       name=nome, radius=15, blur=20)
+
+    return folium.GeoJson(
+        paradas_geojson(df_paradas),
+        name=nome,
+        marker=folium.CircleMarker(
+            radius=2,
+            color=cor,
+            fill=True,
+            fill_color=cor,
+            fill_opacity=0.6,
+            weight=1
+        ),
+        popup=folium.GeoJsonPopup(fields=['stop_name'], labels=False),
+    )
+
+
+def camadas_por_faixa(df_paradas, faixa, faixas):
+    """Uma camada de paradas por faixa, cada uma com sua cor.
+
+    `faixa` é o índice da faixa de cada parada e `faixas` a sequência de
+    (limite, rótulo, cor); faixas vazias ficam de fora.
+    """
+    faixa = np.asarray(faixa)
+    camadas = []
+    for i, (_, rotulo, cor) in enumerate(faixas):
+        mascara = faixa == i
+        if mascara.any():
+            camadas.append(camada_paradas(df_paradas[mascara], cor=cor,
+                                          nome=f'Paradas {rotulo}'))
+    return camadas
+
+
+# ============================================================================
+# ÍNDICE ESPACIAL / NÍVEL DE DETALHE
+# ============================================================================
+
+# Tamanho da célula de agrupamento ~ 40 px de um tile de 256 px em cada zoom
+PIXELS_CELULA = 40
+ZOOM_MINIMO = 5
+ZOOM_DETALHE = 14
+MAX_PONTOS = 3000
+
+
+def tamanho_celula(zoom):
+    """Lado da célula (graus) equivalente a PIXELS_CELULA no zoom dado"""
+    return 360.0 / 2 ** zoom * PIXELS_CELULA / 256
+
+
+def _chaves(lat, lon, tamanho):
+    colunas = int(np.ceil(360.0 / tamanho)) + 1
+    iy = np.floor((lat + 90.0) / tamanho).astype(np.int64)
+    ix = np.floor((lon + 180.0) / tamanho).astype(np.int64)
+    return iy, ix, colunas
+
+
+def limites_folium(bounds):
+    """Converte o `bounds` devolvido pelo st_folium em (sul, oeste, norte, leste)"""
+    try:
+        sw, ne = bounds['_southWest'], bounds['_northEast']
+        limites = (sw['lat'], sw['lng'], ne['lat'], ne['lng'])
+    except (KeyError, TypeError):
+        return None
+    if any(v is None for v in limites):
+        return None
+    return tuple(float(v) for v in limites)
+
+
+class IndiceEspacial:
+    """Grade de paradas construída uma vez sobre df_paradas.
+
+    - Zooms abaixo de ZOOM_DETALHE: centróides pré-agregados por célula (com contagem)
+    - Zooms a partir de ZOOM_DETALHE: só as paradas dentro dos limites visíveis,
+      buscadas por faixas de células ordenadas (searchsorted)
+    """
+
+    def __init__(self, df_paradas, zoom_minimo=ZOOM_MINIMO, zoom_detalhe=ZOOM_DETALHE):
+        self.zoom_minimo = zoom_minimo
+        self.zoom_detalhe = zoom_detalhe
+        self.lat = df_paradas['lat'].to_numpy(dtype=float)
+        self.lon = df_paradas['lon'].to_numpy(dtype=float)
+        self.nomes = df_paradas['stop_name'].astype(str).to_numpy()
+
+        # Centróides por nível de zoom
+        self.niveis = {}
+        for zoom in range(zoom_minimo, zoom_detalhe):
+            iy, ix, colunas = _chaves(self.lat, self.lon, tamanho_celula(zoom))
+            _, inverso = np.unique(iy * colunas + ix, return_inverse=True)
+            n = np.bincount(inverso)
+            self.niveis[zoom] = (
+                np.bincount(inverso, weights=self.lat) / n,
+                np.bincount(inverso, weights=self.lon) / n,
+                n,
+            )
+
+        # Grade fina: paradas ordenadas pela chave da célula
+        self._tamanho = tamanho_celula(zoom_detalhe)
+        iy, ix, self._colunas = _chaves(self.lat, self.lon, self._tamanho)
+        chaves = iy * self._colunas + ix
+        self._ordem = np.argsort(chaves, kind='stable')
+        self._chaves = chaves[self._ordem]
+
+    def __len__(self):
+        return len(self.lat)
+
+    def agregados(self, zoom, limites=None):
+        """Centróides (lat, lon, n) do nível de zoom, opcionalmente recortados"""
+        zoom = int(min(max(zoom, self.zoom_minimo), self.zoom_detalhe - 1))
+        lat, lon, n = self.niveis[zoom]
+        if limites is not None:
+            mascara = _dentro(lat, lon, limites)
+            lat, lon, n = lat[mascara], lon[mascara], n[mascara]
+        return pd.DataFrame({'lat': lat, 'lon': lon, 'n': n})
+
+    def indices_visiveis(self, limites):
+        """Posições (em df_paradas) das paradas dentro de (sul, oeste, norte, leste)"""
+        sul, oeste, norte, leste = limites
+        iy0, ix0, _ = _chaves(np.array([sul]), np.array([oeste]), self._tamanho)
+        iy1, ix1, _ = _chaves(np.array([norte]), np.array([leste]), self._tamanho)
+        linhas = np.arange(iy0[0], iy1[0] + 1) * self._colunas
+        inicio = np.searchsorted(self._chaves, linhas + ix0[0], side='left')
+        fim = np.searchsorted(self._chaves, linhas + ix1[0], side='right')
+        if not len(inicio) or (fim - inicio).sum() == 0:
+            return np.empty(0, dtype=np.int64)
+        posicoes = np.concatenate([np.arange(a, b) for a, b in zip(inicio, fim) if b > a])
+        candidatos = self._ordem[posicoes]
+        return candidatos[_dentro(self.lat[candidatos], self.lon[candidatos], limites)]
+
+    def consultar(self, zoom, limites=None, max_pontos=MAX_PONTOS):
+        """Pontos a desenhar no zoom/limites atuais.
+
+        Retorna (DataFrame, agregado). O DataFrame tem lat/lon/n e, quando não
+        agregado, stop_name. Nunca devolve mais que `max_pontos` paradas soltas.
+        """
+        if zoom >= self.zoom_detalhe and limites is not None:
+            idx = self.indices_visiveis(limites)
+            if len(idx) <= max_pontos:
+                return pd.DataFrame({
+                    'lat': self.lat[idx], 'lon': self.lon[idx],
+                    'n': np.ones(len(idx), dtype=np.int64), 'stop_name': self.nomes[idx],
+                }), False
+        return self.agregados(zoom, limites), True
+
+
+# ============================================================================
+# DENSIDADE (HEATMAP PRÉ-BINADO NO SERVIDOR)
+# ============================================================================
+
+# Célula da densidade ~ 8 px: abaixo do raio do HeatMap, não aparece a grade
+PIXELS_DENSIDADE = 8
+
+
+class GradeDensidade:
+    """Densidade de pontos (opcionalmente ponderada) pré-binada por nível de zoom.
+
+    Cada zoom guarda só as células não vazias (centro + soma dos pesos), então
+    o HeatMap recebe no máximo uma célula por ~8 px de tela, qualquer que seja
+    o número de pontos. A contagem é esparsa (chave da célula + bincount), sem
+    alocar a grade densa inteira.
+    """
+
+    def __init__(self, lat, lon, pesos=None, zoom_minimo=ZOOM_MINIMO, zoom_maximo=ZOOM_DETALHE):
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        pesos = np.ones(len(lat)) if pesos is None else np.asarray(pesos, dtype=float)
+        self.zoom_minimo = zoom_minimo
+        self.zoom_maximo = zoom_maximo
+        self.total = float(pesos.sum())
+
+        self.niveis = {}
+        for zoom in range(zoom_minimo, zoom_maximo + 1):
+            tamanho = tamanho_celula(zoom) * PIXELS_DENSIDADE / PIXELS_CELULA
+            iy, ix, colunas = _chaves(lat, lon, tamanho)
+            chaves, inverso = np.unique(iy * colunas + ix, return_inverse=True)
+            soma = np.bincount(inverso, weights=pesos)
+            cheias = soma > 0
+            chaves, soma = chaves[cheias], soma[cheias]
+            self.niveis[zoom] = (
+                (chaves // colunas + 0.5) * tamanho - 90.0,
+                (chaves % colunas + 0.5) * tamanho - 180.0,
+                soma,
+            )
+
+    def celulas(self, zoom, limites=None):
+        """Células não vazias (lat, lon, peso) do nível de zoom, opcionalmente recortadas"""
+        zoom = int(min(max(zoom, self.zoom_minimo), self.zoom_maximo))
+        lat, lon, peso = self.niveis[zoom]
+        if limites is not None:
+            mascara = _dentro(lat, lon, limites)
+            lat, lon, peso = lat[mascara], lon[mascara], peso[mascara]
+        return pd.DataFrame({'lat': lat, 'lon': lon, 'peso': peso})
+
+
+def camada_densidade(celulas, nome='Paradas', raio=15, desfoque=20):
+    """HeatMap das células de GradeDensidade (peso normalizado pelo maior)"""
+    lat, lon = _coordenadas(celulas)
+    peso = celulas['peso'].to_numpy(dtype=float)
+    return HeatMap(np.column_stack([lat, lon, peso / peso.max(initial=1e-12)]).tolist(),
+                   name=nome, radius=raio, blur=desfoque)
+
+
+def _dentro(lat, lon, limites):
+    sul, oeste, norte, leste = limites
+    return (lat >= sul) & (lat <= norte) & (lon >= oeste) & (lon <= leste)
+
+
+def _raio_grupo(n):
+    return float(min(3 + 2 * np.log2(n), 18))
+
+
+def camada_lod(pontos, agregado, heatmap=False, cor='#ff7f0e', nome='Paradas'):
+    """Camada para o resultado de IndiceEspacial.consultar"""
+    if not agregado:
+        return camada_paradas(pontos, heatmap=heatmap, cor=cor, nome=nome)
+
+    lat, lon = _coordenadas(pontos)
+    n = pontos['n'].to_numpy()
+    if heatmap:
+        return HeatMap(np.column_stack([lat, lon, n / n.max(initial=1)]).tolist(),
+                       name=nome, radius=15, blur=20)
+
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [x, y]},
+            'properties': {'n': q, 'raio': _raio_grupo(q)},
+        }
+        for x, y, q in zip(lon.tolist(), lat.tolist(), n.tolist())
+    ]
+    return folium.GeoJson(
+        {'type': 'FeatureCollection', 'features': features},
+        name=nome,
+        marker=folium.CircleMarker(radius=4, color=cor, fill=True,
+                                   fill_color=cor, fill_opacity=0.6, weight=1),
+        style_function=lambda f: {'radius': f['properties']['raio']},
+        tooltip=folium.GeoJsonTooltip(fields=['n'], aliases=['Paradas']),
+    )
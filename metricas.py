@@ -0,0 +1,146 @@
+"""
+MÉTRICAS - KPIs POR OPERADORA
+=============================
+Matriz operadoras x KPIs pré-calculada (NumPy). As métricas de qualquer
+subconjunto de operadoras saem de uma soma mascarada, em vez de escalar
+todos os KPIs por `ops_sel / total_ops`.
+
+Cada KPI é repartido entre as operadoras pelo melhor indicador disponível
+e a soma de todas as operadoras reproduz exatamente o total de kpis_base:
+- frota, capacidade: frota_por_operadora
+- km, CO₂: km semanal (aba Operadoras: 5 x seg + sáb + dom)
+- passageiros, VPL: viagens semanais (aba Operadoras)
+- linhas, paradas: número de linhas (aba Operadoras)
+Sem a aba Operadoras, todos os KPIs seguem a frota.
+"""
+
+import numpy as np
+
+from financeiro import avaliar_cenarios, calibrar_parametros
+
+COLUNAS_KPI = ('frota', 'linhas', 'paradas', 'km_anual', 'passageiros_ano',
+               'co2', 'capacidade_ano')
+
+# KPI -> chave em kpis_base
+TOTAIS_KPI = {
+    'frota': 'total_onibus',
+    'linhas': 'total_linhas',
+    'paradas': 'total_paradas',
+    'km_anual': 'km_anual',
+    'passageiros_ano': 'passageiros_ano',
+    'co2': 'emissoes_evitadas_ton',
+    'capacidade_ano': 'capacidade_total_ano',
+}
+
+KPIS_INTEIROS = ('frota', 'linhas', 'paradas')
+
+
+def _semanal(df, coluna):
+    return 5 * df[f'seg_{coluna}'] + df[f'sab_{coluna}'] + df[f'dom_{coluna}']
+
+
+def _partes(indicador):
+    total = indicador.sum()
+    if total <= 0:
+        return np.full(len(indicador), 1.0 / len(indicador))
+    return indicador / total
+
+
+class MatrizKPIs:
+    """KPIs absolutos por operadora: linhas = operadoras, colunas = COLUNAS_KPI"""
+
+    def __init__(self, operadoras, matriz):
+        self.operadoras = list(operadoras)
+        self.matriz = matriz
+        self._indice = {op: i for i, op in enumerate(self.operadoras)}
+
+    def mascara(self, operadoras):
+        """Máscara booleana do subconjunto; vazio = todas as operadoras"""
+        if not operadoras:
+            return np.ones(len(self.operadoras), dtype=bool)
+        mascara = np.zeros(len(self.operadoras), dtype=bool)
+        mascara[[self._indice[op] for op in operadoras if op in self._indice]] = True
+        return mascara
+
+    def somar(self, operadoras):
+        """Totais de cada KPI para o subconjunto de operadoras"""
+        totais = self.mascara(operadoras) @ self.matriz
+        return dict(zip(COLUNAS_KPI, totais.tolist()))
+
+    def somar_varios(self, subconjuntos):
+        """Totais para vários subconjuntos de uma vez (uma linha por subconjunto)"""
+        mascaras = np.array([self.mascara(ops) for ops in subconjuntos], dtype=float)
+        return mascaras @ self.matriz
+
+
+def construir_matriz_kpis(dados, kpis_base, df_operadoras=None):
+    """Matriz operadoras x KPIs a partir de dashboard_data e da aba Operadoras"""
+    operadoras = list(dados['operadoras'])
+    frota = np.array([dados['frota_por_operadora'].get(op, 0) for op in operadoras],
+                     dtype=float)
+
+    if df_operadoras is not None:
+        por_op = df_operadoras.set_index('operadora').reindex(operadoras).fillna(0)
+        km = _semanal(por_op, 'km').to_numpy(dtype=float)
+        viagens = _semanal(por_op, 'viagens').to_numpy(dtype=float)
+        linhas = por_op['num_linhas'].to_numpy(dtype=float)
+    else:
+        km = viagens = linhas = frota
+
+    indicadores = {
+        'frota': frota,
+        'linhas': linhas,
+        'paradas': linhas,
+        'km_anual': km,
+        'passageiros_ano': viagens,
+        'co2': km,
+        'capacidade_ano': frota,
+    }
+    matriz = np.column_stack([
+        kpis_base[TOTAIS_KPI[kpi]] * _partes(indicadores[kpi]) for kpi in COLUNAS_KPI
+    ])
+    return MatrizKPIs(operadoras, matriz)
+
+
+def calcular_metricas_filtradas(filtros, kpis_base, dados, matriz_kpis=None,
+                                params_financeiros=None, cenario=None):
+    """KPIs, ocupação e indicadores financeiros do subconjunto de operadoras.
+
+    `cenario` (opcional) é o resultado escalar de `avaliar_cenarios` para o
+    aumento do filtro, quando já foi avaliado numa grade.
+    """
+    if matriz_kpis is None:
+        matriz_kpis = construir_matriz_kpis(dados, kpis_base)
+    if params_financeiros is None:
+        params_financeiros = calibrar_parametros(dados, kpis_base)
+
+    totais = matriz_kpis.somar(filtros['operadoras'])
+
+    metricas = {
+        kpi: int(round(valor)) if kpi in KPIS_INTEIROS else valor
+        for kpi, valor in totais.items()
+    }
+    metricas['taxa_ocupacao'] = kpis_base['taxa_ocupacao_atual']
+
+    # Parte do subconjunto na demanda: escala o VPL do cenário
+    fator_vpl = metricas['passageiros_ano'] / kpis_base['passageiros_ano']
+
+    novos_usuarios = filtros.get('novos_usuarios', 0)
+    novos_passes_ano = novos_usuarios * 3 * 365
+
+    metricas['passageiros_projetados'] = metricas['passageiros_ano'] + novos_passes_ano
+    metricas['taxa_projetada'] = (metricas['passageiros_projetados'] / metricas['capacidade_ano']) * 100
+
+    if 'aumento_tarifa' in filtros:
+        if cenario is None:
+            cenario = avaliar_cenarios(params_financeiros, filtros['aumento_tarifa'])
+        tir = float(cenario['tir'])
+        metricas['vpl'] = float(cenario['vpl']) * fator_vpl
+        metricas['payback'] = float(cenario['payback_simples'])
+        metricas['tir'] = tir if np.isfinite(tir) else 0
+    else:
+        metricas['vpl'] = 0
+        metricas['payback'] = 999
+        metricas['tir'] = 0
+
+    return metricas
@@ -0,0 +1,117 @@
+"""
+PERFIL - INSTRUMENTAÇÃO DE UMA EXECUÇÃO
+=======================================
+Spans de tempo aninhados (perf_counter), contadores de acerto/falha de cache
+e tamanhos de payload de uma execução do app, com exportação em JSON lines.
+
+O custo com o painel desligado é um perf_counter por span; medidas caras
+(serializar gráfico/mapa para medir o payload) só rodam com `detalhado`.
+
+Uso:
+    perfil = Perfil(detalhado=True)
+    with perfil.medir('carregar_dados'):
+        ...
+    perfil.exportar_jsonl('perfil.jsonl')
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+
+class Perfil:
+    """Registro de uma execução: spans, contadores de cache e payloads"""
+
+    def __init__(self, detalhado=False, rotulo=None):
+        self.detalhado = detalhado
+        self.rotulo = rotulo
+        self.inicio = time.perf_counter()
+        self.criado_em = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.spans = []
+        self.caches = {}
+        self.payloads = {}
+        self._pilha = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def medir(self, nome):
+        """Span de tempo; spans abertos dentro dele ficam aninhados"""
+        self._pilha.append(nome)
+        caminho = '/'.join(self._pilha)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - t0
+            self._pilha.pop()
+            with self._lock:
+                self.spans.append({
+                    'span': caminho,
+                    'nivel': caminho.count('/'),
+                    'inicio_ms': (t0 - self.inicio) * 1000,
+                    'duracao_ms': duracao * 1000,
+                })
+
+    @contextmanager
+    def medir_cache(self, nome):
+        """Span de uma chamada a função cacheada; o corpo dela chama `falha(nome)`"""
+        with self._lock:
+            contador = self.caches.setdefault(nome, {'chamadas': 0, 'falhas': 0})
+            contador['chamadas'] += 1
+        with self.medir(nome):
+            yield
+
+    def falha(self, nome):
+        """Marca que a função cacheada `nome` executou de fato (cache miss)"""
+        with self._lock:
+            contador = self.caches.setdefault(nome, {'chamadas': 0, 'falhas': 0})
+            contador['falhas'] += 1
+
+    def registrar_payload(self, nome, tamanho_bytes):
+        with self._lock:
+            self.payloads[nome] = int(tamanho_bytes)
+
+    def total_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def tabela_spans(self):
+        """Spans em ordem de início, com % do tempo total da execução"""
+        df = pd.DataFrame(self.spans, columns=['span', 'nivel', 'inicio_ms', 'duracao_ms'])
+        df = df.sort_values('inicio_ms', kind='stable').reset_index(drop=True)
+        df['pct'] = df['duracao_ms'] / max(self.total_ms(), 1e-9) * 100
+        return df
+
+    def tabela_caches(self):
+        df = pd.DataFrame([{'cache': nome, **c} for nome, c in self.caches.items()],
+                          columns=['cache', 'chamadas', 'falhas'])
+        df['acertos'] = df['chamadas'] - df['falhas']
+        return df
+
+    def tabela_payloads(self):
+        return pd.DataFrame(
+            [{'item': nome, 'kb': tamanho / 1024} for nome, tamanho in self.payloads.items()],
+            columns=['item', 'kb'])
+
+    def registro(self):
+        """Dicionário serializável da execução (uma linha do JSON lines)"""
+        return {
+            'criado_em': self.criado_em,
+            'rotulo': self.rotulo,
+            'total_ms': round(self.total_ms(), 3),
+            'spans': [{**s, 'inicio_ms': round(s['inicio_ms'], 3),
+                       'duracao_ms': round(s['duracao_ms'], 3)} for s in self.spans],
+            'caches': self.caches,
+            'payloads': self.payloads,
+        }
+
+    def jsonl(self):
+        return json.dumps(self.registro(), ensure_ascii=False) + '\n'
+
+    def exportar_jsonl(self, caminho):
+        """Acrescenta o registro desta execução ao arquivo JSON lines"""
+        with open(caminho, 'a', encoding='utf-8') as f:
+            f.write(self.jsonl())
@@ -0,0 +1,262 @@
+"""
+PIPELINE - ATUALIZAÇÃO INCREMENTAL DOS DADOS
+============================================
+Regenera localmente os artefatos de `dashboard_data/` a partir das fontes,
+refazendo só os estágios cujas entradas mudaram de conteúdo:
+- paradas: `dados_paradas.parquet` a partir do stops.txt do GTFS
+  (`dashboard_data/brutos/stops.txt`)
+- kpis_base: `kpis_base.json` a partir de `dashboard_data_REAL.json` e da
+  contagem de paradas
+- config: `config_dashboard.json` (cores das operadoras, centro e zoom do mapa)
+- pacote: o pacote versionado (`dados.py`), que por sua vez só refaz as
+  tabelas cujas fontes mudaram (planilhas, contagens de horários por linha e
+  por parada x hora, base dos rankings)
+
+Cada estágio guarda em `dashboard_data/.pipeline.json` a assinatura (mtime,
+tamanho) e o hash do conteúdo das entradas; a assinatura evita reler
+arquivos intactos e o hash evita refazer um estágio só porque o arquivo foi
+tocado. Estágios independentes (mesmo nível das dependências, que saem de
+quais saídas são entradas de quem) rodam num pool de processos.
+
+`dashboard_data_REAL.json` continua vindo do NB6 (as fontes dele, como
+passageiros e tarifas, não estão neste repositório) e é tratado como fonte.
+
+Uso:
+    python pipeline.py                      # refaz só o que mudou
+    python pipeline.py --forcar             # refaz tudo
+    python pipeline.py --estagios kpis_base config --processos 1
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from dados import (ARQUIVO_PARADAS, DATA_DIR, DOCUMENTOS, MANIFESTO, PACOTE_DIR,
+                   assinatura_arquivos, construir_pacote, fontes_pacote, hash_arquivos)
+from processos import contexto_processos
+
+DIRETORIO_BRUTOS = DATA_DIR / 'brutos'
+PARADAS_GTFS = DIRETORIO_BRUTOS / 'stops.txt'
+ARQUIVO_ESTADO = DATA_DIR / '.pipeline.json'
+
+# Mapa do config_dashboard.json: centro de Brasília e zoom inicial
+CENTRO_MAPA = {'lat': -15.793889, 'lon': -47.882778}
+ZOOM_INICIAL = 11
+
+
+def _ler_json(caminho):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _gravar_json(obj, caminho):
+    # Mesmo formato dos JSONs exportados pelo NB6 (indentado, CRLF)
+    caminho = Path(caminho)
+    temporario = caminho.with_suffix('.tmp')
+    with open(temporario, 'w', encoding='utf-8', newline='\r\n') as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+
+# ============================================================================
+# ESTÁGIOS
+# ============================================================================
+
+def gerar_paradas():
+    """stops.txt (GTFS) -> dados_paradas.parquet (stopId, stop_name, lat, lon)"""
+    stops = pd.read_csv(PARADAS_GTFS, usecols=['stop_id', 'stop_name', 'stop_lat', 'stop_lon'],
+                        dtype={'stop_name': str}, float_precision='round_trip')
+    paradas = pd.DataFrame({
+        'stopId': stops['stop_id'].astype('int64'),
+        'stop_name': stops['stop_name'],
+        'lat': stops['stop_lat'].astype(float),
+        'lon': stops['stop_lon'].astype(float),
+    }).dropna(subset=['lat', 'lon'])
+    temporario = ARQUIVO_PARADAS.with_suffix('.tmp')
+    paradas.to_parquet(temporario, index=False)
+    os.replace(temporario, ARQUIVO_PARADAS)
+    return f"{len(paradas):,} paradas"
+
+
+def gerar_kpis_base():
+    """KPIs do NB6 com o total de paradas da tabela atual"""
+    kpis = dict(_ler_json(DOCUMENTOS['dados'])['kpis_base'])
+    kpis['total_paradas'] = pq.read_metadata(ARQUIVO_PARADAS).num_rows
+    _gravar_json(kpis, DOCUMENTOS['kpis'])
+    return f"{len(kpis)} indicadores"
+
+
+def gerar_config():
+    """Cores das operadoras do NB6 + centro/zoom do mapa"""
+    cores = _ler_json(DOCUMENTOS['dados'])['cores_operadoras']
+    _gravar_json({'cores_operadoras': cores, 'centro_mapa': CENTRO_MAPA,
+                  'zoom_inicial': ZOOM_INICIAL}, DOCUMENTOS['config'])
+    return f"{len(cores)} operadoras"
+
+
+def gerar_pacote(processos=1, forcar=False):
+    """Pacote versionado; só as tabelas com fontes alteradas são refeitas"""
+    refeitas = []
+
+    def registrar(nome, resultado):
+        # Tabelas que falharam também chegam aqui, com a mensagem de erro
+        if isinstance(resultado, dict):
+            refeitas.append(nome)
+
+    manifesto = construir_pacote(forcar=forcar, processos=processos, progresso=registrar)
+    resumo = (f"{len(manifesto['tabelas'])} tabelas ({len(refeitas)} refeitas), "
+              f"versão {manifesto['versao']}")
+    if manifesto['erros']:
+        resumo += f" ({len(manifesto['erros'])} fora: {', '.join(manifesto['erros'])})"
+    return resumo
+
+
+# nome -> (entradas, saídas, função, entradas ausentes permitidas)
+ESTAGIOS = {
+    'paradas': ((PARADAS_GTFS,), (ARQUIVO_PARADAS,), gerar_paradas, False),
+    'kpis_base': ((DOCUMENTOS['dados'], ARQUIVO_PARADAS), (DOCUMENTOS['kpis'],),
+                  gerar_kpis_base, False),
+    'config': ((DOCUMENTOS['dados'],), (DOCUMENTOS['config'],), gerar_config, False),
+    # O pacote aceita fontes ausentes (viram `erros` no manifesto)
+    'pacote': (tuple(fontes_pacote()), (PACOTE_DIR / MANIFESTO,), gerar_pacote, True),
+}
+
+
+def niveis(estagios):
+    """Estágios em níveis: cada um depende só de estágios de níveis anteriores"""
+    produtor = {str(saida): nome for nome, (_, saidas, _, _) in estagios.items()
+                for saida in saidas}
+    dependencias = {nome: {produtor[str(e)] for e in entradas if str(e) in produtor} - {nome}
+                    for nome, (entradas, _, _, _) in estagios.items()}
+    feitos, resultado = set(), []
+    while len(feitos) < len(estagios):
+        nivel = [nome for nome in estagios
+                 if nome not in feitos and dependencias[nome] <= feitos]
+        if not nivel:
+            raise ValueError(f"Dependência circular entre {sorted(set(estagios) - feitos)}")
+        resultado.append(nivel)
+        feitos.update(nivel)
+    return resultado
+
+
+# ============================================================================
+# EXECUÇÃO INCREMENTAL
+# ============================================================================
+
+def _ler_estado():
+    try:
+        return _ler_json(ARQUIVO_ESTADO)
+    except (OSError, ValueError):
+        return {}
+
+
+def situacao(nome, estado, forcar=False):
+    """('atual' | 'refazer' | 'ausente', assinatura, hash) de um estágio"""
+    entradas, saidas, _, aceita_ausentes = ESTAGIOS[nome]
+    if not aceita_ausentes and not all(Path(e).exists() for e in entradas):
+        return 'ausente', None, None
+
+    assinatura = [list(item) for item in assinatura_arquivos(*entradas)]
+    anterior = estado.get(nome, {})
+    saidas_ok = all(Path(s).exists() for s in saidas)
+    if not forcar and saidas_ok and anterior.get('assinatura') == assinatura:
+        return 'atual', assinatura, anterior.get('hash')
+
+    conteudo = hash_arquivos(*entradas)
+    if not forcar and saidas_ok and anterior.get('hash') == conteudo:
+        return 'atual', assinatura, conteudo
+    return 'refazer', assinatura, conteudo
+
+
+def _executar(nome, processos, forcar):
+    _, _, funcao, _ = ESTAGIOS[nome]
+    inicio = time.perf_counter()
+    # Só o pacote tem paralelismo e cache próprios
+    resumo = funcao(processos, forcar) if nome == 'pacote' else funcao()
+    return resumo, time.perf_counter() - inicio
+
+
+def atualizar(estagios=None, forcar=False, processos=None, saida=print):
+    """Refaz os estágios desatualizados (todos ou os `estagios` pedidos).
+
+    Retorna {estágio: (situação, detalhe)}; um estágio que falha não impede os
+    dos níveis seguintes (eles usam as saídas que já existem).
+    """
+    processos = processos or os.cpu_count() or 1
+    estado = _ler_estado()
+    resultado = {}
+
+    for nivel in niveis(ESTAGIOS):
+        pendentes = []
+        for nome in nivel:
+            if estagios and nome not in estagios:
+                continue
+            status, assinatura, conteudo = situacao(nome, estado, forcar)
+            if status == 'refazer':
+                pendentes.append(nome)
+                continue
+            if status == 'atual':
+                # Mesmo conteúdo com data nova (ex.: touch): guarda a assinatura
+                # atual para não refazer o hash na próxima execução
+                estado[nome] = {'assinatura': assinatura, 'hash': conteudo}
+            resultado[nome] = (status, 'entrada ausente, saída mantida'
+                               if status == 'ausente' else '')
+
+        def concluir(nome, executar):
+            try:
+                resumo, segundos = executar()
+            except Exception as e:
+                resultado[nome] = ('erro', str(e))
+            else:
+                # Assinatura/hash de novo: o estágio pode ter reescrito uma entrada sua
+                estado[nome] = {'assinatura': [list(item) for item in
+                                               assinatura_arquivos(*ESTAGIOS[nome][0])],
+                                'hash': hash_arquivos(*ESTAGIOS[nome][0])}
+                resultado[nome] = ('refeito', f"{resumo} em {segundos:.1f} s")
+            saida(f"{nome:<12}{resultado[nome][0]:<10}{resultado[nome][1]}")
+
+        # O pacote (sozinho no último nível) paraleliza as próprias tabelas
+        if len(pendentes) > 1 and processos > 1:
+            with ProcessPoolExecutor(min(processos, len(pendentes)),
+                                     mp_context=contexto_processos()) as pool:
+                futuros = {pool.submit(_executar, nome, 1, forcar): nome for nome in pendentes}
+                for futuro in as_completed(futuros):
+                    concluir(futuros[futuro], futuro.result)
+        else:
+            for nome in pendentes:
+                concluir(nome, lambda nome=nome: _executar(nome, processos, forcar))
+
+        for nome in nivel:
+            if nome in resultado and resultado[nome][0] in ('atual', 'ausente'):
+                saida(f"{nome:<12}{resultado[nome][0]:<10}{resultado[nome][1]}")
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    _gravar_json(estado, ARQUIVO_ESTADO)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--estagios', nargs='+', choices=list(ESTAGIOS))
+    parser.add_argument('--forcar', action='store_true', help="refaz mesmo sem mudanças")
+    parser.add_argument('--processos', type=int, help="processos do pool (padrão: CPUs)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    resultado = atualizar(args.estagios, args.forcar, args.processos)
+    erros = [nome for nome, (status, _) in resultado.items() if status == 'erro']
+    print(f"\n{'⚠️' if erros else '✅'} {len(resultado)} estágio(s) em "
+          f"{time.perf_counter() - inicio:.1f} s")
+    if erros:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""
+PROCESSOS - POOL SEGURO DENTRO DO STREAMLIT
+===========================================
+Contexto de multiprocessing comum a todo ProcessPoolExecutor do projeto
+(Monte Carlo, pacote de dados, curvas de carga, pipeline e relatórios).
+"""
+
+import multiprocessing
+
+
+def contexto_processos():
+    """'forkserver' quando existe, senão 'spawn': não herdam as threads do
+    servidor Streamlit (com fork o filho pode travar num lock copiado)"""
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in metodos else 'spawn')
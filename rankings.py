@@ -0,0 +1,165 @@
+"""
+RANKINGS - ANÁLISE OPERACIONAL
+==============================
+Tabelas de ranking completas (já ordenadas) materializadas uma vez por versão
+dos dados. A página só recorta o TOP N, opcionalmente por operadora. Do
+pacote de dados são lidas só as colunas que cada ranking usa.
+"""
+
+import errno
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+ARQUIVO_HORARIOS = 'horarios_expandidos.csv'
+
+# Bytes de CSV por lote na contagem em streaming
+TAMANHO_BLOCO = 1 << 20
+
+# Exclusões fixas dos rankings
+EXCLUSAO_LONGAS = ('206.1', 'MARECHAL')
+EXCLUSAO_DEMANDA = ('0.808', 'URBI')
+
+# Colunas lidas do pacote por ranking
+COLUNAS_LONGAS = ('linha_nome', 'operadora', 'km_ida_circular', 'km_volta')
+COLUNAS_DEMANDA = ('linha_nome', 'operadora', 'cor_companhia_x')
+COLUNAS_FROTA = ('operadora', 'frota_total')
+
+
+def _sem(df, exclusao):
+    linha, operadora = exclusao
+    return df[~((df['linha_nome'].astype(str) == linha) & (df['operadora'] == operadora))]
+
+
+def ranking_linhas_longas(consolidado):
+    """Linhas por distância total (ida + volta), sem a 206.1 da MARECHAL"""
+    df = _sem(consolidado, EXCLUSAO_LONGAS)
+    df = df.assign(
+        linha_nome=df['linha_nome'].astype(str),
+        km_total=df['km_ida_circular'] + df['km_volta'],
+    )
+    return (df.sort_values('km_total', ascending=False, kind='stable')
+              [['linha_nome', 'operadora', 'km_total']]
+              .reset_index(drop=True))
+
+
+def _normalizar_linhas(linhas):
+    """Texto de linha_nome igual ao de pd.read_csv(...).astype(str).
+
+    O CSV é lido como texto; aqui se reproduz a inferência do pandas (tudo
+    inteiro -> int, tudo numérico -> float, senão texto) para casar com o
+    linha_nome do consolidado.
+    """
+    texto = pd.Series(linhas, dtype=object)
+    numeros = pd.to_numeric(texto, errors='coerce')
+    if numeros.notna().all():
+        inteiros = texto.str.fullmatch(r'\s*[+-]?\d+\s*')
+        if inteiros.all():
+            return numeros.astype('int64').astype(str).to_numpy()
+        return numeros.astype(float).astype(str).to_numpy()
+    return texto.astype(str).to_numpy()
+
+
+def contar_horarios_por_linha(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """Horários por linha_nome lendo só essa coluna do CSV, em lotes.
+
+    A memória de pico fica limitada a alguns lotes de `tamanho_bloco` (leitura
+    antecipada do Arrow) + uma contagem por linha distinta, qualquer que seja
+    o tamanho do arquivo de horários.
+    """
+    if not Path(arquivo).exists():
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(arquivo))
+
+    formato = ds.CsvFileFormat(
+        read_options=pacsv.ReadOptions(block_size=tamanho_bloco, use_threads=False),
+        convert_options=pacsv.ConvertOptions(column_types={'linha_nome': pa.string()}),
+    )
+    scanner = ds.dataset(arquivo, format=formato).scanner(
+        columns=['linha_nome'], batch_readahead=1, fragment_readahead=1, use_threads=False)
+
+    contagens = {}
+    for lote in scanner.to_batches():
+        if lote.num_rows == 0:
+            continue
+        vc = pc.value_counts(pc.drop_null(lote.column('linha_nome')))
+        for linha, n in zip(vc.field('values').to_pylist(), vc.field('counts').to_pylist()):
+            contagens[linha] = contagens.get(linha, 0) + n
+
+    # Vazios viram NaN no read_csv e nunca casavam com o consolidado
+    contagens.pop('', None)
+    df = pd.DataFrame({
+        'linha_nome': _normalizar_linhas(list(contagens)),
+        'horarios_semana': pd.array(list(contagens.values()), dtype='int64'),
+    })
+    return df.groupby('linha_nome', as_index=False)['horarios_semana'].sum()
+
+
+def ranking_demanda(contagens, consolidado):
+    """Horários por linha/operadora, sem a 0.808 da URBI.
+
+    A junção com operadora/cor roda sobre a contagem já agregada por linha;
+    linhas repetidas no consolidado contam uma vez por registro, como no
+    merge 'left' original sobre todos os horários.
+    """
+    consolidado = consolidado.assign(linha_nome=consolidado['linha_nome'].astype(str))
+    df = pd.merge(
+        contagens,
+        consolidado[['linha_nome', 'operadora', 'cor_companhia_x']],
+        on='linha_nome',
+        how='inner'
+    )
+    df = _sem(df, EXCLUSAO_DEMANDA)
+
+    demanda = (df.groupby(['linha_nome', 'operadora', 'cor_companhia_x'])
+                 ['horarios_semana'].sum().reset_index())
+    return (demanda.sort_values('horarios_semana', ascending=False, kind='stable')
+                   .reset_index(drop=True))
+
+
+def ranking_frota(frota_investimento):
+    """Frota elétrica total por operadora"""
+    frota_op = frota_investimento.groupby('operadora')['frota_total'].sum().reset_index()
+    return (frota_op.sort_values('frota_total', ascending=False, kind='stable')
+                    .reset_index(drop=True))
+
+
+def _contagens(pacote, arquivo_horarios):
+    # Contagem já no pacote; sem ela, conta direto do CSV (e falha com o erro dele)
+    if pacote.tem_tabela('horarios_por_linha'):
+        return pacote.tabela('horarios_por_linha')
+    return contar_horarios_por_linha(arquivo_horarios)
+
+
+def construir_rankings(pacote, arquivo_horarios=ARQUIVO_HORARIOS):
+    """Materializa os três rankings a partir do pacote de dados (`dados.PacoteDados`).
+
+    Retorna (rankings, erros): um ranking que não pôde ser montado fica de fora
+    de `rankings` e sua mensagem vai para `erros`, para a página avisar.
+    """
+    construtores = {
+        'linhas_longas': lambda: ranking_linhas_longas(
+            pacote.tabela('consolidado', COLUNAS_LONGAS)),
+        'demanda': lambda: ranking_demanda(
+            _contagens(pacote, arquivo_horarios),
+            pacote.tabela('consolidado', COLUNAS_DEMANDA)),
+        'frota': lambda: ranking_frota(pacote.tabela('frota_investimento', COLUNAS_FROTA)),
+    }
+    rankings, erros = {}, {}
+    for nome, construir in construtores.items():
+        try:
+            rankings[nome] = construir()
+        except Exception as e:
+            erros[nome] = str(e)
+    return rankings, erros
+
+
+def top_n(ranking, n=10, operadoras=None):
+    """TOP N de um ranking já ordenado, opcionalmente só das operadoras dadas"""
+    if operadoras:
+        ranking = ranking[ranking['operadora'].isin(list(operadoras))]
+    return ranking.head(n).copy()
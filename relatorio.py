@@ -0,0 +1,295 @@
+"""
+RELATÓRIO - CENÁRIOS EM LOTE (SEM O DASHBOARD)
+==============================================
+Avalia uma grade de cenários (subconjuntos de operadoras x aumentos
+tarifários x novos usuários) com os mesmos cálculos do dashboard
+(`calcular_metricas_filtradas` sobre a matriz de KPIs, cenários financeiros
+calibrados, rankings do pacote) e grava um relatório consolidado:
+- XLSX: uma linha por cenário, as premissas, os TOP 10 de cada ranking por
+  subconjunto e os erros (rankings que não puderam ser montados)
+- HTML: as mesmas tabelas e o VPL por subconjunto x aumento, estático (o
+  navegador imprime em PDF)
+
+Os cenários vão em blocos para um pool de processos; cada processo abre o
+pacote de dados (memory-map) e monta a matriz de KPIs e os parâmetros
+financeiros uma vez só, no inicializador.
+
+Subconjuntos: `todas` (todas as operadoras), `cada` (uma de cada vez) ou
+uma lista separada por vírgulas (ex.: PIONEIRA,URBI). Faixas numéricas
+aceitam valores soltos ou início:fim:passo (fim incluso).
+
+Uso:
+    python relatorio.py                                  # grade padrão
+    python relatorio.py --subconjuntos todas cada --aumentos 10:100:5 --novos 0 100 200
+    python relatorio.py --formatos xlsx --saida relatorios/tarifas --processos 1
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from dados import PacoteDados, abrir_pacote
+from financeiro import avaliar_cenarios, calibrar_parametros
+from graficos import compactar
+from metricas import calcular_metricas_filtradas, construir_matriz_kpis
+from processos import contexto_processos
+from rankings import construir_rankings, top_n
+
+SAIDA_PADRAO = Path('relatorios') / 'cenarios'
+FORMATOS = ('xlsx', 'html')
+TODAS = 'todas'
+
+# Colunas do relatório por cenário, na ordem da planilha
+COLUNAS_CENARIO = (
+    'cenario', 'subconjunto', 'n_operadoras', 'aumento_tarifa', 'novos_usuarios',
+    'frota', 'linhas', 'paradas', 'km_anual', 'passageiros_ano', 'co2', 'capacidade_ano',
+    'taxa_ocupacao', 'passageiros_projetados', 'taxa_projetada', 'vpl', 'payback', 'tir',
+)
+
+# Contexto de cada processo (montado uma vez por `_iniciar`)
+_contexto = {}
+
+
+def _iniciar(destino, manifesto):
+    """Abre o pacote já construído e pré-calcula o que todos os cenários usam"""
+    pacote = PacoteDados(destino, manifesto)
+    dados = pacote.documento('dados')
+    kpis_base = pacote.documento('kpis')
+    try:
+        operadoras = pacote.tabela('operadoras')
+    except LookupError:
+        operadoras = None
+    _contexto.update(
+        dados=dados, kpis_base=kpis_base,
+        matriz=construir_matriz_kpis(dados, kpis_base, operadoras),
+        params=calibrar_parametros(dados, kpis_base),
+    )
+
+
+def _avaliar_bloco(cenarios):
+    """Métricas de um bloco de cenários (dicts com os filtros do dashboard)"""
+    # O cenário financeiro só depende do aumento: uma chamada vetorizada por bloco
+    aumentos = sorted({c['aumento_tarifa'] for c in cenarios})
+    grade = avaliar_cenarios(_contexto['params'], np.asarray(aumentos, dtype=float))
+    financeiro = {aumento: {chave: valores[i] for chave, valores in grade.items()}
+                  for i, aumento in enumerate(aumentos)}
+
+    resultado = []
+    for cenario in cenarios:
+        metricas = calcular_metricas_filtradas(
+            cenario, _contexto['kpis_base'], _contexto['dados'], _contexto['matriz'],
+            _contexto['params'], financeiro[cenario['aumento_tarifa']])
+        resultado.append({**metricas, 'cenario': cenario['cenario']})
+    return resultado
+
+
+# ============================================================================
+# GRADE DE CENÁRIOS
+# ============================================================================
+
+def faixa(texto):
+    """'10' -> [10]; '10:100:10' -> [10, 20, ..., 100]"""
+    partes = [float(p) for p in texto.split(':')]
+    if len(partes) == 1:
+        valores = partes
+    elif len(partes) == 3 and partes[2] > 0:
+        valores = np.arange(partes[0], partes[1] + partes[2] / 2, partes[2]).tolist()
+    else:
+        raise argparse.ArgumentTypeError(f"Faixa inválida: {texto!r} (use v ou início:fim:passo)")
+    return [int(v) if float(v).is_integer() else v for v in valores]
+
+
+def subconjuntos(especificacoes, operadoras):
+    """Especificações (todas | cada | A,B,...) -> {rótulo: lista de operadoras}"""
+    resultado = {}
+    for espec in especificacoes:
+        if espec == TODAS:
+            resultado[TODAS] = list(operadoras)
+        elif espec == 'cada':
+            resultado.update({op: [op] for op in operadoras})
+        else:
+            escolhidas = [op.strip() for op in espec.split(',') if op.strip()]
+            desconhecidas = sorted(set(escolhidas) - set(operadoras))
+            if desconhecidas:
+                raise ValueError(f"Operadora(s) desconhecida(s): {', '.join(desconhecidas)}")
+            resultado['+'.join(escolhidas)] = escolhidas
+    return resultado
+
+
+def grade_cenarios(grupos, aumentos, novos_mil):
+    """Produto subconjuntos x aumentos x novos usuários, como filtros do dashboard"""
+    return [
+        {'cenario': i, 'subconjunto': rotulo, 'operadoras': grupos[rotulo],
+         'aumento_tarifa': aumento, 'novos_usuarios': int(novos * 1000)}
+        for i, (rotulo, aumento, novos) in enumerate(itertools.product(grupos, aumentos,
+                                                                       novos_mil))
+    ]
+
+
+def avaliar_grade(pacote, cenarios, processos=None, tamanho_bloco=None):
+    """DataFrame com uma linha por cenário (mesma ordem de `cenarios`).
+
+    Com `processos` > 1 os blocos vão para um pool; cada processo monta o
+    contexto uma vez. `processos=1` roda no próprio processo.
+    """
+    processos = min(processos or os.cpu_count() or 1, max(len(cenarios), 1))
+    tamanho_bloco = tamanho_bloco or max(1, -(-len(cenarios) // (processos * 4)))
+    blocos = [cenarios[i:i + tamanho_bloco] for i in range(0, len(cenarios), tamanho_bloco)]
+
+    if processos <= 1:
+        _iniciar(pacote.destino, pacote.manifesto)
+        resultados = [_avaliar_bloco(bloco) for bloco in blocos]
+    else:
+        with ProcessPoolExecutor(processos, mp_context=contexto_processos(),
+                                 initializer=_iniciar,
+                                 initargs=(pacote.destino, pacote.manifesto)) as pool:
+            resultados = list(pool.map(_avaliar_bloco, blocos))
+
+    metricas = pd.DataFrame([m for bloco in resultados for m in bloco])
+    entradas = pd.DataFrame([{chave: valor for chave, valor in c.items() if chave != 'operadoras'}
+                             | {'n_operadoras': len(c['operadoras'])} for c in cenarios])
+    return (entradas.merge(metricas, on='cenario', how='left')
+            .reindex(columns=list(COLUNAS_CENARIO)))
+
+
+def rankings_por_subconjunto(pacote, grupos, n=10):
+    """TOP N de cada ranking para cada subconjunto, empilhados; e os erros"""
+    rankings, erros = construir_rankings(pacote)
+    partes = [
+        top_n(ranking, n, None if rotulo == TODAS else grupos[rotulo])
+        .assign(ranking=nome, subconjunto=rotulo, posicao=lambda df: np.arange(1, len(df) + 1))
+        for nome, ranking in rankings.items() for rotulo in grupos
+    ]
+    tabela = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+    if len(tabela):
+        primeiras = ['ranking', 'subconjunto', 'posicao']
+        tabela = tabela[primeiras + [c for c in tabela.columns if c not in primeiras]]
+    return tabela, erros
+
+
+# ============================================================================
+# SAÍDAS
+# ============================================================================
+
+def premissas_relatorio(pacote, params, args_grade):
+    linhas = [('versao_dados', pacote.versao), *args_grade.items(),
+              *((f'financeiro.{chave}', valor) for chave, valor in sorted(params.items()))]
+    return pd.DataFrame(linhas, columns=['premissa', 'valor']).astype({'valor': str})
+
+
+def gravar_xlsx(caminho, cenarios, rankings, erros, premissas):
+    with pd.ExcelWriter(caminho, engine='openpyxl') as escritor:
+        cenarios.to_excel(escritor, sheet_name='cenarios', index=False)
+        if len(rankings):
+            rankings.to_excel(escritor, sheet_name='rankings', index=False)
+        premissas.to_excel(escritor, sheet_name='premissas', index=False)
+        if erros:
+            pd.DataFrame(list(erros.items()), columns=['ranking', 'erro']).to_excel(
+                escritor, sheet_name='erros', index=False)
+
+
+def figura_vpl(cenarios):
+    """VPL (R$ bi) por subconjunto x aumento, com os novos usuários do 1º nível"""
+    primeiro = cenarios['novos_usuarios'].min()
+    grade = (cenarios[cenarios['novos_usuarios'] == primeiro]
+             .pivot_table(index='subconjunto', columns='aumento_tarifa', values='vpl',
+                          sort=False))
+    fig = go.Figure(go.Heatmap(x=grade.columns, y=grade.index, z=grade.to_numpy() / 1e9,
+                               zmid=0, colorscale='RdYlGn',
+                               colorbar=dict(title="VPL (R$ bi)")))
+    fig.update_layout(xaxis_title="Aumento (%)", height=max(300, 30 * len(grade) + 150),
+                      template='plotly_white')
+    return fig
+
+
+def gravar_html(caminho, cenarios, rankings, erros, premissas):
+    secoes = [
+        "<h1>Eletrificação da Frota de Ônibus do DF - Cenários</h1>",
+        f"<p>{len(cenarios):,} cenários · {cenarios['subconjunto'].nunique()} subconjunto(s) "
+        f"de operadoras · viáveis (VPL &gt; 0): {(cenarios['vpl'] > 0).mean() * 100:.1f}%</p>",
+        "<h2>VPL por subconjunto e aumento</h2>",
+        pio.to_html(compactar(figura_vpl(cenarios)), include_plotlyjs='cdn', full_html=False),
+        "<h2>Cenários</h2>",
+        cenarios.to_html(index=False, float_format=lambda v: f"{v:,.2f}", border=0),
+    ]
+    if len(rankings):
+        secoes += ["<h2>Rankings (TOP 10 por subconjunto)</h2>",
+                   rankings.to_html(index=False, border=0)]
+    if erros:
+        secoes += ["<h2>Rankings indisponíveis</h2>",
+                   "<ul>" + "".join(f"<li><b>{nome}</b>: {erro}</li>"
+                                    for nome, erro in erros.items()) + "</ul>"]
+    secoes += ["<h2>Premissas</h2>", premissas.to_html(index=False, border=0)]
+
+    estilo = ("body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;"
+              "font-size:12px}td,th{padding:2px 8px;border-bottom:1px solid #ddd;"
+              "text-align:right}")
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'><style>{estilo}</style>"
+                f"</head><body>{''.join(secoes)}</body></html>")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--subconjuntos', nargs='+', default=[TODAS, 'cada'],
+                        help="todas | cada | OPERADORA,OPERADORA,... (padrão: todas cada)")
+    parser.add_argument('--aumentos', nargs='+', type=faixa, default=[faixa('10:100:10')],
+                        help="aumentos tarifários em %% (padrão: 10:100:10)")
+    parser.add_argument('--novos', nargs='+', type=faixa, default=[faixa('0:200:50')],
+                        help="novos usuários em mil (padrão: 0:200:50)")
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=list(FORMATOS))
+    parser.add_argument('--saida', type=Path, default=SAIDA_PADRAO,
+                        help="caminho sem extensão (padrão: relatorios/cenarios)")
+    parser.add_argument('--processos', type=int, help="processos do pool (padrão: CPUs)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    pacote = abrir_pacote()
+    dados = pacote.documento('dados')
+    try:
+        grupos = subconjuntos(args.subconjuntos, dados['operadoras'])
+    except ValueError as e:
+        parser.error(str(e))
+    aumentos = sorted({v for faixa_ in args.aumentos for v in faixa_})
+    novos = sorted({v for faixa_ in args.novos for v in faixa_})
+    cenarios = grade_cenarios(grupos, aumentos, novos)
+
+    resultado = avaliar_grade(pacote, cenarios, args.processos)
+    tempo_grade = time.perf_counter() - inicio
+    rankings, erros = rankings_por_subconjunto(pacote, grupos)
+    premissas = premissas_relatorio(
+        pacote, calibrar_parametros(dados, pacote.documento('kpis')),
+        {'subconjuntos': ' '.join(args.subconjuntos), 'aumentos': aumentos,
+         'novos_usuarios_mil': novos})
+
+    args.saida.parent.mkdir(parents=True, exist_ok=True)
+    gravados = []
+    if 'xlsx' in args.formatos:
+        gravados.append(args.saida.with_suffix('.xlsx'))
+        gravar_xlsx(gravados[-1], resultado, rankings, erros, premissas)
+    if 'html' in args.formatos:
+        gravados.append(args.saida.with_suffix('.html'))
+        gravar_html(gravados[-1], resultado, rankings, erros, premissas)
+
+    print(f"{len(resultado):,} cenários em {tempo_grade:.1f} s "
+          f"({len(grupos)} subconjunto(s) x {len(aumentos)} aumento(s) x {len(novos)} nível(is))")
+    for nome, erro in erros.items():
+        print(f"⚠️ ranking {nome} fora do relatório: {erro}")
+    for caminho in gravados:
+        print(f"✅ {caminho}")
+    print(f"Total: {time.perf_counter() - inicio:.1f} s")
+    if resultado['vpl'].isna().any():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import pandas as pd
+
+from busca import BuscaParadasLinhas, normalizar
+
+PARADAS = pd.DataFrame({
+    'stop_name': ['Estação Samambaia', 'Rodoviária do Plano Piloto', 'Rua 08, 214'],
+    'lat': [-15.87, -15.79, -15.91],
+    'lon': [-48.08, -47.88, -48.06],
+})
+CONSOLIDADO = pd.DataFrame({
+    'linha_nome': ['0.808', '0.808', '0.808', '206.2'],
+    'linha_descricao': ['Recanto Das Emas/Setor O', 'Recanto Das Emas/Setor O',
+                        'Setor O/Recanto Das Emas', 'Gama / Estação Samambaia'],
+    'operadora': ['URBI', 'SAO_JOSE', 'URBI', 'URBI'],
+})
+
+
+def test_normalizar_sem_acentos():
+    assert normalizar('  Estação, Rodoviária!') == 'estacao rodoviaria'
+
+
+def test_linha_compartilhada_devolve_as_duas_operadoras():
+    busca = BuscaParadasLinhas(PARADAS, CONSOLIDADO)
+    linhas = busca.buscar('0.808')
+    linhas = linhas[linhas['tipo'] == 'linha']
+    assert sorted(linhas['operadora']) == ['SAO_JOSE', 'URBI']
+    assert set(linhas['linha']) == {'0.808'}
+    # Operadora no rótulo para distinguir os dois itens
+    assert all(op in rotulo for op, rotulo in zip(linhas['operadora'], linhas['rotulo']))
+
+
+def test_variantes_da_mesma_operadora_viram_um_item():
+    busca = BuscaParadasLinhas(PARADAS, CONSOLIDADO)
+    urbi = busca.itens[(busca.itens['linha'] == '0.808') & (busca.itens['operadora'] == 'URBI')]
+    assert len(urbi) == 1
+    assert 'setor o recanto das emas' in normalizar(urbi['texto'].iat[0])
+
+
+def test_parada_com_erro_de_digitacao():
+    achados = BuscaParadasLinhas(PARADAS, CONSOLIDADO).buscar('estacao samambia', 3)
+    assert achados['rotulo'].iat[0] == 'Estação Samambaia'
+    assert achados['tipo'].iat[0] == 'parada'
@@ -0,0 +1,25 @@
+import numpy as np
+
+from carga import PASSOS_DIA, PREMISSAS_CARGA, perfil_passos, simular_operadora
+from infraestrutura import PREMISSAS_PADRAO
+
+PREMISSAS = {**PREMISSAS_PADRAO, **PREMISSAS_CARGA}
+
+
+def _simular(frota_garagens):
+    n = len(frota_garagens)
+    return simular_operadora(frota_garagens, [5] * n, [150.0] * n, 5000.0,
+                             perfil_passos(), PREMISSAS)
+
+
+def test_garagem_sem_frota_no_fim():
+    carga, falta = _simular([20, 0])
+    assert carga.shape == (2, PASSOS_DIA)
+    assert not carga[1].any() and falta[1] == 0
+    np.testing.assert_allclose(carga[0], _simular([20])[0][0])
+
+
+def test_garagem_sem_frota_no_meio():
+    carga, _ = _simular([20, 0, 10])
+    assert not carga[1].any()
+    assert carga[0].sum() > 0 and carga[2].sum() > 0
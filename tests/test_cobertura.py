@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from cobertura import FAIXAS_DISTANCIA, atribuir_carregadores, paradas_por_local, resumo_cobertura
+from infraestrutura import dimensionar, tabela_locais
+
+PARADAS = pd.DataFrame({
+    'stop_name': ['A', 'B', 'C'],
+    'lat': [-15.79, -15.80, -15.95],
+    'lon': [-47.88, -47.89, -48.10],
+})
+TERMINAIS = [
+    {'terminal': 'Rodoviária', 'lat': -15.794, 'lon': -47.883, 'onibus_pico': 40,
+     'carregadores': 28, 'custo_total': 5.0e7},
+    {'terminal': 'Samambaia', 'lat': -15.87, 'lon': -48.08, 'onibus_pico': 20,
+     'carregadores': 14, 'custo_total': 2.5e7},
+]
+
+
+def test_sem_garagens_so_terminais():
+    locais = tabela_locais([], TERMINAIS)
+    assert list(locais['tipo']) == ['terminal', 'terminal']
+    assert len(dimensionar(locais)['carregadores']) == 2
+
+    atribuicao = atribuir_carregadores(PARADAS, locais)
+    assert list(atribuicao['nome_local'][:2]) == ['Rodoviária', 'Rodoviária']
+    assert atribuicao['distancia_km'].iat[0] < 1
+
+    por_local = paradas_por_local(atribuicao, locais)
+    assert por_local['paradas'].sum() == len(PARADAS)
+
+
+def test_sem_nenhum_local():
+    locais = tabela_locais([], [])
+    assert locais.empty and 'nome' in locais
+
+    atribuicao = atribuir_carregadores(PARADAS, locais)
+    assert (atribuicao['local'] == -1).all()
+    assert np.isinf(atribuicao['distancia_km']).all()
+    assert resumo_cobertura(atribuicao)['por_faixa'][FAIXAS_DISTANCIA[-1][1]] == len(PARADAS)
+    assert paradas_por_local(atribuicao, locais).empty